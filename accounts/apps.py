@@ -6,3 +6,7 @@ class AccountsConfig(AppConfig):
     """AccountsConfig class"""
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        """Connect the accounts signals"""
+        from accounts import signals  # pylint: disable=import-outside-toplevel,unused-import
@@ -0,0 +1,62 @@
+"""Accounts authentication"""
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from accounts.cache import auth_user_cache
+
+# Fields of the cached users, the others are loaded on first access like deferred fields
+AUTH_USER_FIELDS = ('id', 'username', 'is_active', 'is_staff', 'is_superuser')
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that reads the user from auth_user_cache, so most of the requests do not query the users
+    table. The password is cached as the marker of the revoke token claim, never in clear.
+    """
+
+    def _cached_user(self, user_id):
+        """
+        User built from the cached fields, or loaded from the database and cached
+        :return: A tuple with the user and its password marker
+        """
+        values = auth_user_cache.get(user_id)
+        if values is not None:
+            # from_db takes the values in the order of the fields of the model
+            field_names = [field.attname for field in self.user_model._meta.concrete_fields
+                           if field.attname in AUTH_USER_FIELDS]
+            user = self.user_model.from_db(self.user_model.objects.db, field_names,
+                                           [values[field_name] for field_name in field_names])
+            return user, values['password_marker']
+
+        try:
+            user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist as exception:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found') from exception
+
+        password_marker = get_md5_hash_password(user.password)
+        auth_user_cache.set(user_id, {
+            **{field: getattr(user, field) for field in AUTH_USER_FIELDS},
+            'password_marker': password_marker,
+        })
+        return user, password_marker
+
+    def get_user(self, validated_token):
+        """User of the token, with the same checks as JWTAuthentication"""
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as exception:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from exception
+
+        user, password_marker = self._cached_user(user_id)
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if api_settings.CHECK_REVOKE_TOKEN and \
+                validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != password_marker:
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+
+        return user
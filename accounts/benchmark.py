@@ -0,0 +1,232 @@
+"""Accounts api benchmark"""
+import math
+import random
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User, Friend, Profile
+from accounts.renderers import FastJSONRenderer
+from accounts.serializers import ProfileSerializer, AdminUserSerializer, FriendsSerializer, ProfileValuesSerializer, \
+    AdminUserValuesSerializer, FriendsValuesSerializer
+
+SCENARIOS = ('shorter_connection', 'friends_profiles', 'profiles_list', 'friend_create')
+SERIALIZATIONS = ('profiles', 'users', 'friends')
+
+
+def percentile(values, fraction):
+    """Nearest rank percentile of a list of values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def summarize(samples):
+    """
+    Summary of the samples of a scenario
+    :param samples: List of (seconds, queries, status code) tuples
+    :return: Dict with the latency percentiles in milliseconds, the queries per request and the failed requests
+    """
+    latencies = [seconds * 1000 for seconds, _, _ in samples]
+    queries = [count for _, count, _ in samples]
+
+    return {
+        'requests': len(samples),
+        'errors': len([code for _, _, code in samples if code >= 400]),
+        'p50_ms': round(percentile(latencies, 0.5), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'max_ms': round(max(latencies), 3),
+        'queries_mean': round(sum(queries) / len(queries), 2),
+        'queries_max': max(queries),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare the results with a baseline, the scenarios missing in any of them are ignored
+    :param results: Dict of scenarios summaries per graph size
+    :param baseline: Results of a previous run
+    :param tolerance: Fraction the p95 latency can grow over the baseline
+    :return: List of the regressions found
+    """
+    regressions = []
+
+    for size, scenarios in baseline.items():
+        for scenario, expected in scenarios.items():
+            current = results.get(size, {}).get(scenario)
+            if current is None:
+                continue
+
+            name = f'{scenario} ({size} users)'
+            if current['queries_max'] > expected['queries_max']:
+                regressions.append(f"{name}: {current['queries_max']} queries, baseline {expected['queries_max']}")
+            if current['p95_ms'] > expected['p95_ms'] * (1 + tolerance):
+                regressions.append(f"{name}: p95 {current['p95_ms']}ms, baseline {expected['p95_ms']}ms")
+            if current['errors'] > expected['errors']:
+                regressions.append(f"{name}: {current['errors']} errors, baseline {expected['errors']}")
+
+    return regressions
+
+
+class ApiBenchmark:
+    """Measure the latency and the queries of the accounts hot paths through the whole request cycle"""
+
+    def __init__(self, user_ids, requests, seed=0):
+        """
+        :param user_ids: Ids of the users of the graph
+        :param requests: Requests per scenario
+        :param seed: Seed of the users chosen for each request
+        """
+        self.user_ids = user_ids
+        self.requests = requests
+        self.rng = random.Random(seed)
+        self.client = APIClient()
+        self._credentials = {}
+
+    def _get_credentials(self, user_id):
+        """Add the JWT to header for request, created once per user"""
+        if user_id not in self._credentials:
+            refresh = RefreshToken.for_user(User.objects.get(pk=user_id))
+            self._credentials[user_id] = {'HTTP_AUTHORIZATION': f'Bearer {refresh.access_token}'}
+        return self._credentials[user_id]
+
+    def _measure(self, method, url, user_id, data=None):
+        """Send a request as user_id, return its time, its number of queries and its status code"""
+        credentials = self._get_credentials(user_id)
+
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(self.client, method)(url, data, format='json', **credentials)
+            seconds = time.perf_counter() - started
+
+        return seconds, len(queries), response.status_code
+
+    def _pair(self):
+        """Two different random users"""
+        return self.rng.sample(self.user_ids, 2)
+
+    def shorter_connection(self):
+        """Shorter connection between two random users"""
+        user_id, other_user_id = self._pair()
+        return self._measure('get', reverse('shorter_connection_friends', args=[user_id, other_user_id]), user_id)
+
+    def friends_profiles(self):
+        """Profiles of the friends of a random user"""
+        user_id = self.rng.choice(self.user_ids)
+        return self._measure('get', reverse('friends_profiles', args=[user_id]), user_id)
+
+    def profiles_list(self):
+        """First page of the profiles"""
+        return self._measure('get', reverse('profile_list_create'), self.rng.choice(self.user_ids))
+
+    def friend_create(self):
+        """New friendship between two random users"""
+        user_id, friend_id = self._pair()
+        while Friend.objects.filter(user_id=user_id, is_friend_of_id=friend_id).exists():
+            user_id, friend_id = self._pair()
+
+        return self._measure('post', reverse('friend_list_create'), user_id,
+                             {'user': user_id, 'is_friend_of': friend_id})
+
+    def run(self, scenarios=SCENARIOS):
+        """
+        Run the scenarios, after a warm up request each
+        :return: Dict with the summary of each scenario
+        """
+        results = {}
+
+        for scenario in scenarios:
+            measure = getattr(self, scenario)
+            measure()
+            results[scenario] = summarize([measure() for _ in range(self.requests)])
+
+        return results
+
+
+class SerializationBenchmark:
+    """
+    Rows per second loaded, serialized and rendered by the lists: with the model serializers and JSONRenderer (before)
+    and with the values serializers and FastJSONRenderer (after)
+    """
+
+    def __init__(self, rows, repeat=3):
+        """
+        :param rows: Rows of each list
+        :param repeat: Runs of each measure, the fastest one is kept
+        """
+        self.rows = rows
+        self.repeat = repeat
+
+    def _rows_per_second(self, render):
+        """Rows per second of the fastest run of render, that returns the number of rows rendered"""
+        best = None
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            rows = render()
+            seconds = time.perf_counter() - started
+            best = seconds if best is None else min(best, seconds)
+        return round(rows / best, 1) if best else None
+
+    @staticmethod
+    def _models(serializer_class, queryset):
+        """Render the rows loaded as models through the model serializer, return the number of rows"""
+        data = serializer_class(queryset, many=True).data
+        JSONRenderer().render(data)
+        return len(data)
+
+    @staticmethod
+    def _values(serializer_class, rows, **kwargs):
+        """Render the values() rows through the values serializer, return the number of rows"""
+        data = serializer_class(rows, many=True, **kwargs).data
+        FastJSONRenderer().render(data)
+        return len(data)
+
+    def profiles(self):
+        """Profiles with the names of their users and their friends"""
+        queryset = Profile.objects.order_by('pk')[:self.rows]
+
+        def values():
+            rows = list(ProfileValuesSerializer.values(queryset))
+            friends = ProfileValuesSerializer.friends_of([row['user_id'] for row in rows])
+            return self._values(ProfileValuesSerializer, rows, context={'friends': friends})
+
+        return lambda: self._models(ProfileSerializer, queryset.with_friends_ids()), values
+
+    def users(self):
+        """Users of the admin list"""
+        queryset = User.objects.order_by('pk')[:self.rows]
+        return lambda: self._models(AdminUserSerializer, queryset), \
+            lambda: self._values(AdminUserValuesSerializer, list(AdminUserValuesSerializer.values(queryset)))
+
+    def friends(self):
+        """Friendships"""
+        queryset = Friend.objects.order_by('pk')[:self.rows]
+        return lambda: self._models(FriendsSerializer, queryset), \
+            lambda: self._values(FriendsValuesSerializer, list(FriendsValuesSerializer.values(queryset)))
+
+    def run(self, serializations=SERIALIZATIONS):
+        """
+        Measure the serializations, after a warm up run each
+        :return: Dict with the rows per second before and after, and the speedup, of each serialization
+        """
+        results = {}
+
+        for serialization in serializations:
+            before, after = getattr(self, serialization)()
+            before()
+            after()
+            before_rate, after_rate = self._rows_per_second(before), self._rows_per_second(after)
+            results[serialization] = {
+                'rows': before(),
+                'before_rows_per_second': before_rate,
+                'after_rows_per_second': after_rate,
+                'speedup': round(after_rate / before_rate, 2) if before_rate and after_rate else None,
+            }
+
+        return results
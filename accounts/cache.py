@@ -0,0 +1,357 @@
+"""Accounts caches"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from accounts.metrics import cache_requests
+
+GRAPH_GENERATION_KEY = 'accounts:friend_graph_generation'
+
+# Generations of the friend graph the value computed by GraphCache.get_or_set in each thread comes from
+_computation = threading.local()
+
+
+def _cache():
+    """Cache backend used by the accounts caches"""
+    return caches[settings.FRIENDS_CONNECTIONS_CACHE]
+
+
+def is_shared_cache():
+    """The cache of the accounts caches is shared between processes, so the invalidations reach all of them"""
+    return not isinstance(_cache(), (LocMemCache, DummyCache))
+
+
+def _timeout(timeout):
+    """
+    Timeout of an entry that other processes can make stale, bounded to LOCAL_CACHE_TIMEOUT seconds when the cache is
+    local to each process, because the invalidations of the other processes never reach it
+    :param timeout: Seconds, None for no expiration
+    """
+    if is_shared_cache():
+        return timeout
+    return settings.LOCAL_CACHE_TIMEOUT if timeout is None else min(timeout, settings.LOCAL_CACHE_TIMEOUT)
+
+
+def computed_from(generation):
+    """
+    Record the friend graph generation of the data the value being computed by GraphCache.get_or_set comes from, e.g.
+    the generation a process level index was loaded in. The value is cached only when every recorded generation is
+    the current one, None for values that must never be cached.
+    """
+    generations = getattr(_computation, 'generations', None)
+    if generations is not None:
+        generations.add(generation)
+
+
+def _new_graph_generation():
+    """
+    First generation of the friend graph, and the next one when the key was evicted. It is the current time in
+    nanoseconds, always beyond the generations used before, which grow by one per friendship change, so an evicted
+    generation never comes back and the values cached for it are never read again.
+    """
+    return time.time_ns()
+
+
+def graph_generation():
+    """Current generation of the friend graph, it changes every time a friendship is created or deleted"""
+    cache = _cache()
+    generation = cache.get(GRAPH_GENERATION_KEY)
+    if generation is None:
+        cache.add(GRAPH_GENERATION_KEY, _new_graph_generation(), timeout=None)
+        generation = cache.get(GRAPH_GENERATION_KEY)
+        if generation is None:
+            # Evicted again at once, a generation nobody else uses is never read from the cache
+            generation = _new_graph_generation()
+    return generation
+
+
+def bump_graph_generation():
+    """
+    Move the friend graph to a new generation, so everything cached for the previous ones is never read again
+    :return: The new generation
+    """
+    cache = _cache()
+    try:
+        return cache.incr(GRAPH_GENERATION_KEY)
+    except ValueError:
+        generation = _new_graph_generation()
+        cache.add(GRAPH_GENERATION_KEY, generation, timeout=None)
+        return generation
+
+
+def _version_key(kind, resource_id):
+    """Cache key of the version of a resource"""
+    return f'accounts:version:{kind}:{resource_id}'
+
+
+def resource_version(kind, resource_id):
+    """
+    Version stamp of a resource, e.g. ('profile', user_id). The stamps are random and replaced on every change, so a
+    stamp evicted from the cache comes back as a new one and never matches a previous state. When the cache is local
+    to each process the changes are not seen by the other processes, so there the stamps expire after
+    LOCAL_CACHE_TIMEOUT seconds and the ETags and rendered responses built on them are not served for longer.
+    """
+    cache = _cache()
+    key = _version_key(kind, resource_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, timeout=_timeout(None))
+        version = cache.get(key, uuid.uuid4().hex)
+    return version
+
+
+def resource_versions(kind, resource_ids):
+    """
+    Version stamps of many resources of a kind, read from the cache at once
+    :param kind: Kind of the resources, e.g. 'profile'
+    :param resource_ids: Ids of the resources
+    :return: Dict of the versions by resource id, without those evicted meanwhile
+    """
+    cache = _cache()
+    keys = {_version_key(kind, resource_id): resource_id for resource_id in resource_ids}
+    versions = cache.get_many(keys)
+
+    missing = keys.keys() - versions.keys()
+    if missing:
+        for key in missing:
+            cache.add(key, uuid.uuid4().hex, timeout=_timeout(None))
+        versions.update(cache.get_many(missing))
+
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def bump_resource_versions(resources):
+    """Give a new version stamp to each (kind, resource_id) resource"""
+    _cache().set_many({_version_key(kind, resource_id): uuid.uuid4().hex for kind, resource_id in resources},
+                      timeout=_timeout(None))
+
+
+class GraphCache:
+    """
+    Cache of values computed from the friend graph, including the empty ones. The keys contain the friend graph
+    generation, so a value is never read after a friendship was created or deleted (in any process when the cache is
+    shared, otherwise the values expire after LOCAL_CACHE_TIMEOUT seconds). The values computed from a process level
+    index are not cached if the index is older than the current generation, see computed_from.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _key(self, generation, *parts):
+        """Cache key of a value"""
+        return ':'.join(map(str, ('accounts', self.name, generation, *parts)))
+
+    def _count(self, hit):
+        """Update the hit and miss counters"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        cache_requests.inc(cache=self.name, result='hit' if hit else 'miss')
+
+    def get_or_set(self, parts, compute):
+        """
+        Cached value
+        :param parts: Tuple that identifies the value, e.g. the ids of the users
+        :param compute: Callable that returns the value on a miss
+        :return: The value
+        """
+        generation = graph_generation()
+        key = self._key(generation, *parts)
+        value = _cache().get(key)
+        self._count(value is not None)
+
+        if value is None:
+            outer = getattr(_computation, 'generations', None)
+            _computation.generations = set()
+            try:
+                value = compute()
+                generations = _computation.generations
+            finally:
+                _computation.generations = outer
+
+            if outer is not None:
+                outer.update(generations)
+            # Values computed from an index loaded in a previous generation could miss the latest friendships
+            if generations <= {generation}:
+                _cache().set(key, value, timeout=_timeout(settings.FRIENDS_CONNECTIONS_CACHE_TIMEOUT))
+
+        return value
+
+    def stats(self):
+        """Hit and miss counters of this process"""
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / total if total else None,
+            'generation': graph_generation(),
+        }
+
+
+class ShorterConnectionCache(GraphCache):
+    """Cache of the shorter connection between two users"""
+
+    def __init__(self):
+        super().__init__('shorter_connection')
+
+    def get_or_set(self, user_id, other_user_id, compute):  # pylint: disable=arguments-differ
+        """
+        Cached connection between user and other_user
+        :param user_id: Starting user id
+        :param other_user_id: Final destination user id
+        :param compute: Callable that returns the connection on a miss
+        :return: The connection
+        """
+        return super().get_or_set((user_id, other_user_id), compute)
+
+
+shorter_connection_cache = ShorterConnectionCache()
+mutual_friends_cache = GraphCache('mutual_friends')
+friend_suggestions_cache = GraphCache('friend_suggestions')
+
+
+class FriendIdsCache:
+    """
+    Process level LRU of the friend ids of the users, bounded to FRIEND_IDS_CACHE_SIZE users. Every entry keeps the
+    friend graph generation it was loaded in and is loaded again once the generation changes, so the friendships
+    created or deleted by other processes are seen too when the cache is shared. Otherwise the generation is local to
+    the process and the entries expire after LOCAL_CACHE_TIMEOUT seconds, so a deleted friendship stops granting
+    access in every process. The Friend signals drop the entries of the users whose friendships changed.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Frozen set of the ids of the friends of user_id"""
+        generation = graph_generation()
+
+        with self._lock:
+            entry = self._entries.get(user_id)
+            hit = entry is not None and entry[0] == generation and (entry[1] is None or entry[1] > time.monotonic())
+            if hit:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+            else:
+                self.misses += 1
+        cache_requests.inc(cache='friend_ids', result='hit' if hit else 'miss')
+
+        if hit:
+            return entry[2]
+
+        timeout = _timeout(None)
+        expires = time.monotonic() + timeout if timeout is not None else None
+        friend_ids = frozenset(apps.get_model('accounts', 'Friend').get_friends_id_list(user_id))
+        with self._lock:
+            self._entries[user_id] = (generation, expires, friend_ids)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > settings.FRIEND_IDS_CACHE_SIZE:
+                self._entries.popitem(last=False)
+        return friend_ids
+
+    def discard(self, user_ids):
+        """Drop the friend ids of the users"""
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Size and hit and miss counters of this process"""
+        with self._lock:
+            hits, misses, size = self.hits, self.misses, len(self._entries)
+        total = hits + misses
+        return {'hits': hits, 'misses': misses, 'hit_ratio': hits / total if total else None, 'users': size}
+
+
+friend_ids_cache = FriendIdsCache()
+
+
+class AuthUserCache:
+    """
+    Cache of the fields of the users needed to authenticate their requests. A local LRU of this process, bounded to
+    AUTH_USER_CACHE_LOCAL_SIZE users whose entries expire after AUTH_USER_CACHE_LOCAL_TTL seconds, is in front of the
+    shared cache, where they expire after AUTH_USER_CACHE_TIMEOUT seconds. The User signals drop both layers when a
+    user is saved or deleted, the local layers of the other processes expire by themselves. When the cache is local to
+    each process it is not shared at all, and its entries expire after LOCAL_CACHE_TIMEOUT seconds too.
+    """
+
+    def __init__(self):
+        self._local = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(user_id):
+        """Cache key of a user"""
+        return f'accounts:auth_user:{user_id}'
+
+    def get(self, user_id):
+        """Cached fields of user_id, None if they are not cached"""
+        with self._lock:
+            entry = self._local.get(user_id)
+        values = entry[1] if entry is not None and entry[0] > time.monotonic() else None
+
+        if values is None:
+            values = _cache().get(self._key(user_id))
+            if values is not None:
+                self._set_local(user_id, values)
+
+        with self._lock:
+            if values is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        cache_requests.inc(cache='auth_user', result='miss' if values is None else 'hit')
+        return values
+
+    def _set_local(self, user_id, values):
+        """Keep the fields of user_id in the local layer"""
+        with self._lock:
+            self._local[user_id] = (time.monotonic() + settings.AUTH_USER_CACHE_LOCAL_TTL, values)
+            self._local.move_to_end(user_id)
+            while len(self._local) > settings.AUTH_USER_CACHE_LOCAL_SIZE:
+                self._local.popitem(last=False)
+
+    def set(self, user_id, values):
+        """Cache the fields of user_id in both layers"""
+        _cache().set(self._key(user_id), values, timeout=_timeout(settings.AUTH_USER_CACHE_TIMEOUT))
+        self._set_local(user_id, values)
+
+    def invalidate(self, user_id):
+        """Drop the fields of user_id from both layers"""
+        _cache().delete(self._key(user_id))
+        with self._lock:
+            self._local.pop(user_id, None)
+
+    def stats(self):
+        """Size of the local layer and hit and miss counters of this process"""
+        with self._lock:
+            hits, misses, size = self.hits, self.misses, len(self._local)
+        total = hits + misses
+        return {'hits': hits, 'misses': misses, 'hit_ratio': hits / total if total else None, 'local_users': size}
+
+
+auth_user_cache = AuthUserCache()
@@ -0,0 +1,117 @@
+"""Accounts friendship components index"""
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+
+from accounts.graph import LOAD_CHUNK_SIZE
+
+
+class UnionFind:
+    """Disjoint sets of user ids, the users without friendships are not stored and are alone in their set"""
+
+    def __init__(self):
+        self.parent = {}
+        self.size = {}
+
+    def find(self, node):
+        """Representative of the set of node, halving the path on the way"""
+        parent = self.parent
+        if node not in parent:
+            return node
+
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def union(self, node, other):
+        """Join the sets of node and other, the smaller set goes under the bigger one"""
+        for item in (node, other):
+            if item not in self.parent:
+                self.parent[item] = item
+                self.size[item] = 1
+
+        root, other_root = self.find(node), self.find(other)
+        if root == other_root:
+            return
+
+        if self.size[root] < self.size[other_root]:
+            root, other_root = other_root, root
+        self.parent[other_root] = root
+        self.size[root] += self.size.pop(other_root)
+
+
+class ComponentIndex:
+    """
+    Process level index of the weakly connected components of the friend graph (friendships taken in both
+    directions). Users in different components have no connection at all, which is answered without a search.
+
+    Created friendships join components as they are committed. A deleted friendship could split a component, so it
+    marks the index to be rebuilt on next use. Like the friend graph index it is also rebuilt once it is older than
+    FRIEND_GRAPH_INDEX_MAX_AGE seconds, to see the friendships created by other processes.
+    """
+
+    def __init__(self):
+        self._forest = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _is_stale(self):
+        """The index must be (re)built"""
+        return self._forest is None or time.monotonic() - self._loaded_at > settings.FRIEND_GRAPH_INDEX_MAX_AGE
+
+    @staticmethod
+    def load():
+        """Build the components streaming the friendships table once"""
+        forest = UnionFind()
+        friendships = apps.get_model('accounts', 'Friend').objects.values_list('user_id', 'is_friend_of_id')
+        for user_id, friend_id in friendships.iterator(chunk_size=LOAD_CHUNK_SIZE):
+            forest.union(user_id, friend_id)
+        return forest
+
+    def get(self):
+        """Current components"""
+        if self._is_stale():
+            with self._lock:
+                if self._is_stale():
+                    self._forest = self.load()
+                    self._loaded_at = time.monotonic()
+        return self._forest
+
+    def are_disconnected(self, user_id, other_user_id):
+        """There is surely no connection between the users, in any direction"""
+        forest = self.get()
+        with self._lock:
+            return forest.find(user_id) != forest.find(other_user_id)
+
+    def add_friendships(self, friendships):
+        """Join the components of created friendships, given as (user_id, is_friend_of_id) pairs"""
+        with self._lock:
+            if self._forest is None:
+                return
+            for user_id, friend_id in friendships:
+                self._forest.union(user_id, friend_id)
+
+    def invalidate(self):
+        """Drop the components, they will be built again on next use"""
+        with self._lock:
+            self._forest = None
+
+    def stats(self):
+        """Size of the index of the process"""
+        forest = self._forest
+        if forest is None:
+            return {'loaded': False, 'users': 0, 'components': 0}
+        return {'loaded': True, 'users': len(forest.parent), 'components': len(forest.size)}
+
+
+component_index = ComponentIndex()
+
+
+def get_component_index():
+    """The components index of the process or None if it is disabled"""
+    if not settings.FRIENDS_COMPONENT_INDEX:
+        return None
+    return component_index
@@ -0,0 +1,110 @@
+"""Accounts conditional GET responses"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from accounts.cache import resource_version
+from accounts.metrics import cache_requests
+
+
+class RenderedCache:
+    """Process level LRU of rendered JSON responses, bounded to RENDERED_CACHE_MAX_BYTES bytes of content"""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Rendered content of key, None if it is not cached"""
+        with self._lock:
+            content = self._entries.get(key)
+            if content is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        cache_requests.inc(cache='rendered', result='miss' if content is None else 'hit')
+        return content
+
+    def set(self, key, content):
+        """Keep the rendered content of key, dropping the least recently used over the size"""
+        if len(content) > settings.RENDERED_CACHE_MAX_BYTES:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = content
+            self.size += len(content)
+
+            while self.size > settings.RENDERED_CACHE_MAX_BYTES:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """Size and hit and miss counters of this process"""
+        with self._lock:
+            hits, misses, entries, size = self.hits, self.misses, len(self._entries), self.size
+        total = hits + misses
+        return {'hits': hits, 'misses': misses, 'hit_ratio': hits / total if total else None, 'entries': entries,
+                'bytes': size}
+
+
+rendered_cache = RenderedCache()
+
+
+def _matches(if_none_match, etag):
+    """The If-None-Match header matches etag, weak comparison"""
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return any(tag == '*' or tag.removeprefix('W/') == etag for tag in tags if tag)
+
+
+def conditional_json_response(request, resource, render):
+    """
+    JSON response of a resource with its version stamp, and a hash of the url, as ETag. The requests that send the
+    ETag in If-None-Match are answered with 304, and the content rendered for every ETag is reused from
+    rendered_cache, so render only runs when the resource changed. Other formats (e.g. the browsable API) are always
+    rendered.
+    :param request: Request
+    :param resource: The (kind, resource_id) of the version, e.g. ('profile', user_id)
+    :param render: Callable that returns the Response of the resource, or an HttpResponse already rendered as JSON
+    :return: HttpResponse
+    """
+    if not isinstance(request.accepted_renderer, JSONRenderer):
+        return render()
+
+    url_hash = hashlib.blake2b(request.build_absolute_uri().encode(), digest_size=8).hexdigest()
+    etag = f'"{resource_version(*resource)}-{url_hash}"'
+
+    if _matches(request.headers.get('If-None-Match', ''), etag):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    content = rendered_cache.get(etag)
+    if content is None:
+        response = render()
+        if response.status_code != 200:
+            return response
+        content = request.accepted_renderer.render(response.data) if isinstance(response, Response) \
+            else response.content
+        rendered_cache.set(etag, content)
+
+    response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    return response
@@ -0,0 +1,25 @@
+"""Accounts api exceptions"""
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class SearchBudgetUnavailable(APIException):
+    """The friends connections search was stopped by its node or time budget"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('The search of the connection exceeded its budget.')
+    default_code = 'search_budget_exceeded'
+
+
+class LandmarkIndexUnavailable(APIException):
+    """The landmark index has not been built"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('The landmark index is not available, build it with the build_landmark_index command.')
+    default_code = 'landmark_index_unavailable'
+
+
+class FriendGraphCompactionUnavailable(APIException):
+    """The friend graph index is disabled or already being compacted"""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _('The friend graph index is disabled or a compaction is already running.')
+    default_code = 'friend_graph_compaction_unavailable'
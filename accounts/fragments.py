@@ -0,0 +1,103 @@
+"""Accounts rendered profiles fragments"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from accounts.cache import _timeout, resource_versions
+from accounts.metrics import cache_requests
+from accounts.models import Profile
+from accounts.renderers import FastJSONRenderer
+from accounts.serializers import ProfileValuesSerializer
+
+
+class ProfileFragmentCache:
+    """
+    Process level LRU of the profiles rendered as JSON by ProfileSerializer, bounded to PROFILE_FRAGMENT_CACHE_SIZE
+    profiles. Every entry keeps the version of the profile it was rendered for and is rendered again once the version
+    changes, that is when the profile, the names of its user or its friendships change. The versions are seen by the
+    other processes only with a shared cache, otherwise the entries expire after LOCAL_CACHE_TIMEOUT seconds.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_many(self, versions):
+        """
+        Rendered profiles of their current versions
+        :param versions: Dict of the current versions by user id
+        :return: Dict of the rendered profiles by user id, without those not cached for their current versions
+        """
+        fragments = {}
+        now = time.monotonic()
+        with self._lock:
+            for user_id, version in versions.items():
+                entry = self._entries.get(user_id)
+                if entry is not None and entry[0] == version and (entry[1] is None or entry[1] > now):
+                    self._entries.move_to_end(user_id)
+                    fragments[user_id] = entry[2]
+            hits = len(fragments)
+            misses = len(versions) - hits
+            self.hits += hits
+            self.misses += misses
+
+        if hits:
+            cache_requests.inc(hits, cache='profile_fragments', result='hit')
+        if misses:
+            cache_requests.inc(misses, cache='profile_fragments', result='miss')
+        return fragments
+
+    def set(self, user_id, version, content):
+        """Keep the profile of user_id rendered for version"""
+        timeout = _timeout(None)
+        expires = time.monotonic() + timeout if timeout is not None else None
+        with self._lock:
+            self._entries[user_id] = (version, expires, content)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > settings.PROFILE_FRAGMENT_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Size and hit and miss counters of this process"""
+        with self._lock:
+            hits, misses, size = self.hits, self.misses, len(self._entries)
+        total = hits + misses
+        return {'hits': hits, 'misses': misses, 'hit_ratio': hits / total if total else None, 'profiles': size}
+
+
+profile_fragment_cache = ProfileFragmentCache()
+
+
+def render_profiles(user_ids):
+    """
+    JSON array of the profiles of the users, as ProfileSerializer renders them, assembled from the cached fragments.
+    Only the profiles missing from profile_fragment_cache are loaded, with their friendships, and serialized from their
+    values by ProfileValuesSerializer.
+    :param user_ids: Ids of the users of the profiles, in the order of the array
+    :return: The JSON array as bytes
+    """
+    versions = resource_versions('profile', user_ids)
+    fragments = profile_fragment_cache.get_many(versions)
+
+    missing = [user_id for user_id in user_ids if user_id not in fragments]
+    if missing:
+        renderer = FastJSONRenderer()
+        rows = ProfileValuesSerializer.values(Profile.objects.filter(user_id__in=missing))
+        serializer = ProfileValuesSerializer(rows, many=True,
+                                             context={'friends': ProfileValuesSerializer.friends_of(missing)})
+        for profile in serializer.data:
+            user_id = profile['user_id']
+            content = renderer.render(profile)
+            fragments[user_id] = content
+            if user_id in versions:
+                profile_fragment_cache.set(user_id, versions[user_id], content)
+
+    return b'[' + b','.join(fragments[user_id] for user_id in user_ids if user_id in fragments) + b']'
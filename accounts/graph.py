@@ -0,0 +1,447 @@
+"""Accounts in-memory friendship graph index"""
+import heapq
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+
+from django.apps import apps
+from django.conf import settings
+
+from accounts.cache import computed_from, graph_generation
+
+# Rows fetched per round trip while the friendships table is loaded
+LOAD_CHUNK_SIZE = 10000
+# Generations moved to by the process kept while waiting for the missing ones before them
+LOCAL_GENERATIONS_LIMIT = 1000
+
+
+class CompressedAdjacency:
+    """
+    Adjacency lists of one direction of the graph in compressed sparse row (CSR) form. The users with friendships are
+    kept sorted in `nodes` and the sorted neighbours of `nodes[i]` are `neighbours[offsets[i]:offsets[i + 1]]`, so
+    every edge costs 8 bytes and a lookup is a binary search.
+    """
+    __slots__ = ('nodes', 'offsets', 'neighbours')
+
+    def __init__(self, nodes=None, offsets=None, neighbours=None):
+        self.nodes = nodes if nodes is not None else array('q')
+        self.offsets = offsets if offsets is not None else array('q', [0])
+        self.neighbours = neighbours if neighbours is not None else array('q')
+
+    def __len__(self):
+        return len(self.neighbours)
+
+    @classmethod
+    def from_sorted_edges(cls, edges):
+        """
+        Build the adjacency in a single pass
+        :param edges: Iterable of (node, neighbour) pairs sorted by node and neighbour
+        :return: CompressedAdjacency
+        """
+        nodes, offsets, neighbours = array('q'), array('q'), array('q')
+
+        for node, neighbour in edges:
+            if not nodes or nodes[-1] != node:
+                nodes.append(node)
+                offsets.append(len(neighbours))
+            neighbours.append(neighbour)
+
+        offsets.append(len(neighbours))
+        return cls(nodes, offsets, neighbours)
+
+    def transposed(self):
+        """
+        Adjacency of the opposite direction, built with a counting sort of the edges. The edges are visited in order,
+        so the neighbours of every node of the result are sorted too.
+        :return: CompressedAdjacency
+        """
+        nodes = array('q', sorted(set(self.neighbours)))
+        positions = {node: index for index, node in enumerate(nodes)}
+
+        offsets = array('q', [0]) * (len(nodes) + 1)
+        for neighbour in self.neighbours:
+            offsets[positions[neighbour] + 1] += 1
+        for index in range(len(nodes)):
+            offsets[index + 1] += offsets[index]
+
+        ends = offsets[:-1]
+        neighbours = array('q', [0]) * len(self.neighbours)
+        for node, neighbour in self.edges():
+            position = positions[neighbour]
+            neighbours[ends[position]] = node
+            ends[position] += 1
+
+        return CompressedAdjacency(nodes, offsets, neighbours)
+
+    def _bounds(self, node):
+        """Bounds of the neighbours of node in the neighbours array"""
+        index = bisect_left(self.nodes, node)
+        if index < len(self.nodes) and self.nodes[index] == node:
+            return self.offsets[index], self.offsets[index + 1]
+        return 0, 0
+
+    def neighbours_of(self, node):
+        """Sorted neighbours of node"""
+        start, end = self._bounds(node)
+        return self.neighbours[start:end]
+
+    def has_edge(self, node, neighbour):
+        """There is an edge from node to neighbour"""
+        start, end = self._bounds(node)
+        index = bisect_left(self.neighbours, neighbour, start, end)
+        return index < end and self.neighbours[index] == neighbour
+
+    def edges(self):
+        """Iterate the (node, neighbour) pairs in order"""
+        for index, node in enumerate(self.nodes):
+            for position in range(self.offsets[index], self.offsets[index + 1]):
+                yield node, self.neighbours[position]
+
+
+def _contains(items, value):
+    """The sorted list items contains value"""
+    index = bisect_left(items, value)
+    return index < len(items) and items[index] == value
+
+
+class DeltaAdjacency:
+    """
+    Overlay of recent edge insertions and deletions on top of a read-only adjacency (any object with `neighbours_of`,
+    `has_edge`, `edges` and `len`). The changes are kept per node in sorted lists that are replaced instead of
+    mutated, so readers never see a list half updated. Reads merge the base with the overlay.
+    """
+
+    def __init__(self, base=None):
+        self.base = base if base is not None else CompressedAdjacency()
+        self.added = {}
+        self.removed = {}
+        self.size = 0
+        self._edge_count = len(self.base)
+
+    def __len__(self):
+        return self._edge_count
+
+    def _insert(self, changes, node, neighbour):
+        """Add neighbour to the changes of node"""
+        items = list(changes.get(node, ()))
+        insort(items, neighbour)
+        changes[node] = items
+        self.size += 1
+
+    def _discard(self, changes, node, neighbour):
+        """Remove neighbour from the changes of node"""
+        items = [item for item in changes[node] if item != neighbour]
+        if items:
+            changes[node] = items
+        else:
+            del changes[node]
+        self.size -= 1
+
+    def add(self, node, neighbour):
+        """Record an inserted edge, return False if the edge already existed"""
+        if _contains(self.removed.get(node, ()), neighbour):
+            self._discard(self.removed, node, neighbour)
+        elif self.has_edge(node, neighbour):
+            return False
+        else:
+            self._insert(self.added, node, neighbour)
+
+        self._edge_count += 1
+        return True
+
+    def remove(self, node, neighbour):
+        """Record a deleted edge, return False if the edge did not exist"""
+        if _contains(self.added.get(node, ()), neighbour):
+            self._discard(self.added, node, neighbour)
+        elif self.has_edge(node, neighbour):
+            self._insert(self.removed, node, neighbour)
+        else:
+            return False
+
+        self._edge_count -= 1
+        return True
+
+    def neighbours_of(self, node):
+        """Sorted neighbours of node"""
+        neighbours = self.base.neighbours_of(node)
+        added = self.added.get(node)
+        removed = self.removed.get(node)
+
+        if removed:
+            removed = set(removed)
+            neighbours = [neighbour for neighbour in neighbours if neighbour not in removed]
+        if added:
+            neighbours = list(heapq.merge(neighbours, added))
+
+        return neighbours
+
+    def has_edge(self, node, neighbour):
+        """There is an edge from node to neighbour"""
+        if _contains(self.added.get(node, ()), neighbour):
+            return True
+        if _contains(self.removed.get(node, ()), neighbour):
+            return False
+        return self.base.has_edge(node, neighbour)
+
+    def edges(self):
+        """Iterate the (node, neighbour) pairs in order"""
+        added = sorted((node, neighbour) for node, items in self.added.items() for neighbour in items)
+        removed = {(node, neighbour) for node, items in self.removed.items() for neighbour in items}
+
+        for edge in heapq.merge(self.base.edges(), added):
+            if edge not in removed:
+                yield edge
+
+    def copy(self):
+        """Copy of the overlay sharing the base. The per node lists are never mutated, so they are shared too."""
+        overlay = DeltaAdjacency(self.base)
+        overlay.added = dict(self.added)
+        overlay.removed = dict(self.removed)
+        overlay.size = self.size
+        overlay._edge_count = self._edge_count
+        return overlay
+
+    def compacted(self):
+        """New base adjacency with the overlay folded in"""
+        return CompressedAdjacency.from_sorted_edges(self.edges())
+
+
+class FriendGraph:
+    """Friendships indexed in both directions, as compressed base arrays plus an overlay of recent changes"""
+
+    def __init__(self, forward=None, backward=None, generation=None):
+        self.forward = DeltaAdjacency(forward)
+        self.backward = DeltaAdjacency(backward)
+        # Friend graph generation the graph was loaded in
+        self.generation = generation
+
+    @property
+    def edge_count(self):
+        """Number of friendships"""
+        return len(self.forward)
+
+    @property
+    def overlay_size(self):
+        """Number of friendship changes not yet folded into the base arrays"""
+        return self.forward.size
+
+    @classmethod
+    def from_edges(cls, edges):
+        """Build the graph from (user_id, is_friend_of_id) pairs in any order"""
+        edges = list(edges)
+        forward = CompressedAdjacency.from_sorted_edges(sorted(edges))
+        backward = CompressedAdjacency.from_sorted_edges(sorted((friend, user) for user, friend in edges))
+        return cls(forward, backward)
+
+    @classmethod
+    def load(cls):
+        """
+        Load the friendships table, streaming it once in order. Both directions come from the same query, so they
+        always hold the same friendships, the backward one is transposed in memory.
+        """
+        friend_model = apps.get_model('accounts', 'Friend')
+        edges = friend_model.objects.order_by('user_id', 'is_friend_of_id'). \
+            values_list('user_id', 'is_friend_of_id').iterator(chunk_size=LOAD_CHUNK_SIZE)
+        forward = CompressedAdjacency.from_sorted_edges(edges)
+        return cls(forward, forward.transposed())
+
+    def friends(self, user_id):
+        """Ids of the friends of user_id"""
+        return list(self.forward.neighbours_of(user_id))
+
+    def followers(self, user_id):
+        """Ids of the users that are friends of user_id"""
+        return list(self.backward.neighbours_of(user_id))
+
+    def are_friends(self, user_id, possible_friend_id):
+        """The user_id is friend of possible_friend_id"""
+        return self.forward.has_edge(user_id, possible_friend_id)
+
+    def apply(self, entry):
+        """
+        Apply a friendship change
+        :param entry: A tuple (created, user_id, is_friend_of_id), created is False for a deleted friendship
+        """
+        created, user_id, friend_id = entry
+        if created:
+            if self.forward.add(user_id, friend_id):
+                self.backward.add(friend_id, user_id)
+        elif self.forward.remove(user_id, friend_id):
+            self.backward.remove(friend_id, user_id)
+
+    def copy(self):
+        """Copy of the graph that does not see later changes"""
+        graph = FriendGraph(generation=self.generation)
+        graph.forward = self.forward.copy()
+        graph.backward = self.backward.copy()
+        return graph
+
+    def compacted(self):
+        """New graph with the overlay folded into the base arrays"""
+        return FriendGraph(self.forward.compacted(), self.backward.compacted(), self.generation)
+
+
+class FriendGraphIndex:
+    """
+    Process level holder of the friend graph. It is loaded on first use and reloaded once it is invalidated or
+    older than FRIEND_GRAPH_INDEX_MAX_AGE seconds, so writes made by other processes are eventually seen.
+
+    Committed friendship changes are applied to the overlay of the graph. When the overlay grows over
+    FRIEND_GRAPH_INDEX_COMPACTION_THRESHOLD a background thread folds a copy of it into new base arrays; the changes
+    applied meanwhile are appended to a delta log and replayed on the new graph before it replaces the current one. The
+    log is bounded to the threshold too, a compaction outrun by the changes is given up.
+
+    The generations the friend graph is moved to by the friendship changes of the process are recorded, once the
+    change is applied when it is committed, and the graph follows them while there is no gap, so the values computed
+    from it are cached again right after a local write. A generation moved to by another process is a gap, the graph
+    stays older than the current generation and nothing computed from it is cached until it is reloaded.
+    """
+
+    def __init__(self):
+        self._graph = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._log = None
+        self._compacting = False
+        self._generations = set()
+
+    def _is_stale(self):
+        """The graph must be (re)loaded"""
+        return self._graph is None or time.monotonic() - self._loaded_at > settings.FRIEND_GRAPH_INDEX_MAX_AGE
+
+    def get(self):
+        """Current friend graph"""
+        if self._is_stale():
+            with self._lock:
+                if self._is_stale():
+                    # Read before the load, a friendship changed meanwhile makes the graph older than the generation
+                    generation = graph_generation()
+                    graph = FriendGraph.load()
+                    graph.generation = generation
+                    self._graph = graph
+                    self._loaded_at = time.monotonic()
+                    self._log = None
+                    self._generations = set()
+        return self._graph
+
+    def invalidate(self):
+        """Drop the graph, it will be loaded again on next use"""
+        with self._lock:
+            self._graph = None
+            self._log = None
+            self._generations = set()
+
+    def _advance(self, generation):
+        """
+        Record a generation moved to by the process and move the graph up to the last one without gaps. It is called
+        with the lock held.
+        """
+        graph = self._graph
+        if graph is None or generation is None or graph.generation is None or generation <= graph.generation:
+            return
+
+        self._generations.add(generation)
+        while graph.generation + 1 in self._generations:
+            graph.generation += 1
+            self._generations.discard(graph.generation)
+
+        if len(self._generations) > LOCAL_GENERATIONS_LIMIT:
+            self._generations.clear()
+
+    def note_generation(self, generation):
+        """
+        Record a generation moved to by the process without changing the committed friendships, e.g. at once by a
+        writing transaction
+        """
+        with self._lock:
+            self._advance(generation)
+
+    def _apply(self, entries, generation=None):
+        """
+        Apply friendship changes, logging them during a compaction and starting one if the overlay is too big
+        :param entries: List of (created, user_id, is_friend_of_id) changes
+        :param generation: Generation the friend graph was moved to on commit of the changes
+        """
+        with self._lock:
+            graph = self._graph
+            if graph is None:
+                return
+
+            for entry in entries:
+                graph.apply(entry)
+            self._advance(generation)
+
+            if self._log is not None:
+                self._log.extend(entries)
+                if len(self._log) > settings.FRIEND_GRAPH_INDEX_COMPACTION_THRESHOLD:
+                    self._log = None
+
+            compact = not self._compacting and graph.overlay_size >= settings.FRIEND_GRAPH_INDEX_COMPACTION_THRESHOLD
+
+        if compact:
+            threading.Thread(target=self.compact, name='friend-graph-compaction', daemon=True).start()
+
+    def add_friendships(self, friendships, generation=None):
+        """Apply created friendships, given as (user_id, is_friend_of_id) pairs, committed in generation"""
+        self._apply([(True, user_id, friend_id) for user_id, friend_id in friendships], generation)
+
+    def remove_friendships(self, friendships, generation=None):
+        """Apply deleted friendships, given as (user_id, is_friend_of_id) pairs, committed in generation"""
+        self._apply([(False, user_id, friend_id) for user_id, friend_id in friendships], generation)
+
+    def compact(self):
+        """
+        Fold the overlay of the graph into new base arrays
+        :return: False if there is no graph or a compaction is already running
+        """
+        with self._lock:
+            graph = self._graph
+            if graph is None or self._compacting:
+                return False
+
+            self._compacting = True
+            snapshot = graph.copy()
+            self._log = []
+
+        try:
+            compacted = snapshot.compacted()
+
+            with self._lock:
+                # The graph could have been reloaded or invalidated meanwhile, or the log given up, then the compaction
+                # is useless
+                if self._graph is graph and self._log is not None:
+                    for entry in self._log:
+                        compacted.apply(entry)
+                    compacted.generation = graph.generation
+                    self._graph = compacted
+        finally:
+            with self._lock:
+                self._log = None
+                self._compacting = False
+
+        return True
+
+    def stats(self):
+        """Size of the graph of the process"""
+        graph = self._graph
+        if graph is None:
+            return {'loaded': False, 'friendships': 0, 'overlay_size': 0, 'compacting': self._compacting}
+        return {'loaded': True, 'friendships': graph.edge_count, 'overlay_size': graph.overlay_size,
+                'compacting': self._compacting}
+
+
+friend_graph_index = FriendGraphIndex()
+
+
+def get_friend_graph():
+    """
+    The friend graph of the process or None if the index is disabled. The values computed from it are cached only
+    while its generation is the current one: after the friendship changes of the process, but not after those of other
+    processes, which are missing until it reloads.
+    """
+    if not settings.FRIEND_GRAPH_INDEX:
+        return None
+    graph = friend_graph_index.get()
+    computed_from(graph.generation)
+    return graph
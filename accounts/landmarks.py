@@ -0,0 +1,187 @@
+"""Accounts landmark distance oracle"""
+import json
+import math
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+
+# Distance stored for the users a landmark does not reach, or that do not reach it
+UNREACHABLE = 0xFFFF
+
+FILE_MAGIC = b'LMIDX1\n'
+
+
+def _distances(adjacency, source, positions, count):
+    """
+    Level by level BFS from source over an adjacency
+    :param adjacency: Object with neighbours_of, like CompressedAdjacency or DeltaAdjacency
+    :param source: Id of the landmark
+    :param positions: Function that returns the position of a user id in the index, or None
+    :param count: Number of users in the index
+    :return: Array with the distance of each position, UNREACHABLE if it is not reached
+    """
+    distances = array('H', [UNREACHABLE]) * count
+    distances[positions(source)] = 0
+    frontier = [source]
+    distance = 0
+
+    while frontier and distance < UNREACHABLE - 1:
+        distance += 1
+        next_frontier = []
+        for node in frontier:
+            for neighbour in adjacency.neighbours_of(node):
+                position = positions(neighbour)
+                if distances[position] == UNREACHABLE:
+                    distances[position] = distance
+                    next_frontier.append(neighbour)
+        frontier = next_frontier
+
+    return distances
+
+
+class LandmarkIndex:
+    """
+    Distances from and to a few landmark users, in compact arrays of 2 bytes per user and landmark. For any landmark
+    L and users u, v the triangle inequality bounds the distance d(u, v):
+        upper: d(u, L) + d(L, v)
+        lower: d(L, v) - d(L, u) and d(u, L) - d(v, L)
+    and if L reaches u but not v, or v reaches L but u does not, then u has no connection with v.
+    """
+
+    def __init__(self, user_ids, landmarks, forward, backward, built_at=None):
+        """
+        :param user_ids: Sorted array of the ids of the users of the index
+        :param landmarks: Ids of the landmarks
+        :param forward: Per landmark, the distance from the landmark to each user
+        :param backward: Per landmark, the distance from each user to the landmark
+        :param built_at: Unix time of the build
+        """
+        self.user_ids = user_ids
+        self.landmarks = landmarks
+        self.forward = forward
+        self.backward = backward
+        self.built_at = built_at if built_at is not None else time.time()
+
+    def position(self, user_id):
+        """Position of a user in the arrays, None if the user is not in the index"""
+        index = bisect_left(self.user_ids, user_id)
+        if index < len(self.user_ids) and self.user_ids[index] == user_id:
+            return index
+        return None
+
+    @classmethod
+    def build(cls, graph, user_ids, count):
+        """
+        Compute the distances of the count users with more friendships
+        :param graph: FriendGraph
+        :param user_ids: Ids of every user
+        :param count: Number of landmarks
+        :return: LandmarkIndex
+        """
+        degrees = {}
+        for user_id, friend_id in graph.forward.edges():
+            degrees[user_id] = degrees.get(user_id, 0) + 1
+            degrees[friend_id] = degrees.get(friend_id, 0) + 1
+        # The users of the graph are indexed even if they were deleted after it was loaded, so it has no unknown ids
+        user_ids = array('q', sorted(set(user_ids).union(degrees)))
+        landmarks = sorted(degrees, key=lambda user_id: (-degrees[user_id], user_id))[:count]
+
+        index = cls(user_ids, landmarks, [], [])
+        for landmark in landmarks:
+            index.forward.append(_distances(graph.forward, landmark, index.position, len(user_ids)))
+            index.backward.append(_distances(graph.backward, landmark, index.position, len(user_ids)))
+        return index
+
+    def bounds(self, user_id, other_user_id):
+        """
+        Bounds of the distance from user to other_user
+        :return: A tuple (lower, upper), lower is math.inf if there is surely no connection and upper is math.inf
+            if no landmark links both users
+        """
+        if user_id == other_user_id:
+            return 0, 0
+
+        position, other_position = self.position(user_id), self.position(other_user_id)
+        lower, upper = 1, math.inf
+        if position is None or other_position is None:
+            return lower, upper
+
+        for forward, backward in zip(self.forward, self.backward):
+            from_landmark, other_from_landmark = forward[position], forward[other_position]
+            to_landmark, other_to_landmark = backward[position], backward[other_position]
+
+            if (from_landmark != UNREACHABLE and other_from_landmark == UNREACHABLE) or \
+                    (other_to_landmark != UNREACHABLE and to_landmark == UNREACHABLE):
+                return math.inf, math.inf
+
+            if to_landmark != UNREACHABLE and other_from_landmark != UNREACHABLE:
+                upper = min(upper, to_landmark + other_from_landmark)
+            if from_landmark != UNREACHABLE and other_from_landmark != UNREACHABLE:
+                lower = max(lower, other_from_landmark - from_landmark)
+            if to_landmark != UNREACHABLE and other_to_landmark != UNREACHABLE:
+                lower = max(lower, to_landmark - other_to_landmark)
+
+        return lower, upper
+
+    def save(self, path):
+        """Write the index to path, replacing it at once"""
+        header = json.dumps({'users': len(self.user_ids), 'landmarks': self.landmarks, 'built_at': self.built_at})
+        temporary = f'{path}.tmp'
+
+        with open(temporary, 'wb') as index_file:
+            index_file.write(FILE_MAGIC)
+            index_file.write(header.encode() + b'\n')
+            self.user_ids.tofile(index_file)
+            for distances in [*self.forward, *self.backward]:
+                distances.tofile(index_file)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read an index written by save"""
+        with open(path, 'rb') as index_file:
+            if index_file.readline() != FILE_MAGIC:
+                raise ValueError(f'{path} is not a landmark index')
+            header = json.loads(index_file.readline())
+            count = header['users']
+
+            user_ids = array('q')
+            user_ids.fromfile(index_file, count)
+            arrays = []
+            for _ in range(2 * len(header['landmarks'])):
+                distances = array('H')
+                distances.fromfile(index_file, count)
+                arrays.append(distances)
+
+        half = len(header['landmarks'])
+        return cls(user_ids, header['landmarks'], arrays[:half], arrays[half:], header['built_at'])
+
+
+class LandmarkIndexHolder:
+    """Process level holder of the landmark index file, loaded on first use and again when the file changes"""
+
+    def __init__(self):
+        self._index = None
+        self._modified_at = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Current landmark index, None if it has not been built"""
+        try:
+            modified_at = os.stat(settings.LANDMARK_INDEX_PATH).st_mtime
+        except OSError:
+            return None
+
+        if modified_at != self._modified_at:
+            with self._lock:
+                if modified_at != self._modified_at:
+                    self._index = LandmarkIndex.load(settings.LANDMARK_INDEX_PATH)
+                    self._modified_at = modified_at
+        return self._index
+
+
+landmark_index = LandmarkIndexHolder()
@@ -0,0 +1,85 @@
+"""Benchmark api command"""
+import json
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from accounts.benchmark import ApiBenchmark, compare, SCENARIOS
+from accounts.graph import friend_graph_index
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    """Benchmark the accounts hot paths over generated graphs of several sizes, in a test database"""
+    help = 'Measure the latency percentiles and the queries of the accounts api, optionally failing on regressions ' \
+           'against a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000', help='Comma separated number of users of each graph')
+        parser.add_argument('--model', default='barabasi-albert', help='Random graph model of generate_social_graph')
+        parser.add_argument('--degree', type=int, default=5, help='Degree of the graph model')
+        parser.add_argument('--requests', type=int, default=50, help='Requests per scenario and graph')
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Comma separated scenarios')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the graphs and of the requests')
+        parser.add_argument('--output', default='benchmark.json', help='File where the results are written')
+        parser.add_argument('--baseline', help='Results of a previous run to compare with')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Fraction the p95 latency can grow over the baseline')
+
+    def _run(self, sizes, scenarios, options):
+        """Generate each graph after the previous one and benchmark it"""
+        results = {}
+        start = 0
+
+        for size in sizes:
+            call_command('generate_social_graph', options['model'], size, '--degree', options['degree'],
+                         '--seed', options['seed'], '--start', start, stdout=StringIO())
+            start += size
+            cache.clear()
+            friend_graph_index.invalidate()
+
+            # The users of the graph just generated are the last ones
+            user_ids = list(User.objects.order_by('-pk').values_list('pk', flat=True)[:size])[::-1]
+            results[str(size)] = ApiBenchmark(user_ids, options['requests'], options['seed']).run(scenarios)
+
+            for scenario, summary in results[str(size)].items():
+                self.stdout.write(f"{scenario} ({size} users): p50 {summary['p50_ms']}ms, "
+                                  f"p95 {summary['p95_ms']}ms, queries {summary['queries_max']}, "
+                                  f"errors {summary['errors']}")
+
+        return results
+
+    def handle(self, *args, **options):
+        """Run the benchmark in a test database, write the results and compare them with the baseline"""
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        scenarios = options['scenarios'].split(',')
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as baseline_file:
+                baseline = json.load(baseline_file)
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            results = self._run(sizes, scenarios, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        with open(options['output'], 'w', encoding='utf-8') as output_file:
+            json.dump(results, output_file, indent=2)
+        self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            regressions = compare(results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions against the baseline:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
@@ -0,0 +1,53 @@
+"""Benchmark serializers command"""
+import json
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from accounts.benchmark import SerializationBenchmark, SERIALIZATIONS
+
+
+class Command(BaseCommand):
+    """Benchmark the serialization of the lists before and after the values serializers, in a test database"""
+    help = 'Measure the rows per second the lists are loaded, serialized and rendered with the model serializers and ' \
+           'JSONRenderer and with the values serializers and FastJSONRenderer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Number of users of the generated graph')
+        parser.add_argument('--degree', type=int, default=5, help='Degree of the graph model')
+        parser.add_argument('--rows', type=int, default=1000, help='Rows of each list')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs of each measure, the fastest one is kept')
+        parser.add_argument('--serializations', default=','.join(SERIALIZATIONS),
+                            help='Comma separated serializations')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the graph')
+        parser.add_argument('--output', default='serialization.json', help='File where the results are written')
+
+    def handle(self, *args, **options):
+        """Generate a graph in a test database, measure the serializations and write the results"""
+        serializations = options['serializations'].split(',')
+        unknown = set(serializations) - set(SERIALIZATIONS)
+        if unknown:
+            raise CommandError(f"Unknown serializations: {', '.join(sorted(unknown))}")
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            call_command('generate_social_graph', 'barabasi-albert', options['users'], '--degree', options['degree'],
+                         '--seed', options['seed'], stdout=StringIO())
+            cache.clear()
+            results = SerializationBenchmark(options['rows'], options['repeat']).run(serializations)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        for serialization, result in results.items():
+            self.stdout.write(f"{serialization} ({result['rows']} rows): {result['before_rows_per_second']} rows/s "
+                              f"before, {result['after_rows_per_second']} rows/s after, x{result['speedup']}")
+
+        with open(options['output'], 'w', encoding='utf-8') as output_file:
+            json.dump(results, output_file, indent=2)
+        self.stdout.write(f"Results written to {options['output']}")
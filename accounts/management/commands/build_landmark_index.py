@@ -0,0 +1,32 @@
+"""Build landmark index command"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from accounts.graph import FriendGraph, LOAD_CHUNK_SIZE
+from accounts.landmarks import LandmarkIndex
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    """Precompute the distances from and to the users with more friendships"""
+    help = 'Build the landmark index used by the distance bounds, run it again to see the friendship changes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--landmarks', type=int, default=16, help='Number of landmarks')
+        parser.add_argument('--output', default=settings.LANDMARK_INDEX_PATH, help='File of the index')
+
+    def handle(self, *args, **options):
+        """Load the friend graph, run a BFS per landmark and direction and write the index"""
+        started = time.monotonic()
+        graph = FriendGraph.load()
+        user_ids = User.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=LOAD_CHUNK_SIZE)
+
+        index = LandmarkIndex.build(graph, user_ids, options['landmarks'])
+        index.save(options['output'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Landmarks: {len(index.landmarks)}, users: {len(index.user_ids)}, friendships: {graph.edge_count}, "
+            f"in {time.monotonic() - started:.3f}s, written to {options['output']}"
+        ))
@@ -0,0 +1,113 @@
+"""Generate social graph command"""
+import io
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from accounts.cache import bump_graph_generation, bump_resource_versions
+from accounts.components import component_index
+from accounts.graph import friend_graph_index
+from accounts.models import Friend
+from accounts.provisioning import provision_users
+from accounts.seeding import generate_users, erdos_renyi_edges, barabasi_albert_edges, watts_strogatz_edges, \
+    chunked
+
+MODELS = ('erdos-renyi', 'barabasi-albert', 'watts-strogatz')
+
+# Users and profiles inserted per transaction
+USERS_CHUNK_SIZE = 5000
+
+# Friendships inserted per transaction
+FRIENDSHIPS_CHUNK_SIZE = 100000
+
+
+def copy_friendships(friendships):
+    """Insert friendships with a single COPY FROM STDIN, only for PostgreSQL"""
+    buffer = io.StringIO(''.join(f'{user_id}\t{friend_id}\n' for user_id, friend_id in friendships))
+    table = connection.ops.quote_name(Friend._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.cursor.copy_expert(f'COPY {table} (user_id, is_friend_of_id) FROM STDIN', buffer)
+
+
+def insert_friendships(friendships):
+    """Insert friendships executing a single prepared INSERT for all of them, without building model instances"""
+    table = connection.ops.quote_name(Friend._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.executemany(f'INSERT INTO {table} (user_id, is_friend_of_id) VALUES (%s, %s)', friendships)
+
+
+class Command(BaseCommand):
+    """Write a synthetic social graph to the database for benchmarking"""
+    help = 'Create users with their profiles and the friendships of a random graph model, without going through ' \
+           'the api. The running servers see the new friendships at once only if they share the cache ' \
+           '(CACHE_BACKEND), otherwise once their caches and indexes expire'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=MODELS, help='Random graph model')
+        parser.add_argument('users', type=int, help='Number of users')
+        parser.add_argument('--degree', type=int, default=10,
+                            help='Average links per user (erdos-renyi), links of each new user (barabasi-albert) or '
+                                 'nearest users linked in the ring (watts-strogatz)')
+        parser.add_argument('--rewiring', type=float, default=0.1,
+                            help='Probability of moving each link of the ring (watts-strogatz)')
+        parser.add_argument('--directed', action='store_true',
+                            help='Create a single friendship per link, by default the users are friends of each other')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the generator')
+        parser.add_argument('--start', type=int, default=0,
+                            help='Index of the first user, use it to generate a graph in a database already seeded')
+        parser.add_argument('--password', default='top_secret!', help='Password of every user, hashed once')
+
+    def _links(self, options):
+        """Links of the chosen model between user indexes"""
+        count, degree, seed = options['users'], options['degree'], options['seed']
+
+        if options['model'] == 'erdos-renyi':
+            return erdos_renyi_edges(count, degree, seed)
+
+        if options['model'] == 'barabasi-albert':
+            if not 0 < degree < count:
+                raise CommandError('The degree of barabasi-albert must be between 1 and the number of users - 1')
+            return barabasi_albert_edges(count, degree, seed)
+
+        if not 0 <= options['rewiring'] <= 1:
+            raise CommandError('The rewiring probability must be between 0 and 1')
+        return watts_strogatz_edges(count, degree, options['rewiring'], seed)
+
+    def handle(self, *args, **options):
+        """Create the users and profiles, then load the friendships a chunk per transaction"""
+        started = time.monotonic()
+        links = self._links(options)
+        encoded_password = make_password(options['password'])
+
+        user_ids = []
+        users = generate_users(options['users'], options['seed'], options['start'], options['password'])
+        for rows in chunked(users, USERS_CHUNK_SIZE):
+            user_ids.extend(user.pk for user in provision_users(rows, encoded_password))
+        self.stdout.write(f'Users: {len(user_ids)} in {time.monotonic() - started:.3f}s')
+
+        def friendships():
+            for node, other in links:
+                yield user_ids[node], user_ids[other]
+                if not options['directed']:
+                    yield user_ids[other], user_ids[node]
+
+        load = copy_friendships if connection.vendor == 'postgresql' else insert_friendships
+        created = 0
+        for chunk in chunked(friendships(), FRIENDSHIPS_CHUNK_SIZE):
+            with transaction.atomic():
+                load(chunk)
+            created += len(chunk)
+
+        # The rows are loaded bypassing the signals, the cached connections, the indexes and the versions of the
+        # profiles and friends lists of the users are stale. Nobody else is a friend of the new users.
+        bump_graph_generation()
+        friend_graph_index.invalidate()
+        component_index.invalidate()
+        for chunk in chunked(user_ids, USERS_CHUNK_SIZE):
+            bump_resource_versions([(kind, user_id) for user_id in chunk for kind in ('profile', 'friends')])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Users: {len(user_ids)}, friendships: {created}, in {time.monotonic() - started:.3f}s'
+        ))
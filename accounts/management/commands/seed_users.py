@@ -0,0 +1,52 @@
+"""Seed users command"""
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import Friend
+from accounts.provisioning import provision_users
+from accounts.seeding import generate_users, generate_friendships, chunked
+from accounts.signals import friendships_created
+
+
+class Command(BaseCommand):
+    """Write a deterministic dataset of users, profiles and friendships directly to the database"""
+    help = 'Create users with their profiles and friendships in bulk, without going through the api'
+
+    def add_arguments(self, parser):
+        parser.add_argument('users', type=int, help='Number of users')
+        parser.add_argument('friends', type=int, help='Number of friends of each user')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the generator')
+        parser.add_argument('--start', type=int, default=0,
+                            help='Index of the first user, use it to add users to a dataset already seeded')
+        parser.add_argument('--password', help='Password of every user, hashed once. By default each user has its '
+                                               'own password, and all of them are hashed')
+        parser.add_argument('--batch-size', type=int, default=settings.BULK_CREATE_BATCH_SIZE,
+                            help='Rows inserted per transaction')
+
+    def handle(self, *args, **options):
+        """Create the users and profiles, then the friendships, a batch per transaction"""
+        started = time.monotonic()
+        batch_size = options['batch_size']
+        encoded_password = make_password(options['password']) if options['password'] else None
+
+        user_ids = []
+        users = generate_users(options['users'], options['seed'], options['start'], options['password'])
+        for rows in chunked(users, batch_size):
+            user_ids.extend(user.pk for user in provision_users(rows, encoded_password))
+        self.stdout.write(f'Users: {len(user_ids)} in {time.monotonic() - started:.3f}s')
+
+        created = 0
+        for friendships in chunked(generate_friendships(user_ids, options['friends'], options['seed']), batch_size):
+            with transaction.atomic():
+                Friend.objects.bulk_create([Friend(user_id=user_id, is_friend_of_id=friend_id)
+                                            for user_id, friend_id in friendships], ignore_conflicts=True)
+                friendships_created.send(sender=Friend, friendships=friendships, using=Friend.objects.db)
+            created += len(friendships)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Users: {len(user_ids)}, friendships: {created}, in {time.monotonic() - started:.3f}s'
+        ))
@@ -0,0 +1,214 @@
+"""Accounts metrics registry, exposed in the Prometheus text format"""
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    """Escape a label value"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    """Labels of a sample, like {view="x",le="1"}"""
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    """Monotonic counter per label values"""
+    kind = 'counter'
+
+    def __init__(self, registry, name, documentation, labels=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+
+    def inc(self, value=1, **labels):
+        """Increase the counter of the labels"""
+        key = tuple(str(labels[label]) for label in self.labels)
+        with self.registry.lock:
+            values = self.registry.values_of(self.name)
+            values[key] = values.get(key, 0) + value
+        self.registry.maybe_flush()
+
+    @staticmethod
+    def merge(value, other):
+        """Sum of the values of two processes"""
+        return value + other
+
+    def samples(self, key, value):
+        """Lines of the exposition of a value"""
+        yield f'{self.name}{_format_labels(self.labels, key)} {value}'
+
+
+class Histogram:
+    """Distribution of observations per label values, as counts per bucket plus their sum"""
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labels=(), buckets=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        """Add an observation to the histogram of the labels"""
+        key = tuple(str(labels[label]) for label in self.labels)
+        index = bisect_left(self.buckets, value)
+        with self.registry.lock:
+            values = self.registry.values_of(self.name)
+            # Counts of each bucket (not cumulative) and of the +Inf bucket, then the sum of the observations
+            histogram = values.setdefault(key, [0] * (len(self.buckets) + 1) + [0])
+            histogram[index] += 1
+            histogram[-1] += value
+        self.registry.maybe_flush()
+
+    @staticmethod
+    def merge(value, other):
+        """Sum of the values of two processes"""
+        return [first + second for first, second in zip(value, other)]
+
+    def samples(self, key, value):
+        """Lines of the exposition of a value, with cumulative buckets"""
+        cumulative = 0
+        for bound, count in zip([*self.buckets, '+Inf'], value[:-1]):
+            cumulative += count
+            yield f'{self.name}_bucket{_format_labels(self.labels, key, [("le", bound)])} {cumulative}'
+        yield f'{self.name}_sum{_format_labels(self.labels, key)} {value[-1]}'
+        yield f'{self.name}_count{_format_labels(self.labels, key)} {cumulative}'
+
+
+class MetricsRegistry:
+    """
+    Metrics of this process. When METRICS_DIR is set every process writes its values to its own file at most once
+    per METRICS_FLUSH_INTERVAL seconds and the exposition adds up the files of all the processes, so any gunicorn
+    worker can serve the metrics of all of them. The values of a process inherited by a forked child are dropped in
+    the child, they are already counted by its parent.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self._values = {}
+        self._pid = os.getpid()
+        self._flushed_at = 0.0
+
+    def counter(self, name, documentation, labels=()):
+        """Register a counter"""
+        self.metrics[name] = Counter(self, name, documentation, labels)
+        return self.metrics[name]
+
+    def histogram(self, name, documentation, labels=(), buckets=()):
+        """Register a histogram"""
+        self.metrics[name] = Histogram(self, name, documentation, labels, buckets)
+        return self.metrics[name]
+
+    def values_of(self, name):
+        """Values of a metric in this process, the lock must be held"""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._values = {}
+        return self._values.setdefault(name, {})
+
+    def snapshot(self):
+        """Copy of the values of this process"""
+        with self.lock:
+            return {name: {key: list(value) if isinstance(value, list) else value for key, value in values.items()}
+                    for name, values in self._values.items()}
+
+    def reset(self):
+        """Drop the values of this process"""
+        with self.lock:
+            self._values = {}
+
+    def _path(self):
+        """File of the values of this process"""
+        return os.path.join(settings.METRICS_DIR, f'metrics-{os.getpid()}.json')
+
+    def flush(self):
+        """Write the values of this process to its file, replacing it at once so readers never see it half written"""
+        data = {name: [[list(key), value] for key, value in values.items()]
+                for name, values in self.snapshot().items()}
+        path = self._path()
+        temporary = f'{path}.{threading.get_ident()}.tmp'
+
+        with open(temporary, 'w', encoding='utf-8') as metrics_file:
+            json.dump(data, metrics_file)
+        os.replace(temporary, path)
+        self._flushed_at = time.monotonic()
+
+    def maybe_flush(self):
+        """Flush if there is a metrics directory and the last flush is old enough"""
+        if settings.METRICS_DIR and time.monotonic() - self._flushed_at > settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def collect(self):
+        """Values of every process, or of this one without metrics directory"""
+        if not settings.METRICS_DIR:
+            return self.snapshot()
+
+        self.flush()
+        collected = {}
+        for path in glob.glob(os.path.join(settings.METRICS_DIR, 'metrics-*.json')):
+            try:
+                with open(path, encoding='utf-8') as metrics_file:
+                    data = json.load(metrics_file)
+            except (OSError, ValueError):
+                # The file of a process that is starting or was removed meanwhile
+                continue
+
+            for name, items in data.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                values = collected.setdefault(name, {})
+                for key, value in items:
+                    key = tuple(key)
+                    values[key] = metric.merge(values[key], value) if key in values else value
+
+        return collected
+
+    def render(self):
+        """Exposition of the metrics in the Prometheus text format"""
+        collected = self.collect()
+        lines = []
+
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for key, value in sorted(collected.get(name, {}).items()):
+                lines.extend(metric.samples(key, value))
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    'api_http_requests_total', 'Requests served per url name, method and status code', ('view', 'method', 'status'))
+http_request_duration = registry.histogram(
+    'api_http_request_duration_seconds', 'Time to serve a request per url name', ('view',),
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+bfs_nodes_visited = registry.histogram(
+    'api_bfs_nodes_visited', 'Users reached by a friends connections search per kind of search', ('search',),
+    (10, 100, 1000, 10000, 100000, 1000000))
+bfs_frontier_size = registry.histogram(
+    'api_bfs_frontier_size', 'Users of each level expanded by the friends connections searches', (),
+    (1, 10, 100, 1000, 10000, 100000))
+bfs_path_length = registry.histogram(
+    'api_bfs_path_length', 'Friendships in the connections found per kind of search', ('search',),
+    (0, 1, 2, 3, 4, 5, 6, 8, 10))
+cache_requests = registry.counter(
+    'api_cache_requests_total', 'Cache lookups per cache and result (hit or miss)', ('cache', 'result'))
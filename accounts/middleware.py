@@ -0,0 +1,144 @@
+"""Accounts middlewares"""
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from accounts.metrics import http_requests, http_request_duration
+
+# Upper bounds of the buckets of the per view histograms, the last bucket has no bound
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+SQL_TIME_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class QueryRecorder:
+    """Database execute wrapper that counts and times the statements of a request"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            # The parameters are sent apart, so the same sql is the same statement shape
+            self.statements[sql] += 1
+
+    @property
+    def duplicates(self):
+        """Statements executed again with the same shape, usually an N+1"""
+        return sum(count - 1 for count in self.statements.values())
+
+
+def _bucket(buckets, value):
+    """Label of the histogram bucket of value"""
+    index = bisect_left(buckets, value)
+    return str(buckets[index]) if index < len(buckets) else '+Inf'
+
+
+class QueryStats:
+    """Per view aggregates of the database activity of the requests served by this process"""
+
+    def __init__(self):
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def record(self, view, recorder):
+        """Add the activity of a request recorded by recorder to the aggregates of view"""
+        sql_ms = recorder.seconds * 1000
+
+        with self._lock:
+            stats = self._views.setdefault(view, {
+                'requests': 0,
+                'queries': 0,
+                'queries_max': 0,
+                'duplicates': 0,
+                'sql_ms': 0.0,
+                'queries_histogram': dict.fromkeys([*map(str, QUERY_COUNT_BUCKETS), '+Inf'], 0),
+                'sql_ms_histogram': dict.fromkeys([*map(str, SQL_TIME_BUCKETS_MS), '+Inf'], 0),
+            })
+            stats['requests'] += 1
+            stats['queries'] += recorder.count
+            stats['queries_max'] = max(stats['queries_max'], recorder.count)
+            stats['duplicates'] += recorder.duplicates
+            stats['sql_ms'] += sql_ms
+            stats['queries_histogram'][_bucket(QUERY_COUNT_BUCKETS, recorder.count)] += 1
+            stats['sql_ms_histogram'][_bucket(SQL_TIME_BUCKETS_MS, sql_ms)] += 1
+
+    def stats(self):
+        """Aggregates of every view, with the histograms counted per bucket (not cumulative)"""
+        with self._lock:
+            return {
+                view: {
+                    **stats,
+                    'sql_ms': round(stats['sql_ms'], 3),
+                    'queries_histogram': dict(stats['queries_histogram']),
+                    'sql_ms_histogram': dict(stats['sql_ms_histogram']),
+                }
+                for view, stats in self._views.items()
+            }
+
+    def reset(self):
+        """Drop the aggregates"""
+        with self._lock:
+            self._views = {}
+
+
+query_stats = QueryStats()
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Count and time the queries of every request, without DEBUG. The totals are sent in the Server-Timing header and
+    aggregated per view in query_stats. The queries of streamed responses made after the view returns are not
+    counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.QUERY_INSTRUMENTATION:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        total_ms = (time.perf_counter() - started) * 1000
+        match = request.resolver_match
+        query_stats.record(match.view_name if match else 'unresolved', recorder)
+
+        response['Server-Timing'] = f'db;dur={recorder.seconds * 1000:.3f};desc="{recorder.count} queries, ' \
+                                    f'{recorder.duplicates} duplicated", total;dur={total_ms:.3f}'
+        return response
+
+
+class RequestMetricsMiddleware:
+    """Count the requests and observe their duration per url name, method and status code"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        http_requests.inc(view=view, method=request.method, status=response.status_code)
+        http_request_duration.observe(time.perf_counter() - started, view=view)
+        return response
@@ -2,13 +2,19 @@
 from django.contrib.auth.models import AbstractUser, PermissionsMixin
 from django.db import models
 
+from accounts.graph import get_friend_graph
+
 
 class User(AbstractUser, PermissionsMixin):
     """User model"""
 
     @property
     def friends_id_list(self):
-        """Friends id list"""
+        """Friends id list, from the friendships prefetched by ProfileQuerySet.with_friends_ids if there are"""
+        friendships = getattr(self, 'prefetched_friendships', None)
+        if friendships is not None:
+            return [friendship.is_friend_of_id for friendship in friendships]
+
         return Friend.get_friends_id_list(self.id)
 
     def is_friend(self, possible_friend_id):
@@ -16,6 +22,20 @@ class User(AbstractUser, PermissionsMixin):
         return Friend.are_friends(self.id, possible_friend_id)
 
 
+class ProfileQuerySet(models.QuerySet):
+    """Profile queryset"""
+
+    def with_friends_ids(self):
+        """Profiles with their users joined and the friendships of all those users fetched with a single query"""
+        friendships = models.Prefetch('user__user', queryset=Friend.objects.order_by('is_friend_of_id'),
+                                      to_attr='prefetched_friendships')
+        return self.select_related('user').prefetch_related(friendships)
+
+    def friends_of(self, user_id):
+        """Profiles of the friends of user_id, joined through the friendships"""
+        return self.filter(user__is_friend_of__user_id=user_id)
+
+
 class Profile(models.Model):
     """Profile model"""
 
@@ -28,6 +48,8 @@ class Profile(models.Model):
     available = models.BooleanField(default=True, help_text='User is available')
     img = models.CharField(max_length=255, blank=True, null=True)
 
+    objects = ProfileQuerySet.as_manager()
+
     def __str__(self):  # pragma: no cover
         return self.user.username
 
@@ -51,9 +73,18 @@ class Friend(models.Model):
     @staticmethod
     def are_friends(user_id, possible_friend_id):
         """The user_id is friend of possible_friend_id"""
+        graph = get_friend_graph()
+        if graph is not None:
+            return graph.are_friends(user_id, getattr(possible_friend_id, 'pk', possible_friend_id))
+
         return Friend.objects.filter(user_id=user_id).filter(is_friend_of=possible_friend_id).exists()
 
     @staticmethod
     def get_friends_id_list(user_id):
-        """Friends ids of user_id"""
-        return Friend.objects.filter(user_id=user_id).values_list('is_friend_of', flat=True)
+        """Friends ids of user_id, sorted like the friend graph and the prefetched friendships"""
+        graph = get_friend_graph()
+        if graph is not None:
+            return graph.friends(user_id)
+
+        return Friend.objects.filter(user_id=user_id).order_by('is_friend_of_id').values_list('is_friend_of',
+                                                                                               flat=True)
@@ -0,0 +1,42 @@
+"""Accounts pagination"""
+import json
+
+from django.conf import settings
+from rest_framework.response import Response
+from rest_framework.pagination import CursorPagination
+
+
+class PrimaryKeyCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the primary key. Every page is a `WHERE pk > cursor ORDER BY pk LIMIT page_size` query, so
+    the rows of the previous pages are never scanned and the order is stable while the client walks the table.
+    """
+    ordering = 'pk'
+    page_size_query_param = 'page_size'
+    max_page_size = settings.PAGINATION_MAX_PAGE_SIZE
+    results_key = 'results'
+
+    def get_paginated_content(self, content):
+        """
+        JSON of the page, like get_paginated_response, with the results already rendered
+        :param content: The results rendered as a JSON array
+        :return: The JSON of the page as bytes
+        """
+        return b''.join([
+            b'{"next":', json.dumps(self.get_next_link()).encode(),
+            b',"previous":', json.dumps(self.get_previous_link()).encode(),
+            b',"', self.results_key.encode(), b'":', content, b'}',
+        ])
+
+
+class FriendsCursorPagination(PrimaryKeyCursorPagination):
+    """Keyset pagination of the friends profiles on their user id, with the page under the friends key"""
+    ordering = 'user_id'
+    results_key = 'friends'
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            self.results_key: data,
+        })
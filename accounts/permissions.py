@@ -1,8 +1,19 @@
 """Accounts custom permissions"""
-
+from django.db.models import Exists, OuterRef, Q
 from rest_framework import permissions
+from rest_framework.filters import BaseFilterBackend
+
+from accounts.cache import friend_ids_cache
+from accounts.models import User, Friend
+
 
-from accounts.models import User
+def request_friend_ids(request):
+    """Ids of the friends of the user of the request, loaded once per request"""
+    friend_ids = getattr(request, 'friend_ids', None)
+    if friend_ids is None:
+        friend_ids = friend_ids_cache.get(request.user.id)
+        request.friend_ids = friend_ids
+    return friend_ids
 
 
 class IsOwnerOrAdmin(permissions.BasePermission):
@@ -20,28 +31,47 @@ class IsOwnerOrAdmin(permissions.BasePermission):
         if isinstance(obj, User):
             return obj == user_request
 
-        if hasattr(obj, 'user'):
-            return obj.user == user_request
+        if hasattr(obj, 'user_id'):
+            return obj.user_id == user_request.id
 
         return False
 
 
 class IsOwnerOrFriendOrAdmin(permissions.BasePermission):
     """
-    Custom permission to only allow owners or admin.
+    Custom permission to only allow owners, friends of the owners or admin. The friend ids of the user of the request
+    are loaded once per request from friend_ids_cache, so checking many objects does not query once per object.
     """
 
     def has_object_permission(self, request, view, obj):
-        """Allow admin and owners"""
+        """Allow admin, owners and friends of the owners"""
         user_request = request.user
 
         if user_request.is_superuser:
             return True
 
         if isinstance(obj, User):
-            return obj == user_request or user_request.is_friend(obj.id)
+            return obj == user_request or obj.id in request_friend_ids(request)
 
-        if hasattr(obj, 'user'):
-            return obj.user == user_request or user_request.is_friend(obj.user.id)
+        if hasattr(obj, 'user_id'):
+            return obj.user_id == user_request.id or obj.user_id in request_friend_ids(request)
 
         return False
+
+
+
+class IsOwnerOrFriendOrAdminFilterBackend(BaseFilterBackend):
+    """
+    Filter of the list views with the rule of IsOwnerOrFriendOrAdmin, applied to the whole queryset with a single
+    predicate. The view can set `owner_field` to the field of the owner user id, `user_id` by default (`pk` for
+    users).
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        """Rows owned by the user of the request or by its friends, all of them for admin"""
+        if request.user.is_superuser:
+            return queryset
+
+        owner_field = getattr(view, 'owner_field', 'user_id')
+        friendship = Friend.objects.filter(user_id=request.user.id, is_friend_of_id=OuterRef(owner_field))
+        return queryset.filter(Q(**{owner_field: request.user.id}) | Q(Exists(friendship)))
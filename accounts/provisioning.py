@@ -0,0 +1,95 @@
+"""Accounts bulk provisioning"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from accounts.models import User, Profile
+
+
+def _setup_worker(settings_module):
+    """Configure Django in a hashing process, needed when the processes are spawned instead of forked"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+
+
+class PasswordHashingPool:
+    """Process pool that hashes passwords in parallel, created on first use in each worker process"""
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        """Process pool executor"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=settings.PASSWORD_HASHING_WORKERS,
+                    initializer=_setup_worker,
+                    initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'api_poc.settings'),),
+                )
+            return self._executor
+
+    def hash_passwords(self, passwords):
+        """
+        Hash passwords with the default password hasher
+        :param passwords: List of raw passwords
+        :return: List of encoded passwords, in the same order
+        """
+        workers = settings.PASSWORD_HASHING_WORKERS
+        if workers <= 1 or len(passwords) <= 1:
+            return [make_password(password) for password in passwords]
+
+        chunksize = max(1, len(passwords) // (workers * 4))
+        return list(self._get_executor().map(make_password, passwords, chunksize=chunksize))
+
+
+password_hashing_pool = PasswordHashingPool()
+
+
+def provision_users(rows, encoded_password=None):
+    """
+    Create users with their profiles in bulk. The passwords are hashed in parallel before the transaction starts,
+    then users and profiles are inserted with bulk_create in batches of BULK_CREATE_BATCH_SIZE.
+    :param rows: List of validated users, each with its password and an optional profile dict
+    :param encoded_password: Password already hashed shared by every user, the passwords of the rows are ignored
+    :return: List of the created users
+    """
+    if encoded_password is None:
+        passwords = password_hashing_pool.hash_passwords([row['password'] for row in rows])
+    else:
+        passwords = [encoded_password] * len(rows)
+    users = [
+        User(
+            username=row['username'],
+            first_name=row['first_name'],
+            last_name=row['last_name'],
+            email=row['email'],
+            password=password,
+            is_superuser=False,
+            is_staff=False,
+            is_active=True,
+        )
+        for row, password in zip(rows, passwords)
+    ]
+
+    with transaction.atomic():
+        User.objects.bulk_create(users, batch_size=settings.BULK_CREATE_BATCH_SIZE)
+
+        # Databases that can't return the ids of the inserted rows
+        if any(user.pk is None for user in users):
+            ids = dict(User.objects.filter(username__in=[user.username for user in users]).
+                       values_list('username', 'pk'))
+            for user in users:
+                user.pk = ids[user.username]
+
+        Profile.objects.bulk_create([Profile(user=user, **row['profile'])
+                                     for user, row in zip(users, rows) if row.get('profile') is not None],
+                                    batch_size=settings.BULK_CREATE_BATCH_SIZE)
+
+    return users
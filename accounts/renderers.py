@@ -0,0 +1,29 @@
+"""Accounts renderers"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# Datetimes are left to the encoder of DRF, that renders them in its own format, and the keys of the dicts are not
+# always strings, e.g. the ids of the users
+ORJSON_OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson is not None else 0
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes the compact responses with orjson when it is installed, with the same output. The
+    indented responses (e.g. of the browsable API), the ASCII only settings and the environments without orjson are
+    rendered by JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Render data into JSON, returning a bytestring"""
+        if orjson is None or data is None or not self.compact or self.ensure_ascii or \
+                self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        content = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        # Like JSONRenderer, \u2028 and \u2029 are escaped so the JSON is a strict javascript subset
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
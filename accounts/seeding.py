@@ -0,0 +1,169 @@
+"""Accounts deterministic data generator, it does not depend on Django so the seeder script can use it"""
+import math
+import random
+from array import array
+from itertools import islice
+
+FIRST_NAMES = ['Ana', 'Leo', 'Juan', 'Martha', 'Mikael', 'Roberto', 'Alberto', 'Lucia', 'Sofia', 'Pedro', 'Elena',
+               'Carlos', 'Laura', 'David', 'Marta', 'Pablo']
+LAST_NAMES = ['Doe', 'Sans', 'Small', 'Garcia', 'Lopez', 'Perez', 'Smith', 'Brown', 'Rossi', 'Muller', 'Silva',
+              'Costa', 'Novak', 'Dubois']
+CITIES = [('Paris', 'FR'), ('Oslo', 'NO'), ('Madrid', 'ES'), ('Lisbon', 'PT'), ('Havana', 'CU'), ('Boston', 'MA'),
+          ('Austin', 'TX'), ('Denver', 'CO')]
+STREETS = ['Main St', 'Oak Ave', 'Pine St', 'Maple Ave', 'Cedar Rd', 'Elm St']
+
+
+def generate_users(count, seed=0, start=0, password=None):
+    """
+    Generate users with their profiles. The same arguments always generate the same users, and users generated
+    with different start values never share username or phone.
+    :param count: Number of users
+    :param seed: Seed of the generator
+    :param start: Index of the first user, use it to add users to a dataset already seeded
+    :param password: Password of every user, None for a different password per user
+    :return: Iterator of user dicts, each with its profile dict
+    """
+    rng = random.Random(f'{seed}-{start}')
+
+    for index in range(start, start + count):
+        first_name = rng.choice(FIRST_NAMES)
+        last_name = rng.choice(LAST_NAMES)
+        city, state = rng.choice(CITIES)
+        username = f'{first_name.lower()}{last_name.lower()}{index}'
+
+        yield {
+            'username': username,
+            'first_name': first_name,
+            'last_name': last_name,
+            'email': f'{username}@example.com',
+            'password': password or f'pw{rng.getrandbits(48):012x}',
+            'profile': {
+                'phone': f'+1{index:010d}',
+                'address': f'{rng.randint(1, 999)} {rng.choice(STREETS)}',
+                'city': city,
+                'state': state,
+                'zipcode': f'{rng.randint(10000, 99999)}',
+                'img': f'https://picsum.photos/seed/{username}/128',
+                'available': rng.random() < 0.9,
+            },
+        }
+
+
+def generate_friendships(user_ids, friends_number, seed=0):
+    """
+    Generate friendships choosing at random friends_number distinct friends of each user, never the user itself
+    :param user_ids: Ids of the users
+    :param friends_number: Number of friends of each user, limited to the number of other users
+    :param seed: Seed of the generator
+    :return: Iterator of (user_id, is_friend_of_id) pairs, grouped by user
+    """
+    rng = random.Random(seed)
+    count = len(user_ids)
+    friends_number = min(friends_number, count - 1)
+
+    if friends_number <= 0:
+        return
+
+    for index, user_id in enumerate(user_ids):
+        # The positions after the user are shifted by one to skip it
+        for position in rng.sample(range(count - 1), friends_number):
+            yield user_id, user_ids[position + 1 if position >= index else position]
+
+
+def erdos_renyi_edges(count, degree, seed=0):
+    """
+    Erdos-Renyi random graph, every pair of nodes is linked with the same probability. The gaps between the linked
+    pairs are drawn from a geometric distribution (Batagelj and Brandes), so the cost is linear in the number of links.
+    :param count: Number of nodes
+    :param degree: Average number of links of a node
+    :param seed: Seed of the generator
+    :return: Iterator of (node, node) links between node indexes, each pair once
+    """
+    rng = random.Random(seed)
+    probability = degree / (count - 1) if count > 1 else 0
+
+    if probability <= 0:
+        return
+    if probability >= 1:
+        yield from ((node, other) for node in range(1, count) for other in range(node))
+        return
+
+    log_skip = math.log(1 - probability)
+    node, other = 1, -1
+    while node < count:
+        other += 1 + int(math.log(1 - rng.random()) / log_skip)
+        while other >= node and node < count:
+            other -= node
+            node += 1
+        if node < count:
+            yield node, other
+
+
+def barabasi_albert_edges(count, links, seed=0):
+    """
+    Barabasi-Albert preferential attachment graph, every new node links to `links` existing nodes chosen with a
+    probability proportional to their degree, which gives a power law degree distribution
+    :param count: Number of nodes
+    :param links: Links of each new node
+    :param seed: Seed of the generator
+    :return: Iterator of (new node, existing node) links between node indexes, each pair once
+    """
+    rng = random.Random(seed)
+    targets = list(range(links))
+    # Every node appears once per link it has, so a uniform choice in it is a choice proportional to the degree
+    repeated = array('q')
+
+    for node in range(links, count):
+        for target in targets:
+            yield node, target
+
+        repeated.extend(targets)
+        repeated.extend([node] * links)
+
+        chosen = set()
+        while len(chosen) < links:
+            chosen.add(repeated[rng.randrange(len(repeated))])
+        targets = sorted(chosen)
+
+
+def watts_strogatz_edges(count, neighbours, rewiring, seed=0):
+    """
+    Watts-Strogatz small world graph, a ring where every node links to its `neighbours` nearest nodes and then each
+    link is moved to a random node with probability `rewiring`. The links are kept in memory to avoid duplicates.
+    :param count: Number of nodes
+    :param neighbours: Nearest nodes linked to each node in the ring, an even number
+    :param rewiring: Probability of moving each link
+    :param seed: Seed of the generator
+    :return: Iterator of (node, node) links between node indexes, each pair once
+    """
+    rng = random.Random(seed)
+    half = min(neighbours // 2, (count - 1) // 2)
+    # Each link is stored as low * count + high
+    links = {min(node, (node + step) % count) * count + max(node, (node + step) % count)
+             for step in range(1, half + 1) for node in range(count)}
+
+    for step in range(1, half + 1):
+        for node in range(count):
+            if rng.random() >= rewiring:
+                continue
+
+            neighbour = (node + step) % count
+            other = rng.randrange(count)
+            new_link = min(node, other) * count + max(node, other)
+            if other == node or new_link in links:
+                continue
+
+            links.discard(min(node, neighbour) * count + max(node, neighbour))
+            links.add(new_link)
+
+    for link in sorted(links):
+        yield divmod(link, count)
+
+
+def chunked(iterable, size):
+    """Split an iterable in lists of at most size items"""
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
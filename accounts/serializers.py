@@ -1,4 +1,8 @@
 """Accounts serializers"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
@@ -7,6 +11,13 @@ from accounts.models import User, Profile, Friend
 INVALID_CODE = 400
 FIELD_NOT_EMPTY = _('This field may not be blank.')
 INVALID_USER = _('This user already has a profile or is not authenticated')
+MAX_CONNECTION_PAIRS = 5000
+MAX_BULK_FRIENDSHIPS = 5000
+MAX_BULK_USERS = 1000
+DUPLICATED_USERNAME = _('A user with that username already exists.')
+DUPLICATED_PHONE = _('profile with this phone already exists.')
+DUPLICATED_CONCURRENTLY = _('A user with that username or a profile with that phone was created meanwhile.')
+FRIENDSHIP_CREATED_CONCURRENTLY = _('The friendships of this batch were changed meanwhile.')
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -98,6 +109,40 @@ class AdminUserSerializer(serializers.ModelSerializer):
         return instance
 
 
+class ProvisionProfileSerializer(serializers.ModelSerializer):
+    """Profile of a provisioned user serializer class"""
+
+    class Meta:
+        """Meta class"""
+        model = Profile
+        fields = ['phone', 'address', 'city', 'state', 'zipcode', 'available', 'img']
+        # The phones are checked for the whole batch with a single query
+        extra_kwargs = {'phone': {'validators': []}}
+
+
+class ProvisionUserSerializer(serializers.ModelSerializer):
+    """Provisioned user serializer class"""
+
+    password = serializers.CharField(required=True, write_only=True, style={'input_type': 'password'})
+    email = serializers.EmailField(required=True)
+    first_name = serializers.CharField(required=True)
+    last_name = serializers.CharField(required=True)
+    profile = ProvisionProfileSerializer(required=False)
+
+    class Meta:
+        """Meta class"""
+        model = User
+        fields = ['username', 'first_name', 'last_name', 'email', 'password', 'profile']
+        # The usernames are checked for the whole batch with a single query
+        extra_kwargs = {'username': {'validators': [UnicodeUsernameValidator()]}}
+
+
+class BulkProvisionSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """Bulk users provisioning serializer class, the items are validated one by one by ProvisionUserSerializer"""
+    users = serializers.ListField(child=serializers.DictField(), min_length=1, max_length=MAX_BULK_USERS,
+                                  help_text='List of users, each one with an optional profile object')
+
+
 class ProfileSerializer(serializers.ModelSerializer):
     """Profile serializer class"""
     friends = serializers.ListField(read_only=True, source='get_user_friends_id')
@@ -133,11 +178,147 @@ class FriendsSerializer(serializers.ModelSerializer):
         fields = ['user', 'is_friend_of']
 
 
-class FriendsProfileSerializer(serializers.ModelSerializer):
-    """Friends profile serializer class"""
-    friends = ProfileSerializer(many=True, read_only=True, source='get_friends_profiles')
+class FriendshipItemSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """Friendship item of a bulk create serializer class"""
+    user = serializers.IntegerField(min_value=1)
+    is_friend_of = serializers.IntegerField(min_value=1)
+
+
+class BulkFriendsSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """Bulk friends create serializer class, the items are validated one by one by FriendshipItemSerializer"""
+    friendships = serializers.ListField(child=serializers.DictField(), min_length=1, max_length=MAX_BULK_FRIENDSHIPS,
+                                        help_text='List of {user, is_friend_of} objects')
+
+
+class FriendsProfileSerializer(ProfileSerializer):
+    """Friends profile serializer class, with only the fields asked by the client if any"""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class ValuesSerializer(serializers.BaseSerializer):  # pylint: disable=abstract-method
+    """
+    Read only serializer of the rows of a values() queryset, with the same output of a model serializer without
+    instantiating the models nor running its fields. `Meta.fields` maps every output field to its values() lookup, or
+    to None for the fields computed by the get_<field> method of the serializer.
+    """
 
     class Meta:
         """Meta class"""
-        model = Profile
-        fields = ['friends']
+        fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._fields = [(name, lookup, getattr(self, f'get_{name}', None)) for name, lookup in self.Meta.fields.items()]
+
+    @classmethod
+    def values(cls, queryset):
+        """Rows of the queryset with the lookups of the fields, and the primary key the cursor pagination orders by"""
+        return queryset.values('pk', *[lookup for lookup in cls.Meta.fields.values() if lookup is not None])
+
+    def to_representation(self, instance):
+        return {name: instance[lookup] if lookup is not None else method(instance)
+                for name, lookup, method in self._fields}
+
+
+class AdminUserValuesSerializer(ValuesSerializer):  # pylint: disable=abstract-method
+    """Read only admin user serializer, the output of AdminUserSerializer from values() rows"""
+
+    class Meta:
+        """Meta class"""
+        fields = {name: name for name in AdminUserSerializer.Meta.fields if name != 'password'}
+
+
+class FriendsValuesSerializer(ValuesSerializer):  # pylint: disable=abstract-method
+    """Read only friends serializer, the output of FriendsSerializer from values() rows"""
+
+    class Meta:
+        """Meta class"""
+        fields = {'user': 'user_id', 'is_friend_of': 'is_friend_of_id'}
+
+
+class ProfileValuesSerializer(ValuesSerializer):  # pylint: disable=abstract-method
+    """
+    Read only profile serializer, the output of ProfileSerializer from values() rows. The friends of the users are
+    taken from the `friends` dict of the context, see friends_of.
+    """
+
+    class Meta:
+        """Meta class"""
+        fields = {
+            'user_id': 'user_id',
+            'first_name': 'user__first_name',
+            'last_name': 'user__last_name',
+            **{name: name for name in ['phone', 'address', 'city', 'state', 'zipcode', 'available']},
+            'friends': None,
+            'img': 'img',
+        }
+
+    @staticmethod
+    def friends_of(user_ids):
+        """Ids of the friends of each user, fetched with a single query, for the friends of the context"""
+        friends = defaultdict(list)
+        friendships = Friend.objects.filter(user_id__in=user_ids).order_by('is_friend_of_id')
+        for user_id, friend_id in friendships.values_list('user_id', 'is_friend_of_id'):
+            friends[user_id].append(friend_id)
+        return friends
+
+    def get_friends(self, instance):
+        """Ids of the friends of the user of the profile"""
+        return self.context['friends'].get(instance['user_id'], [])
+
+
+class FriendsProfilesQuerySerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """Friends profiles query params serializer class"""
+    fields = serializers.CharField(required=False,
+                                   help_text='Comma separated fields of the profiles, e.g. user_id,first_name')
+
+    @staticmethod
+    def validate_fields(value):
+        """Split the fields and check they are profile fields"""
+        fields = [field.strip() for field in value.split(',') if field.strip()]
+        unknown = [field for field in fields if field not in ProfileSerializer.Meta.fields]
+
+        if not fields or unknown:
+            raise serializers.ValidationError(_('Unknown fields: %(fields)s. Choose from %(choices)s.') % {
+                'fields': ', '.join(unknown), 'choices': ', '.join(ProfileSerializer.Meta.fields)})
+        return fields
+
+
+class ShorterConnectionBatchSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """Shorter connection batch serializer class"""
+    pairs = serializers.ListField(
+        child=serializers.ListField(child=serializers.IntegerField(min_value=1), min_length=2, max_length=2),
+        min_length=1,
+        max_length=MAX_CONNECTION_PAIRS,
+        help_text='List of [uid, ouid] pairs',
+    )
+
+
+class SeparationQuerySerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """Degrees of separation query params serializer class"""
+    max_depth = serializers.IntegerField(min_value=1, max_value=settings.FRIENDS_CONNECTIONS_MAX_DEPTH, default=3,
+                                         help_text='Maximum number of friendships between the users')
+
+
+class DistanceBoundsQuerySerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """Distance bounds query params serializer class"""
+    exact = serializers.BooleanField(default=False,
+                                     help_text='Search the exact distance when the bounds are not equal')
+
+
+class SuggestionsQuerySerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """Friend suggestions query params serializer class"""
+    limit = serializers.IntegerField(min_value=1, max_value=settings.FRIENDS_SUGGESTIONS_MAX_LIMIT, default=10,
+                                     help_text='Maximum number of suggestions')
+
+
+class ExportQuerySerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """Export query params serializer class"""
+    output = serializers.ChoiceField(choices=['ndjson', 'csv'], default='ndjson', help_text='Format of the export')
+    since_id = serializers.IntegerField(min_value=0, default=0, help_text='Export only the rows with a greater id')
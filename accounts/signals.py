@@ -0,0 +1,115 @@
+"""Accounts signals"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver, Signal
+
+from accounts.cache import bump_graph_generation, bump_resource_versions, friend_ids_cache, auth_user_cache
+from accounts.components import component_index
+from accounts.graph import friend_graph_index
+from accounts.models import Friend, Profile, User
+
+# Sent by the bulk operations that skip the model signals (bulk_create), with the list of created friendships as
+# (user_id, is_friend_of_id) pairs and the database alias
+friendships_created = Signal()
+
+
+@receiver([post_save, post_delete], sender=Friend)
+def friendship_changed(sender, instance, using, **kwargs):
+    """
+    Move the friend graph to a new generation. It is done at once, so the writing transaction never reads stale
+    connections, and again on commit together with the change of the index (see friendship_saved and
+    friendship_deleted), so connections cached meanwhile from the previous state are dropped too.
+    """
+    friend_graph_index.note_generation(bump_graph_generation())
+    transaction.on_commit(lambda: friend_ids_cache.discard([instance.user_id]), using=using)
+
+
+@receiver(friendships_created, sender=Friend)
+def friendships_bulk_created(sender, friendships, using, **kwargs):
+    """Move the friend graph to a new generation and add the friendships to the indexes once they are committed"""
+    friend_graph_index.note_generation(bump_graph_generation())
+    transaction.on_commit(lambda: friend_graph_index.add_friendships(friendships, bump_graph_generation()), using=using)
+    transaction.on_commit(lambda: component_index.add_friendships(friendships), using=using)
+    transaction.on_commit(lambda: friend_ids_cache.discard({user_id for user_id, _ in friendships}), using=using)
+
+
+@receiver(post_save, sender=Friend)
+def friendship_saved(sender, instance, created, using, **kwargs):
+    """Move the friend graph to a new generation and add the friendship to the indexes once it is committed"""
+    if not created:
+        transaction.on_commit(bump_graph_generation, using=using)
+        transaction.on_commit(friend_graph_index.invalidate, using=using)
+        transaction.on_commit(component_index.invalidate, using=using)
+        return
+
+    friendship = (instance.user_id, instance.is_friend_of_id)
+    transaction.on_commit(lambda: friend_graph_index.add_friendships([friendship], bump_graph_generation()),
+                          using=using)
+    transaction.on_commit(lambda: component_index.add_friendships([friendship]), using=using)
+
+
+@receiver(post_delete, sender=Friend)
+def friendship_deleted(sender, instance, using, **kwargs):
+    """
+    Move the friend graph to a new generation and remove the friendship from its index once it is committed. It could
+    split a component, so the components are built again.
+    """
+    friendship = (instance.user_id, instance.is_friend_of_id)
+    transaction.on_commit(lambda: friend_graph_index.remove_friendships([friendship], bump_graph_generation()),
+                          using=using)
+    transaction.on_commit(component_index.invalidate, using=using)
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, using, **kwargs):
+    """
+    Drop the user from the authentication cache. It is done at once and again on commit, so the user cached meanwhile
+    from the previous state is dropped too.
+    """
+    auth_user_cache.invalidate(instance.pk)
+    transaction.on_commit(lambda: auth_user_cache.invalidate(instance.pk), using=using)
+
+
+def _followers_resources(user_ids):
+    """Friends lists that show the profiles of user_ids, those of the users that are friends of them"""
+    followers = Friend.objects.filter(is_friend_of_id__in=user_ids).values_list('user_id', flat=True).distinct()
+    return [('friends', follower_id) for follower_id in followers]
+
+
+def _bump_resource_versions(resources, using):
+    """Give a new version to the resources at once and again on commit, like the friend graph generation"""
+    bump_resource_versions(resources)
+    transaction.on_commit(lambda: bump_resource_versions(resources), using=using)
+
+
+@receiver([post_save, post_delete], sender=Profile)
+def profile_changed(sender, instance, using, **kwargs):
+    """New version of the profile and of the friends lists where it is shown"""
+    _bump_resource_versions([('profile', instance.user_id), *_followers_resources([instance.user_id])], using)
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_versions_changed(sender, instance, using, created=False, **kwargs):
+    """New version of the profile of the user, with its names, and of the friends lists where it is shown"""
+    resources = [('profile', instance.pk)]
+    if created:
+        # Nobody is a friend of a new user yet, its id could be reused (e.g. SQLite) so its own list is renewed too
+        resources.append(('friends', instance.pk))
+    else:
+        resources.extend(_followers_resources([instance.pk]))
+    _bump_resource_versions(resources, using)
+
+
+@receiver([post_save, post_delete], sender=Friend)
+def friendship_versions_changed(sender, instance, using, **kwargs):
+    """New version of the profile and friends list of the user, and of the friends lists where its profile is shown"""
+    user_id = instance.user_id
+    _bump_resource_versions([('profile', user_id), ('friends', user_id), *_followers_resources([user_id])], using)
+
+
+@receiver(friendships_created, sender=Friend)
+def friendships_bulk_versions_changed(sender, friendships, using, **kwargs):
+    """New version of the profiles and friends lists of the users of the friendships created in bulk"""
+    user_ids = {user_id for user_id, _ in friendships}
+    resources = [(kind, user_id) for user_id in user_ids for kind in ('profile', 'friends')]
+    _bump_resource_versions([*resources, *_followers_resources(user_ids)], using)
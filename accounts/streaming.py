@@ -0,0 +1,48 @@
+"""Accounts streaming responses"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+CSV_CONTENT_TYPE = 'text/csv'
+
+
+class Echo:
+    """File like object whose write returns the value written, so the csv writer produces lines to stream"""
+
+    @staticmethod
+    def write(value):
+        """Return the value instead of storing it"""
+        return value
+
+
+def ndjson_response(rows):
+    """
+    Stream rows as newline delimited JSON, each row is encoded only when the client reads it
+    :param rows: Iterable of JSON serializable objects
+    :return: StreamingHttpResponse
+    """
+    lines = (json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in rows)
+    return StreamingHttpResponse(lines, content_type=NDJSON_CONTENT_TYPE)
+
+
+def csv_response(header, rows, filename):
+    """
+    Stream rows as CSV, each row is encoded only when the client reads it
+    :param header: Names of the columns
+    :param rows: Iterable of sequences of values
+    :param filename: Name of the attached file
+    :return: StreamingHttpResponse
+    """
+    writer = csv.writer(Echo())
+
+    def lines():
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(lines(), content_type=CSV_CONTENT_TYPE)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
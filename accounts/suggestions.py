@@ -0,0 +1,123 @@
+"""Accounts mutual friends and friend suggestions"""
+import heapq
+
+from django.conf import settings
+from django.db.models import Count
+
+from accounts.cache import mutual_friends_cache, friend_suggestions_cache
+from accounts.graph import get_friend_graph
+from accounts.models import Friend
+
+
+def intersect_sorted(items, other_items):
+    """Common values of two sorted sequences, merged in a single pass"""
+    common = []
+    index, other_index = 0, 0
+
+    while index < len(items) and other_index < len(other_items):
+        item, other_item = items[index], other_items[other_index]
+        if item == other_item:
+            common.append(item)
+            index += 1
+            other_index += 1
+        elif item < other_item:
+            index += 1
+        else:
+            other_index += 1
+
+    return common
+
+
+class FriendSuggestions:
+    """
+    Class for the mutual friends of two users and the friends of friends of a user ranked by their mutual friends.
+    The friendships of the friends are scanned ordered by friend and candidate, and at most candidate_budget of them,
+    so a user with many friends (or friends with many friends) is answered from a part of them.
+    """
+
+    @staticmethod
+    def _mutual_friends(user_id, other_user_id):
+        """Sorted ids of the friends of both users, from the friend graph index when it is enabled"""
+        graph = get_friend_graph()
+        if graph is not None:
+            return intersect_sorted(graph.forward.neighbours_of(user_id), graph.forward.neighbours_of(other_user_id))
+
+        other_friends = Friend.objects.filter(user_id=other_user_id).values('is_friend_of_id')
+        return list(Friend.objects.filter(user_id=user_id, is_friend_of_id__in=other_friends).
+                    order_by('is_friend_of_id').values_list('is_friend_of_id', flat=True))
+
+    @staticmethod
+    def _graph_candidates(graph, user_id, limit, candidate_budget):
+        """
+        Friends of friends of user ranked by mutual friends, counted merging the friends of each friend
+        :return: A tuple with the list of (candidate_id, mutual) and if the budget stopped the scan
+        """
+        friends = graph.forward.neighbours_of(user_id)
+        mutual = {}
+        scanned = 0
+        truncated = False
+
+        for friend_id in friends:
+            neighbours = graph.forward.neighbours_of(friend_id)
+            if scanned + len(neighbours) > candidate_budget:
+                neighbours = neighbours[:candidate_budget - scanned]
+                truncated = True
+            scanned += len(neighbours)
+
+            for candidate_id in neighbours:
+                mutual[candidate_id] = mutual.get(candidate_id, 0) + 1
+            if truncated:
+                break
+
+        mutual.pop(user_id, None)
+        for friend_id in friends:
+            mutual.pop(friend_id, None)
+
+        ranked = heapq.nsmallest(limit, mutual.items(), key=lambda item: (-item[1], item[0]))
+        return ranked, truncated
+
+    @staticmethod
+    def _database_candidates(user_id, limit, candidate_budget):
+        """
+        Friends of friends of user ranked by mutual friends, counted with a single grouped query
+        :return: A tuple with the list of (candidate_id, mutual) and if the budget stopped the scan
+        """
+        friends = Friend.objects.filter(user_id=user_id).values('is_friend_of_id')
+        scanned = Friend.objects.filter(user_id__in=friends).order_by('user_id', 'is_friend_of_id')
+
+        ranked = Friend.objects.filter(pk__in=scanned[:candidate_budget].values('pk')). \
+            exclude(is_friend_of_id=user_id).exclude(is_friend_of_id__in=friends). \
+            values('is_friend_of_id').annotate(mutual=Count('pk')).order_by('-mutual', 'is_friend_of_id'). \
+            values_list('is_friend_of_id', 'mutual')[:limit]
+
+        return list(ranked), scanned[candidate_budget:].exists()
+
+    @classmethod
+    def mutual_friends(cls, user_id, other_user_id):
+        """Sorted ids of the friends of both user and other_user, cached until the friend graph changes"""
+        user_id, other_user_id = sorted((user_id, other_user_id))
+        return mutual_friends_cache.get_or_set((user_id, other_user_id),
+                                               lambda: cls._mutual_friends(user_id, other_user_id))
+
+    @classmethod
+    def suggestions(cls, user_id, limit):
+        """
+        Users that are not friends of user ranked by the number of friends of user that are their friends, then by id.
+        The FRIENDS_SUGGESTIONS_MAX_LIMIT first are cached per user until the friend graph changes.
+        :param user_id: User id
+        :param limit: Maximum number of suggestions, not greater than FRIENDS_SUGGESTIONS_MAX_LIMIT
+        :return: A dict with the list of {'id', 'mutual'} suggestions and if the candidate budget truncated them
+        """
+        def compute():
+            graph = get_friend_graph()
+            if graph is not None:
+                ranked, truncated = cls._graph_candidates(graph, user_id, settings.FRIENDS_SUGGESTIONS_MAX_LIMIT,
+                                                          settings.FRIENDS_SUGGESTIONS_CANDIDATE_BUDGET)
+            else:
+                ranked, truncated = cls._database_candidates(user_id, settings.FRIENDS_SUGGESTIONS_MAX_LIMIT,
+                                                             settings.FRIENDS_SUGGESTIONS_CANDIDATE_BUDGET)
+            return {'suggestions': [{'id': candidate_id, 'mutual': mutual} for candidate_id, mutual in ranked],
+                    'truncated': truncated}
+
+        result = friend_suggestions_cache.get_or_set((user_id,), compute)
+        return {'suggestions': result['suggestions'][:limit], 'truncated': result['truncated']}
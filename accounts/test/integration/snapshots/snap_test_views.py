@@ -7,35 +7,39 @@ from snapshottest import Snapshot
 
 snapshots = Snapshot()
 
-snapshots['AdminUserApiViewsTest::test_list_users 1'] = [
-    {
-        'email': 'jhon@example.com',
-        'first_name': 'Jhon',
-        'id': 1,
-        'is_active': True,
-        'is_superuser': True,
-        'last_name': 'Doe',
-        'username': 'JD2022'
-    },
-    {
-        'email': 'martha@example.com',
-        'first_name': 'Martha',
-        'id': 2,
-        'is_active': True,
-        'is_superuser': False,
-        'last_name': 'Doe',
-        'username': 'Martha96'
-    },
-    {
-        'email': 'mikael@example.com',
-        'first_name': 'Mikael',
-        'id': 3,
-        'is_active': True,
-        'is_superuser': True,
-        'last_name': 'Sans',
-        'username': 'Mikael564'
-    }
-]
+snapshots['AdminUserApiViewsTest::test_list_users 1'] = {
+    'next': None,
+    'previous': None,
+    'results': [
+        {
+            'email': 'jhon@example.com',
+            'first_name': 'Jhon',
+            'id': 1,
+            'is_active': True,
+            'is_superuser': True,
+            'last_name': 'Doe',
+            'username': 'JD2022'
+        },
+        {
+            'email': 'martha@example.com',
+            'first_name': 'Martha',
+            'id': 2,
+            'is_active': True,
+            'is_superuser': False,
+            'last_name': 'Doe',
+            'username': 'Martha96'
+        },
+        {
+            'email': 'mikael@example.com',
+            'first_name': 'Mikael',
+            'id': 3,
+            'is_active': True,
+            'is_superuser': True,
+            'last_name': 'Sans',
+            'username': 'Mikael564'
+        }
+    ]
+}
 
 snapshots['FriendsApiViewsTest::test_user_friends_profiles_list 1'] = {
     'friends': [
@@ -69,57 +73,63 @@ snapshots['FriendsApiViewsTest::test_user_friends_profiles_list 1'] = {
             'user_id': 3,
             'zipcode': '65487'
         }
-    ]
+    ],
+    'next': None,
+    'previous': None
 }
 
-snapshots['ProfilesApiViewsTest::test_list_profile 1'] = [
-    {
-        'address': '8655 Frances Ct',
-        'available': True,
-        'city': 'Paris',
-        'first_name': 'Jhon',
-        'friends': [
-            2,
-            3
-        ],
-        'img': 'https://randomuser.me/api/portraits/women/65.jpg',
-        'last_name': 'Doe',
-        'phone': '(925)-967-1402',
-        'state': 'FR',
-        'user_id': 1,
-        'zipcode': '65487'
-    },
-    {
-        'address': '1401 Oak Lawn Ave',
-        'available': False,
-        'city': 'Canada',
-        'first_name': 'Martha',
-        'friends': [
-            3
-        ],
-        'img': 'https://randomuser.me/api/portraits/women/56.jpg',
-        'last_name': 'Doe',
-        'phone': '(463)-159-7835',
-        'state': 'CD',
-        'user_id': 2,
-        'zipcode': '98752'
-    },
-    {
-        'address': '8909 Walnut Hill Ln',
-        'available': True,
-        'city': 'Mexico',
-        'first_name': 'Mikael',
-        'friends': [
-            1
-        ],
-        'img': 'https://randomuser.me/api/portraits/women/56.jpg',
-        'last_name': 'Sans',
-        'phone': '(709)-501-3504',
-        'state': 'MX',
-        'user_id': 3,
-        'zipcode': '85245'
-    }
-]
+snapshots['ProfilesApiViewsTest::test_list_profile 1'] = {
+    'next': None,
+    'previous': None,
+    'results': [
+        {
+            'address': '8655 Frances Ct',
+            'available': True,
+            'city': 'Paris',
+            'first_name': 'Jhon',
+            'friends': [
+                2,
+                3
+            ],
+            'img': 'https://randomuser.me/api/portraits/women/65.jpg',
+            'last_name': 'Doe',
+            'phone': '(925)-967-1402',
+            'state': 'FR',
+            'user_id': 1,
+            'zipcode': '65487'
+        },
+        {
+            'address': '1401 Oak Lawn Ave',
+            'available': False,
+            'city': 'Canada',
+            'first_name': 'Martha',
+            'friends': [
+                3
+            ],
+            'img': 'https://randomuser.me/api/portraits/women/56.jpg',
+            'last_name': 'Doe',
+            'phone': '(463)-159-7835',
+            'state': 'CD',
+            'user_id': 2,
+            'zipcode': '98752'
+        },
+        {
+            'address': '8909 Walnut Hill Ln',
+            'available': True,
+            'city': 'Mexico',
+            'first_name': 'Mikael',
+            'friends': [
+                1
+            ],
+            'img': 'https://randomuser.me/api/portraits/women/56.jpg',
+            'last_name': 'Sans',
+            'phone': '(709)-501-3504',
+            'state': 'MX',
+            'user_id': 3,
+            'zipcode': '85245'
+        }
+    ]
+}
 
 snapshots['UserApiViewsTest::test_owner_retrieve_account 1'] = {
     'email': 'jhon@example.com',
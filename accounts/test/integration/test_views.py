@@ -1,16 +1,28 @@
 """Integration test for views"""
 import json
+import os
+import tempfile
+from io import StringIO
 from unittest import skipIf
 
 from django.conf import settings
-from django.test import skipIfDBFeature
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import skipIfDBFeature, override_settings
 from django.urls import reverse
+import mock
 from model_bakery import baker
 from rest_framework.test import APIClient
 from rest_framework_simplejwt.tokens import RefreshToken
 from snapshottest.django import TestCase
 
+from accounts.cache import friend_ids_cache, shorter_connection_cache
+from accounts.components import component_index
+from accounts.graph import friend_graph_index
+from accounts.middleware import query_stats
 from accounts.models import User, Profile, Friend
+from accounts.permissions import IsOwnerOrFriendOrAdmin, IsOwnerOrFriendOrAdminFilterBackend
+from accounts.views import BulkCreateFriendApiView
 
 
 def get_request_credentials(user):
@@ -64,6 +76,28 @@ class UserApiViewsTest(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 403)
 
+    def test_authentication_cached(self):
+        """Test the user of the request is cached until it is saved"""
+        admin = baker.make(User, is_superuser=True, is_staff=True, is_active=True)
+        url = reverse('account_retrieve_update_delete', args=[self.user.id])
+        http_auth = get_request_credentials(self.user)
+        self.client.credentials(**http_auth)
+
+        self.client.get(url)
+        # Only the user of the view
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        self.client.credentials(**get_request_credentials(admin))
+        response = self.client.patch(reverse('account_manager_retrieve_update_delete', args=[self.user.id]),
+                                     {'is_active': False})
+        self.assertEqual(response.status_code, 200)
+
+        self.client.credentials(**http_auth)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 401)
+
     def test_create_user(self):
         """Test create user"""
         url = reverse('account_create')
@@ -300,6 +334,160 @@ class AdminUserApiViewsTest(TestCase):
         self.assertFalse(User.objects.filter(username=username).exists())
 
 
+    def test_export_profiles(self):
+        """Test admin export the profiles as newline delimited JSON"""
+        other_user = baker.make(User, username='Martha96', first_name='Martha', last_name='Doe')
+        first_profile = baker.make(Profile, user=self.user, phone=None, city='Paris')
+        baker.make(Profile, user=other_user, phone=None, city='Oslo')
+
+        http_auth = get_request_credentials(self.user)
+        self.client.credentials(**http_auth)
+        response = self.client.get(reverse('manager_export_profiles'), {'since_id': first_profile.id})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['user_id'], other_user.id)
+        self.assertEqual(rows[0]['first_name'], 'Martha')
+        self.assertEqual(rows[0]['city'], 'Oslo')
+
+    def test_export_friends_csv(self):
+        """Test admin export the friendships as CSV"""
+        other_user = baker.make(User)
+        friendship = baker.make(Friend, user=self.user, is_friend_of=other_user)
+
+        http_auth = get_request_credentials(self.user)
+        self.client.credentials(**http_auth)
+        response = self.client.get(reverse('manager_export_friends'), {'output': 'csv'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(b''.join(response.streaming_content).decode().splitlines(), [
+            'id,user,is_friend_of',
+            f'{friendship.id},{self.user.id},{other_user.id}',
+        ])
+
+    def test_export_not_admin(self):
+        """Test only admins can export"""
+        user = baker.make(User, is_superuser=False, is_staff=False)
+
+        http_auth = get_request_credentials(user)
+        self.client.credentials(**http_auth)
+        response = self.client.get(reverse('manager_export_friends'))
+
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(PASSWORD_HASHING_WORKERS=1)
+    def test_bulk_create_users(self):
+        """Test admin create a batch of users with their profiles"""
+        baker.make(Profile, phone='+5355555555')
+        body = {
+            "users": [
+                {"username": "Alberto1215", "first_name": "Alberto", "last_name": "Small", "email": "albr@email.com",
+                 "password": "top_secret!", "profile": {"phone": "+5351111111", "city": "Paris"}},
+                {"username": "Martha96", "first_name": "Martha", "last_name": "Doe", "email": "martha@email.com",
+                 "password": "top_secret!"},
+                {"username": "JD2022", "first_name": "Jhon", "last_name": "Doe", "email": "jhon@email.com",
+                 "password": "top_secret!"},
+                {"username": "Alberto1215", "first_name": "Alberto", "last_name": "Big", "email": "albb@email.com",
+                 "password": "top_secret!"},
+                {"username": "Mikael564", "first_name": "Mikael", "last_name": "Sans", "email": "mikael@email.com",
+                 "password": "top_secret!", "profile": {"phone": "+5355555555"}},
+                {"username": "Ana88", "first_name": "Ana", "email": "ana@email.com", "password": "top_secret!"},
+            ]
+        }
+
+        http_auth = get_request_credentials(self.user)
+        self.client.credentials(**http_auth)
+
+        # Authentication, usernames, phones and the users and profiles inserts inside a savepoint
+        with self.assertNumQueries(7):
+            response = self.client.post(reverse('account_manager_bulk_create'), body, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        data = json.loads(response.content)
+        self.assertEqual(data['created'], 2)
+        self.assertEqual([result['status'] for result in data['results']],
+                         ['created', 'created', 'invalid', 'invalid', 'invalid', 'invalid'])
+        self.assertIn('username', data['results'][2]['errors'])
+        self.assertIn('username', data['results'][3]['errors'])
+        self.assertIn('phone', data['results'][4]['errors']['profile'])
+        self.assertIn('last_name', data['results'][5]['errors'])
+
+        user = User.objects.get(username='Alberto1215')
+        self.assertEqual(data['results'][0]['id'], user.id)
+        self.assertTrue(user.check_password('top_secret!'))
+        self.assertEqual(user.profile.city, 'Paris')
+        self.assertFalse(Profile.objects.filter(user__username='Martha96').exists())
+
+    @override_settings(PASSWORD_HASHING_WORKERS=1)
+    def test_bulk_create_users_blank_phones(self):
+        """Test the blank phones are unique too, in the batch and in the database"""
+        body = {
+            "users": [
+                {"username": f"Blank{index}", "first_name": "Blank", "last_name": "Phone", "email": "blank@email.com",
+                 "password": "top_secret!", "profile": {"phone": ""}}
+                for index in range(2)
+            ]
+        }
+        self.client.credentials(**get_request_credentials(self.user))
+
+        response = self.client.post(reverse('account_manager_bulk_create'), body, format='json')
+        data = json.loads(response.content)
+        self.assertEqual([result['status'] for result in data['results']], ['created', 'invalid'])
+        self.assertIn('phone', data['results'][1]['errors']['profile'])
+
+        body['users'] = body['users'][1:]
+        response = self.client.post(reverse('account_manager_bulk_create'), body, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['results'][0]['status'], 'invalid')
+
+    def test_query_stats(self):
+        """Test the queries of each request are sent in its Server-Timing header and aggregated per view"""
+        query_stats.reset()
+        baker.make(Profile, user=self.user, phone=None)
+
+        http_auth = get_request_credentials(self.user)
+        self.client.credentials(**http_auth)
+        response = self.client.get(reverse('profile_list_create'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="4 queries, 0 duplicated"')
+
+        response = self.client.get(reverse('manager_query_stats'))
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(data['profile_list_create']['requests'], 1)
+        self.assertEqual(data['profile_list_create']['queries'], 4)
+        self.assertEqual(data['profile_list_create']['queries_histogram']['5'], 1)
+
+    def test_metrics(self):
+        """Test the metrics endpoint exposes the requests served"""
+        http_auth = get_request_credentials(self.user)
+        self.client.credentials(**http_auth)
+        self.client.get(reverse('manager_cache_stats'))
+
+        self.client.credentials()
+        response = self.client.get(reverse('metrics'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        content = response.content.decode()
+        self.assertIn('# TYPE api_http_requests_total counter', content)
+        self.assertRegex(content, r'api_http_requests_total\{view="manager_cache_stats",method="GET",status="200"\} ')
+        self.assertIn('api_http_request_duration_seconds_bucket{view="manager_cache_stats",le="+Inf"}', content)
+
+    def test_bulk_create_users_not_admin(self):
+        """Test only admins can create users in bulk"""
+        user = baker.make(User, is_superuser=False, is_staff=False)
+
+        http_auth = get_request_credentials(user)
+        self.client.credentials(**http_auth)
+        response = self.client.post(reverse('account_manager_bulk_create'), {'users': []}, format='json')
+
+        self.assertEqual(response.status_code, 403)
+
+
 @skipIfDBFeature('is_mocked')
 class ProfilesApiViewsTest(TestCase):
     """Test for ProfilesApiViews"""
@@ -358,6 +546,81 @@ class ProfilesApiViewsTest(TestCase):
         data = json.loads(response.content)
         self.assertMatchSnapshot(data)
 
+    def test_list_profile_number_of_queries(self):
+        """Test the number of queries of the profiles list does not depend on the number of profiles"""
+        users = [self.user] + baker.make(User, _quantity=9)
+        for user in users:
+            baker.make(Profile, user=user, phone=None)
+        for user, friend in zip(users, users[1:]):
+            baker.make(Friend, user=user, is_friend_of=friend)
+            baker.make(Friend, user=friend, is_friend_of=user)
+
+        url = reverse('profile_list_create')
+        http_auth = get_request_credentials(self.user)
+        self.client.credentials(**http_auth)
+
+        # Authentication, page of profiles ids, profiles joined with their users and the friendships of all of them
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)['results']
+        self.assertEqual(len(data), 10)
+        self.assertEqual(data[1]['friends'], [users[0].id, users[2].id])
+        self.assertEqual(data[1]['first_name'], users[1].first_name)
+
+        # The profiles are assembled from their rendered fragments, only the page of ids is queried
+        with self.assertNumQueries(1):
+            self.assertEqual(json.loads(self.client.get(url).content)['results'], data)
+
+        # Only the changed profiles are loaded and rendered again
+        users[1].first_name = 'Changed'
+        users[1].save()
+        Friend.objects.filter(user=users[2], is_friend_of=users[1]).delete()
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        data = json.loads(response.content)['results']
+        self.assertEqual(data[1]['first_name'], 'Changed')
+        self.assertEqual(data[2]['friends'], [users[3].id])
+
+    def test_list_profile_pages(self):
+        """Test walking the profiles list page by page"""
+        users = [self.user] + baker.make(User, _quantity=4)
+        profiles = [baker.make(Profile, user=user, phone=None) for user in users]
+
+        http_auth = get_request_credentials(self.user)
+        self.client.credentials(**http_auth)
+        url = reverse('profile_list_create') + '?page_size=2'
+        user_ids = []
+
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = json.loads(response.content)
+            self.assertLessEqual(len(data['results']), 2)
+            user_ids.extend(profile['user_id'] for profile in data['results'])
+            url = data['next']
+
+        self.assertEqual(user_ids, [profile.user_id for profile in profiles])
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'PAGE_SIZE': 2})
+    def test_list_friends_page_size_ceiling(self):
+        """Test the page size can not exceed the configured ceiling"""
+        users = baker.make(User, _quantity=4)
+        for user in users:
+            baker.make(Friend, user=self.user, is_friend_of=user)
+
+        http_auth = get_request_credentials(self.user)
+        self.client.credentials(**http_auth)
+
+        with mock.patch('accounts.pagination.PrimaryKeyCursorPagination.max_page_size', 3):
+            response = self.client.get(reverse('friend_list_create'), {'page_size': 100})
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(len(data['results']), 3)
+        self.assertIsNotNone(data['next'])
+
     def test_create_profile(self):
         """Test create profile"""
         user = self.user
@@ -430,6 +693,34 @@ class ProfilesApiViewsTest(TestCase):
         self.assertEqual(profile.city, body['city'])
         self.assertEqual(profile.state, body['state'])
 
+    def test_retrieve_profile_conditional(self):
+        """Test a profile is answered with 304 while it does not change"""
+        profile = baker.make(Profile, user=self.user, phone=None, city='Paris')
+
+        url = reverse('profile_retrieve_update_delete', args=[self.user.id])
+        http_auth = get_request_credentials(self.user)
+        self.client.credentials(**http_auth)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        # The user of the request is cached by the first request and the version is read from the cache
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Another client without the ETag gets the content already rendered
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(json.loads(response.content)['city'], 'Paris')
+
+        profile.city = 'Oslo'
+        profile.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(json.loads(response.content)['city'], 'Oslo')
+
     def test_user_try_update_another_user_profile(self):
         """Test user try update another user profile"""
         user = self.user
@@ -518,6 +809,7 @@ class FriendsApiViewsTest(TestCase):
 
     def setUp(self):
         super().setUp()
+        cache.clear()
         self.client = APIClient()
 
         # Test users
@@ -637,6 +929,76 @@ class FriendsApiViewsTest(TestCase):
         data = json.loads(response.content)
         self.assertMatchSnapshot(data)
 
+    def test_user_friends_profiles_queries(self):
+        """Test user friends profiles are retrieved with a fixed number of queries, by pages"""
+        for user in baker.make(User, _quantity=5):
+            baker.make(Profile, user=user, phone=None)
+            baker.make(Friend, user=self.user_roberto, is_friend_of=user)
+            baker.make(Friend, user=user, is_friend_of=self.user_ana)
+
+        url = reverse('friends_profiles', args=[self.user_roberto.id])
+        http_auth = get_request_credentials(self.user_roberto)
+        self.client.credentials(**http_auth)
+
+        # Authentication, profile existence, page of friends ids, their profiles joined with their users and their
+        # friendships
+        with self.assertNumQueries(5):
+            response = self.client.get(url, {'page_size': 3})
+
+        data = json.loads(response.content)
+        self.assertEqual(len(data['friends']), 3)
+        self.assertEqual(data['friends'][0]['friends'], [self.user_ana.id])
+        self.assertIsNone(data['previous'])
+
+        # The user of the request is cached by the first request
+        with self.assertNumQueries(4):
+            response = self.client.get(data['next'])
+        data = json.loads(response.content)
+        self.assertEqual(len(data['friends']), 2)
+        self.assertIsNone(data['next'])
+
+        # The friendships of the friends are not fetched without the friends field
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'fields': 'user_id,first_name'})
+        data = json.loads(response.content)
+        self.assertEqual(set(data['friends'][0]), {'user_id', 'first_name'})
+
+        response = self.client.get(url, {'fields': 'user_id,password'})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(reverse('friends_profiles', args=[99999]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_user_friends_profiles_conditional(self):
+        """Test the friends profiles are answered with 304 until a friend profile or a friendship changes"""
+        profile = self.user_ana.profile
+        profile.city = 'Paris'
+        profile.save()
+        baker.make(Friend, user=self.user_roberto, is_friend_of=self.user_ana)
+
+        url = reverse('friends_profiles', args=[self.user_roberto.id])
+        http_auth = get_request_credentials(self.user_roberto)
+        self.client.credentials(**http_auth)
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Other pages have their own ETag
+        self.assertNotEqual(self.client.get(url, {'page_size': 1})['ETag'], etag)
+
+        profile.city = 'Oslo'
+        profile.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['friends'][0]['city'], 'Oslo')
+        etag = response['ETag']
+
+        baker.make(Friend, user=self.user_roberto, is_friend_of=self.user_juan)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
     def test_shorter_connection(self):
         """Test shorter connection between two users"""
         self.friend_list_create()
@@ -651,6 +1013,505 @@ class FriendsApiViewsTest(TestCase):
         self.assertEqual(len(data), 1)
         self.assertEqual(data[0], self.user_ana.id)
 
+    def test_shorter_connection_without_connection(self):
+        """Test shorter connection between two users that are not connected"""
+        self.friend_list_create()
+
+        url = reverse('shorter_connection_friends', args=[self.user_leo.id, self.user_roberto.id])
+        http_auth = get_request_credentials(self.user_roberto)
+        self.client.credentials(**http_auth)
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(data, [])
+
+    def test_shorter_connection_batch(self):
+        """Test shorter connection of a batch of pairs"""
+        self.friend_list_create()
+
+        url = reverse('shorter_connection_friends_batch')
+        body = {
+            "pairs": [
+                [self.user_roberto.id, self.user_leo.id],
+                [self.user_juan.id, self.user_leo.id],
+                [self.user_roberto.id, self.user_maykel.id],
+                [self.user_leo.id, 99999],
+            ]
+        }
+        http_auth = get_request_credentials(self.user_roberto)
+        self.client.credentials(**http_auth)
+
+        # The user of the request was cached while the friendships were created, each uid has few targets so they
+        # are searched pair by pair
+        with self.assertNumQueries(7):
+            response = self.client.post(url, body, format='json')
+            lines = b''.join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([json.loads(line) for line in lines], [
+            {'uid': self.user_roberto.id, 'ouid': self.user_leo.id, 'connection': [self.user_ana.id]},
+            {'uid': self.user_roberto.id, 'ouid': self.user_maykel.id, 'connection': [self.user_juan.id]},
+            {'uid': self.user_juan.id, 'ouid': self.user_leo.id, 'connection': [self.user_maykel.id]},
+            {'uid': self.user_leo.id, 'ouid': 99999, 'detail': 'Not found.'},
+        ])
+
+    def test_shorter_connection_batch_invalid(self):
+        """Test shorter connection batch with an invalid pair"""
+        url = reverse('shorter_connection_friends_batch')
+        http_auth = get_request_credentials(self.user_roberto)
+        self.client.credentials(**http_auth)
+        response = self.client.post(url, {"pairs": [[self.user_roberto.id]]}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_degrees_of_separation(self):
+        """Test degrees of separation between two users"""
+        self.friend_list_create()
+
+        http_auth = get_request_credentials(self.user_roberto)
+        self.client.credentials(**http_auth)
+        url = reverse('degrees_of_separation', args=[self.user_roberto.id, self.user_leo.id])
+
+        response = self.client.get(url, {'max_depth': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), {'max_depth': 2, 'distance': 2, 'truncated': False})
+
+        response = self.client.get(url, {'max_depth': 1})
+        self.assertEqual(json.loads(response.content), {'max_depth': 1, 'distance': None, 'truncated': False})
+
+        response = self.client.get(url, {'max_depth': 100})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(reverse('degrees_of_separation', args=[self.user_roberto.id, 99999]))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(FRIENDS_CONNECTIONS_NODE_BUDGET=2)
+    def test_degrees_of_separation_budget_exceeded(self):
+        """Test degrees of separation when the search exceeds its node budget"""
+        self.friend_list_create()
+
+        http_auth = get_request_credentials(self.user_roberto)
+        self.client.credentials(**http_auth)
+        url = reverse('degrees_of_separation', args=[self.user_roberto.id, self.user_leo.id])
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), {'max_depth': 3, 'distance': None, 'truncated': True})
+
+    def test_friends_neighborhood(self):
+        """Test users within two friendships of a user"""
+        self.friend_list_create()
+
+        http_auth = get_request_credentials(self.user_roberto)
+        self.client.credentials(**http_auth)
+        response = self.client.get(reverse('friends_neighborhood', args=[self.user_roberto.id]), {'max_depth': 2})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), {
+            'max_depth': 2,
+            'truncated': False,
+            'users': [
+                {'id': self.user_ana.id, 'distance': 1},
+                {'id': self.user_juan.id, 'distance': 1},
+                {'id': self.user_maykel.id, 'distance': 2},
+                {'id': self.user_leo.id, 'distance': 2},
+            ],
+        })
+
+    @override_settings(FRIEND_GRAPH_INDEX=True)
+    def test_shorter_connection_with_graph_index(self):
+        """Test shorter connection using the friend graph index"""
+        friend_graph_index.invalidate()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            baker.make(Friend, user=self.user_roberto, is_friend_of=self.user_juan)
+            baker.make(Friend, user=self.user_juan, is_friend_of=self.user_maykel)
+            baker.make(Friend, user=self.user_maykel, is_friend_of=self.user_leo)
+
+        url = reverse('shorter_connection_friends', args=[self.user_roberto.id, self.user_leo.id])
+        http_auth = get_request_credentials(self.user_roberto)
+        self.client.credentials(**http_auth)
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), [self.user_juan.id, self.user_maykel.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(reverse('friendship_delete', args=[self.user_roberto.id,
+                                                                             self.user_juan.id]))
+        self.assertEqual(response.status_code, 204)
+
+        response = self.client.get(url)
+        self.assertEqual(json.loads(response.content), [])
+        self.assertFalse(self.user_roberto.is_friend(self.user_juan))
+        friend_graph_index.invalidate()
+
+    @override_settings(FRIEND_GRAPH_INDEX=True)
+    def test_shorter_connection_with_graph_index_cached_after_write(self):
+        """Test the connections computed from the friend graph index are cached again right after a local write"""
+        friend_graph_index.invalidate()
+        with self.captureOnCommitCallbacks(execute=True):
+            baker.make(Friend, user=self.user_roberto, is_friend_of=self.user_juan)
+            baker.make(Friend, user=self.user_juan, is_friend_of=self.user_leo)
+
+        url = reverse('shorter_connection_friends', args=[self.user_roberto.id, self.user_leo.id])
+        self.client.credentials(**get_request_credentials(self.user_roberto))
+        self.assertEqual(json.loads(self.client.get(url).content), [self.user_juan.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            baker.make(Friend, user=self.user_roberto, is_friend_of=self.user_leo)
+
+        hits = shorter_connection_cache.stats()['hits']
+        self.assertEqual(json.loads(self.client.get(url).content), [])
+        self.assertEqual(json.loads(self.client.get(url).content), [])
+        self.assertEqual(shorter_connection_cache.stats()['hits'], hits + 1)
+        friend_graph_index.invalidate()
+
+    @override_settings(FRIENDS_COMPONENT_INDEX=True)
+    def test_shorter_connection_with_component_index(self):
+        """Test shorter connection between users without any connection does not search"""
+        component_index.invalidate()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            baker.make(Friend, user=self.user_roberto, is_friend_of=self.user_juan)
+            baker.make(Friend, user=self.user_leo, is_friend_of=self.user_maykel)
+
+        url = reverse('shorter_connection_friends', args=[self.user_roberto.id, self.user_leo.id])
+        http_auth = get_request_credentials(self.user_roberto)
+        self.client.credentials(**http_auth)
+
+        # Authentication, users existence and the load of the components
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(json.loads(response.content), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            baker.make(Friend, user=self.user_juan, is_friend_of=self.user_leo)
+
+        response = self.client.get(url)
+        self.assertEqual(json.loads(response.content), [self.user_juan.id])
+        component_index.invalidate()
+
+    @override_settings(FRIENDS_CONNECTIONS_NODE_BUDGET=1)
+    def test_shorter_connection_budget_exceeded(self):
+        """Test shorter connection when the search exceeds its budget"""
+        self.friend_list_create()
+
+        url = reverse('shorter_connection_friends', args=[self.user_roberto.id, self.user_leo.id])
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(json.loads(response.content),
+                         {'detail': 'The search of the connection exceeded its budget.'})
+
+    def test_distance_bounds(self):
+        """Test distance bounds from the landmark index"""
+        baker.make(Friend, user=self.user_roberto, is_friend_of=self.user_juan)
+        baker.make(Friend, user=self.user_roberto, is_friend_of=self.user_ana)
+        baker.make(Friend, user=self.user_juan, is_friend_of=self.user_leo)
+        baker.make(Friend, user=self.user_leo, is_friend_of=self.user_maykel)
+        friend_graph_index.invalidate()
+
+        http_auth = get_request_credentials(self.user_roberto)
+        self.client.credentials(**http_auth)
+
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(LANDMARK_INDEX_PATH=os.path.join(directory, 'landmarks.idx')):
+            url = reverse('distance_bounds', args=[self.user_juan.id, self.user_maykel.id])
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 503)
+
+            call_command('build_landmark_index', '--landmarks', '1', stdout=StringIO())
+
+            # Users existence, the user of the request is cached by the first request
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            data = json.loads(response.content)
+            self.assertEqual({key: data[key] for key in ('lower', 'upper', 'distance', 'exact')},
+                             {'lower': 2, 'upper': None, 'distance': None, 'exact': False})
+
+            response = self.client.get(url, {'exact': 'true'})
+            data = json.loads(response.content)
+            self.assertEqual({key: data[key] for key in ('lower', 'upper', 'distance', 'exact')},
+                             {'lower': 2, 'upper': 2, 'distance': 2, 'exact': True})
+
+            # Maykel has no friends, roberto reaches every user
+            url = reverse('distance_bounds', args=[self.user_maykel.id, self.user_roberto.id])
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            data = json.loads(response.content)
+            self.assertEqual({key: data[key] for key in ('lower', 'upper', 'distance', 'exact')},
+                             {'lower': None, 'upper': None, 'distance': None, 'exact': False})
+
+            # A friendship created after the build is found by the exact search
+            with self.captureOnCommitCallbacks(execute=True):
+                baker.make(Friend, user=self.user_maykel, is_friend_of=self.user_ana)
+                baker.make(Friend, user=self.user_ana, is_friend_of=self.user_roberto)
+            response = self.client.get(url, {'exact': 'true'})
+            data = json.loads(response.content)
+            self.assertEqual({key: data[key] for key in ('lower', 'upper', 'distance', 'exact')},
+                             {'lower': 2, 'upper': 2, 'distance': 2, 'exact': True})
+
+            url = reverse('distance_bounds', args=[self.user_juan.id, 99999])
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 404)
+
+        friend_graph_index.invalidate()
+
+    def friend_suggestions_create(self):
+        """Helper method for create the friendships of the suggestions"""
+        for user, friends in [(self.user_roberto, [self.user_ana, self.user_juan]),
+                              (self.user_ana, [self.user_leo, self.user_maykel]),
+                              (self.user_juan, [self.user_leo, self.user_roberto])]:
+            for friend in friends:
+                baker.make(Friend, user=user, is_friend_of=friend)
+
+    def test_mutual_friends(self):
+        """Test mutual friends of two users"""
+        self.friend_suggestions_create()
+        http_auth = get_request_credentials(self.user_roberto)
+        self.client.credentials(**http_auth)
+
+        url = reverse('mutual_friends', args=[self.user_ana.id, self.user_juan.id])
+        # Authentication, users existence and the mutual friends
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), {'count': 1, 'friends': [self.user_leo.id]})
+
+        # Users existence, the mutual friends are cached until the friend graph changes
+        with self.assertNumQueries(1):
+            self.client.get(reverse('mutual_friends', args=[self.user_juan.id, self.user_ana.id]))
+
+        response = self.client.get(reverse('mutual_friends', args=[self.user_ana.id, 99999]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_friend_suggestions(self):
+        """Test friend suggestions ranked by mutual friends"""
+        self.friend_suggestions_create()
+        http_auth = get_request_credentials(self.user_roberto)
+        self.client.credentials(**http_auth)
+        url = reverse('friend_suggestions', args=[self.user_roberto.id])
+
+        # Authentication, user existence, the grouped count and the budget check
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        expected = {
+            'suggestions': [{'id': self.user_leo.id, 'mutual': 2}, {'id': self.user_maykel.id, 'mutual': 1}],
+            'truncated': False,
+        }
+        self.assertEqual(json.loads(response.content), expected)
+
+        # User existence, the user of the request and the suggestions are cached
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'limit': 1})
+        self.assertEqual(json.loads(response.content)['suggestions'], expected['suggestions'][:1])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            baker.make(Friend, user=self.user_roberto, is_friend_of=self.user_maykel)
+
+        friend_graph_index.invalidate()
+        with override_settings(FRIEND_GRAPH_INDEX=True):
+            response = self.client.get(url)
+            self.assertEqual(json.loads(response.content), {
+                'suggestions': [{'id': self.user_leo.id, 'mutual': 2}],
+                'truncated': False,
+            })
+
+        with override_settings(FRIENDS_SUGGESTIONS_CANDIDATE_BUDGET=2):
+            cache.clear()
+            response = self.client.get(url)
+        self.assertTrue(json.loads(response.content)['truncated'])
+
+        response = self.client.get(url, {'limit': 0})
+        self.assertEqual(response.status_code, 400)
+        friend_graph_index.invalidate()
+
+    def test_owner_or_friend_permission_and_filter(self):
+        """Test the owner or friend permission and filter with the friendships of the database"""
+        baker.make(Friend, user=self.user_ana, is_friend_of=self.user_juan)
+        friend_ids_cache.clear()
+        permission = IsOwnerOrFriendOrAdmin()
+        request = mock.Mock(user=self.user_ana, friend_ids=None)
+
+        # The profiles, without their users, and the friend ids, loaded once for every object checked in the request
+        with self.assertNumQueries(2):
+            allowed = [permission.has_object_permission(request, None, profile)
+                       for profile in Profile.objects.order_by('user_id')]
+        self.assertEqual(allowed.count(True), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Friend.objects.filter(user=self.user_ana).delete()
+        request = mock.Mock(user=self.user_ana, friend_ids=None)
+        self.assertFalse(permission.has_object_permission(request, None, self.user_juan))
+
+        baker.make(Friend, user=self.user_ana, is_friend_of=self.user_leo)
+        with self.assertNumQueries(1):
+            profiles = IsOwnerOrFriendOrAdminFilterBackend().filter_queryset(
+                mock.Mock(user=self.user_ana), Profile.objects.all(), None)
+            self.assertEqual({profile.user_id for profile in profiles}, {self.user_ana.id, self.user_leo.id})
+
+    def test_bulk_create_friends(self):
+        """Test create a batch of friendships"""
+        baker.make(Friend, user=self.user_roberto, is_friend_of=self.user_ana)
+        url = reverse('friend_bulk_create')
+        body = {
+            "friendships": [
+                {"user": self.user_roberto.id, "is_friend_of": self.user_ana.id},
+                {"user": self.user_roberto.id, "is_friend_of": self.user_juan.id},
+                {"user": self.user_juan.id, "is_friend_of": self.user_leo.id},
+                {"user": self.user_juan.id, "is_friend_of": self.user_leo.id},
+                {"user": self.user_juan.id, "is_friend_of": 99999},
+                {"user": "juan", "is_friend_of": self.user_leo.id},
+            ]
+        }
+
+        http_auth = get_request_credentials(self.user_roberto)
+        self.client.credentials(**http_auth)
+
+        # Authentication, users, existing friendships, the insert and the followers of the users inside a savepoint
+        with self.assertNumQueries(7):
+            response = self.client.post(url, body, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        data = json.loads(response.content)
+        self.assertEqual(data['created'], 2)
+        self.assertEqual([result['status'] for result in data['results']],
+                         ['duplicated', 'created', 'created', 'duplicated', 'invalid', 'invalid'])
+        self.assertIn('user', data['results'][5]['errors'])
+        self.assertTrue(self.user_roberto.is_friend(self.user_juan))
+        self.assertTrue(self.user_juan.is_friend(self.user_leo))
+
+    def test_bulk_create_friends_created_meanwhile(self):
+        """Test a friendship created by another request after the check is reported as duplicated"""
+        check_friendships = BulkCreateFriendApiView._check_friendships
+
+        def create_meanwhile(results):
+            """Check the items and then create one of the new friendships as a concurrent request would do"""
+            new_friendships = check_friendships(results)
+            if not Friend.objects.filter(user=self.user_ana, is_friend_of=self.user_leo).exists():
+                Friend.objects.create(user=self.user_ana, is_friend_of=self.user_leo)
+            return new_friendships
+
+        body = {
+            "friendships": [
+                {"user": self.user_ana.id, "is_friend_of": self.user_leo.id},
+                {"user": self.user_ana.id, "is_friend_of": self.user_juan.id},
+            ]
+        }
+        http_auth = get_request_credentials(self.user_roberto)
+        self.client.credentials(**http_auth)
+
+        with mock.patch.object(BulkCreateFriendApiView, '_check_friendships', side_effect=create_meanwhile), \
+             mock.patch('accounts.views.friendships_created.send') as send_mock:
+            response = self.client.post(reverse('friend_bulk_create'), body, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        data = json.loads(response.content)
+        self.assertEqual(data['created'], 1)
+        self.assertEqual([result['status'] for result in data['results']], ['duplicated', 'created'])
+        send_mock.assert_called_once_with(sender=Friend, friendships=[(self.user_ana.id, self.user_juan.id)],
+                                          using=mock.ANY)
+        self.assertTrue(self.user_ana.is_friend(self.user_leo))
+        self.assertTrue(self.user_ana.is_friend(self.user_juan))
+
+    def test_bulk_create_friends_invalidates_connections(self):
+        """Test the friendships created in bulk are seen by the shorter connection"""
+        url = reverse('shorter_connection_friends', args=[self.user_roberto.id, self.user_leo.id])
+        http_auth = get_request_credentials(self.user_roberto)
+        self.client.credentials(**http_auth)
+        response = self.client.get(url)
+        self.assertEqual(json.loads(response.content), [])
+
+        body = {
+            "friendships": [
+                {"user": self.user_roberto.id, "is_friend_of": self.user_juan.id},
+                {"user": self.user_juan.id, "is_friend_of": self.user_leo.id},
+            ]
+        }
+        response = self.client.post(reverse('friend_bulk_create'), body, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.get(url)
+        self.assertEqual(json.loads(response.content), [self.user_juan.id])
+
+    def test_shorter_connection_cache_invalidation(self):
+        """Test a cached shorter connection is not served after the friendship is deleted"""
+        self.friend_list_create()
+
+        url = reverse('shorter_connection_friends', args=[self.user_roberto.id, self.user_leo.id])
+        http_auth = get_request_credentials(self.user_roberto)
+        self.client.credentials(**http_auth)
+        response = self.client.get(url)
+        self.assertEqual(json.loads(response.content), [self.user_ana.id])
+
+        # Users existence only
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(json.loads(response.content), [self.user_ana.id])
+
+        response = self.client.delete(reverse('friendship_delete', args=[self.user_roberto.id, self.user_ana.id]))
+        self.assertEqual(response.status_code, 204)
+
+        response = self.client.get(url)
+        self.assertEqual(json.loads(response.content), [self.user_juan.id, self.user_maykel.id])
+
+    def test_cache_stats(self):
+        """Test admin cache stats"""
+        url = reverse('manager_cache_stats')
+        http_auth = get_request_credentials(self.user_roberto)
+        self.client.credentials(**http_auth)
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertIn('hits', data['shorter_connection'])
+        self.assertIn('misses', data['shorter_connection'])
+
+        self.client.credentials(**get_request_credentials(self.user_ana))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(FRIEND_GRAPH_INDEX=True)
+    def test_friend_graph_compaction(self):
+        """Test admin friend graph index stats and compaction in the serving process"""
+        friend_graph_index.invalidate()
+        with self.captureOnCommitCallbacks(execute=True):
+            baker.make(Friend, user=self.user_roberto, is_friend_of=self.user_juan)
+            baker.make(Friend, user=self.user_juan, is_friend_of=self.user_maykel)
+        url = reverse('manager_friend_graph')
+        self.client.credentials(**get_request_credentials(self.user_roberto))
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(json.loads(response.content)['loaded'])
+
+        friend_graph_index.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            Friend.objects.create(user=self.user_ana, is_friend_of=self.user_leo)
+        self.assertEqual(friend_graph_index.stats()['overlay_size'], 1)
+
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(data['overlay_size'], 0)
+        self.assertEqual(data['friendships'], Friend.objects.count())
+        self.assertIn('seconds', data)
+
+        with override_settings(FRIEND_GRAPH_INDEX=False):
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, 409)
+
+        self.client.credentials(**get_request_credentials(self.user_ana))
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 403)
+        friend_graph_index.invalidate()
+
     def test_delete_friendship(self):
         """Test delete friendship"""
         self.friend_list_create()
@@ -0,0 +1,69 @@
+"""Unit test for accounts authentication"""
+from django.test import TestCase
+import mock
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from accounts.authentication import CachedJWTAuthentication
+from accounts.models import User
+
+CACHED_USER = {
+    'id': 1,
+    'username': 'JD2022',
+    'is_active': True,
+    'is_staff': False,
+    'is_superuser': False,
+    'password_marker': get_md5_hash_password('hash'),
+}
+
+
+class CachedJWTAuthenticationTest(TestCase):
+    """Test for CachedJWTAuthentication"""
+
+    def test_get_user_cached(self):
+        """Test the user is built from the cache without queries"""
+        with mock.patch('accounts.authentication.auth_user_cache.get', return_value=CACHED_USER), \
+             mock.patch.object(User.objects, 'get') as get_mock:
+            user = CachedJWTAuthentication().get_user({'user_id': 1})
+
+        get_mock.assert_not_called()
+        self.assertIsInstance(user, User)
+        self.assertEqual((user.pk, user.username, user.is_superuser), (1, 'JD2022', False))
+        self.assertEqual(user.get_deferred_fields(), {'password', 'last_login', 'first_name', 'last_name', 'email',
+                                                      'date_joined'})
+
+    def test_get_user_not_cached(self):
+        """Test the user is loaded and cached"""
+        user = User(id=1, username='JD2022', password='hash', is_active=True)
+
+        with mock.patch('accounts.authentication.auth_user_cache') as cache_mock, \
+             mock.patch.object(User.objects, 'get', return_value=user):
+            cache_mock.get.return_value = None
+            result = CachedJWTAuthentication().get_user({'user_id': 1})
+
+        self.assertEqual(result, user)
+        cache_mock.set.assert_called_once_with(1, CACHED_USER)
+
+    def test_get_user_inactive(self):
+        """Test inactive users are rejected"""
+        cached_user = {**CACHED_USER, 'is_active': False}
+
+        with mock.patch('accounts.authentication.auth_user_cache.get', return_value=cached_user), \
+             self.assertRaises(AuthenticationFailed):
+            CachedJWTAuthentication().get_user({'user_id': 1})
+
+    def test_get_user_without_user_id(self):
+        """Test tokens without user id are rejected"""
+        with self.assertRaises(InvalidToken):
+            CachedJWTAuthentication().get_user({})
+
+    def test_get_user_password_changed(self):
+        """Test the tokens issued before a password change are rejected"""
+        authentication = CachedJWTAuthentication()
+
+        with mock.patch('accounts.authentication.auth_user_cache.get', return_value=CACHED_USER), \
+             mock.patch.object(api_settings, 'CHECK_REVOKE_TOKEN', True):
+            authentication.get_user({'user_id': 1, 'hash_password': get_md5_hash_password('hash')})
+            with self.assertRaises(AuthenticationFailed):
+                authentication.get_user({'user_id': 1, 'hash_password': get_md5_hash_password('old')})
@@ -0,0 +1,157 @@
+"""Unit test for accounts benchmark"""
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command, CommandError
+from django.test import TestCase
+import mock
+
+from accounts.benchmark import percentile, summarize, compare, ApiBenchmark, SerializationBenchmark
+
+SUMMARY = {'requests': 4, 'errors': 0, 'p50_ms': 2.0, 'p95_ms': 10.0, 'max_ms': 10.0, 'queries_mean': 3.0,
+           'queries_max': 4}
+
+
+class BenchmarkTest(TestCase):
+    """Test for the benchmark functions"""
+
+    def test_percentile(self):
+        """Test percentile"""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.95), 95)
+        self.assertEqual(percentile([3], 0.95), 3)
+        self.assertIsNone(percentile([], 0.5))
+
+    def test_summarize(self):
+        """Test summarize"""
+        result = summarize([(0.002, 3, 200), (0.001, 2, 200), (0.010, 4, 201), (0.003, 3, 400)])
+
+        self.assertEqual(result, {'requests': 4, 'errors': 1, 'p50_ms': 2.0, 'p95_ms': 10.0, 'max_ms': 10.0,
+                                  'queries_mean': 3.0, 'queries_max': 4})
+
+    def test_compare(self):
+        """Test compare reports more queries, slower p95 over the tolerance and new errors"""
+        baseline = {'100': {'profiles_list': SUMMARY, 'friend_create': SUMMARY, 'removed': SUMMARY}}
+        results = {'100': {
+            'profiles_list': {**SUMMARY, 'p95_ms': 11.9},
+            'friend_create': {**SUMMARY, 'p95_ms': 12.5, 'queries_max': 5, 'errors': 1},
+        }}
+
+        regressions = compare(results, baseline, tolerance=0.2)
+
+        self.assertEqual(regressions, [
+            'friend_create (100 users): 5 queries, baseline 4',
+            'friend_create (100 users): p95 12.5ms, baseline 10.0ms',
+            'friend_create (100 users): 1 errors, baseline 0',
+        ])
+
+    def test_run(self):
+        """Test run warms up each scenario and then measures it"""
+        benchmark = ApiBenchmark([1, 2, 3], requests=3)
+
+        with mock.patch.object(ApiBenchmark, 'profiles_list', return_value=(0.001, 3, 200)) as measure_mock:
+            result = benchmark.run(['profiles_list'])
+
+        self.assertEqual(measure_mock.call_count, 4)
+        self.assertEqual(result['profiles_list']['requests'], 3)
+
+
+class BenchmarkApiCommandTest(TestCase):
+    """Test for the benchmark_api command"""
+
+    def call_command(self, results, *args):
+        """Call the command with the benchmark and the test database mocked"""
+        out = StringIO()
+        with mock.patch('accounts.management.commands.benchmark_api.connection') as connection_mock, \
+             mock.patch('accounts.management.commands.benchmark_api.setup_test_environment'), \
+             mock.patch('accounts.management.commands.benchmark_api.teardown_test_environment'), \
+             mock.patch('accounts.management.commands.benchmark_api.call_command') as generate_mock, \
+             mock.patch('accounts.management.commands.benchmark_api.ApiBenchmark') as benchmark_mock:
+            benchmark_mock.return_value.run.return_value = results
+            call_command('benchmark_api', '--sizes', '10', *args, stdout=out)
+
+        generate_mock.assert_called_once()
+        connection_mock.creation.destroy_test_db.assert_called_once()
+        return out.getvalue()
+
+    def test_benchmark_api(self):
+        """Test the command writes the results"""
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            out = self.call_command({'profiles_list': SUMMARY}, '--output', output)
+
+            with open(output, encoding='utf-8') as output_file:
+                self.assertEqual(json.load(output_file), {'10': {'profiles_list': SUMMARY}})
+
+        self.assertIn('profiles_list (10 users): p50 2.0ms, p95 10.0ms', out)
+
+    def test_benchmark_api_regression(self):
+        """Test the command fails when the results are worse than the baseline"""
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, 'baseline.json')
+            with open(baseline, 'w', encoding='utf-8') as baseline_file:
+                json.dump({'10': {'profiles_list': SUMMARY}}, baseline_file)
+
+            out = self.call_command({'profiles_list': SUMMARY}, '--output', os.path.join(directory, 'a.json'),
+                                    '--baseline', baseline)
+            self.assertIn('No regressions', out)
+
+            with self.assertRaises(CommandError):
+                self.call_command({'profiles_list': {**SUMMARY, 'queries_max': 9}},
+                                  '--output', os.path.join(directory, 'b.json'), '--baseline', baseline)
+
+    def test_benchmark_api_unknown_scenario(self):
+        """Test the command rejects unknown scenarios"""
+        with self.assertRaises(CommandError):
+            call_command('benchmark_api', '--scenarios', 'unknown')
+
+
+class SerializationBenchmarkTest(TestCase):
+    """Test for SerializationBenchmark"""
+
+    def test_run(self):
+        """Test run warms up each serialization and measures it before and after"""
+        before, after = mock.Mock(return_value=10), mock.Mock(return_value=10)
+        benchmark = SerializationBenchmark(10, repeat=2)
+
+        with mock.patch.object(SerializationBenchmark, 'users', return_value=(before, after)), \
+             mock.patch('accounts.benchmark.time.perf_counter', side_effect=[0, 1, 0, 0.5, 0, 0.25, 0, 0.1]):
+            result = benchmark.run(['users'])
+
+        self.assertEqual(before.call_count, 4)
+        self.assertEqual(after.call_count, 3)
+        self.assertEqual(result, {'users': {'rows': 10, 'before_rows_per_second': 20.0,
+                                            'after_rows_per_second': 100.0, 'speedup': 5.0}})
+
+
+class BenchmarkSerializersCommandTest(TestCase):
+    """Test for the benchmark_serializers command"""
+
+    def test_benchmark_serializers(self):
+        """Test the command writes the results"""
+        result = {'rows': 10, 'before_rows_per_second': 20.0, 'after_rows_per_second': 100.0, 'speedup': 5.0}
+        out = StringIO()
+
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch('accounts.management.commands.benchmark_serializers.connection') as connection_mock, \
+                mock.patch('accounts.management.commands.benchmark_serializers.setup_test_environment'), \
+                mock.patch('accounts.management.commands.benchmark_serializers.teardown_test_environment'), \
+                mock.patch('accounts.management.commands.benchmark_serializers.call_command'), \
+                mock.patch('accounts.management.commands.benchmark_serializers.SerializationBenchmark') as benchmark:
+            benchmark.return_value.run.return_value = {'users': result}
+            output = os.path.join(directory, 'results.json')
+            call_command('benchmark_serializers', '--serializations', 'users', '--output', output, stdout=out)
+
+            with open(output, encoding='utf-8') as output_file:
+                self.assertEqual(json.load(output_file), {'users': result})
+
+        connection_mock.creation.destroy_test_db.assert_called_once()
+        self.assertIn('users (10 rows): 20.0 rows/s before, 100.0 rows/s after, x5.0', out.getvalue())
+
+    def test_benchmark_serializers_unknown(self):
+        """Test the command rejects unknown serializations"""
+        with self.assertRaises(CommandError):
+            call_command('benchmark_serializers', '--serializations', 'unknown')
@@ -0,0 +1,303 @@
+"""Unit test for accounts caches"""
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+import mock
+
+from accounts.cache import AuthUserCache, FriendIdsCache, GraphCache, ShorterConnectionCache, bump_graph_generation, \
+    bump_resource_versions, computed_from, graph_generation, resource_version, resource_versions, _timeout
+
+
+class GraphGenerationTest(TestCase):
+    """Test for the friend graph generation"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_graph_generation(self):
+        """Test the generation starts at the current time and is stable"""
+        with mock.patch('accounts.cache.time.time_ns', return_value=1000):
+            self.assertEqual(graph_generation(), 1000)
+        self.assertEqual(graph_generation(), 1000)
+
+    def test_bump_graph_generation(self):
+        """Test bump_graph_generation moves to a new generation"""
+        generation = graph_generation()
+
+        self.assertEqual(bump_graph_generation(), generation + 1)
+        self.assertEqual(graph_generation(), generation + 1)
+
+    def test_bump_graph_generation_without_generation(self):
+        """Test bump_graph_generation when the generation was never read"""
+        with mock.patch('accounts.cache.time.time_ns', return_value=1000):
+            self.assertEqual(bump_graph_generation(), 1000)
+
+        self.assertEqual(graph_generation(), 1000)
+
+    def test_graph_generation_evicted(self):
+        """Test an evicted generation is replaced by a new one, never by a generation used before"""
+        with mock.patch('accounts.cache.time.time_ns', return_value=1000):
+            graph_generation()
+        bump_graph_generation()
+        cache.delete('accounts:friend_graph_generation')
+
+        with mock.patch('accounts.cache.time.time_ns', return_value=2000):
+            self.assertEqual(graph_generation(), 2000)
+            cache.delete('accounts:friend_graph_generation')
+            self.assertEqual(bump_graph_generation(), 2000)
+
+
+class ResourceVersionTest(TestCase):
+    """Test for the resources version stamps"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_resource_version(self):
+        """Test the version of a resource is stable until it is bumped"""
+        version = resource_version('profile', 1)
+
+        self.assertEqual(resource_version('profile', 1), version)
+        self.assertNotEqual(resource_version('friends', 1), version)
+
+        bump_resource_versions([('profile', 1)])
+        self.assertNotEqual(resource_version('profile', 1), version)
+
+    def test_resource_versions(self):
+        """Test the versions of many resources are the same read one by one"""
+        version = resource_version('profile', 1)
+        versions = resource_versions('profile', [1, 2])
+
+        self.assertEqual(versions[1], version)
+        self.assertEqual(versions[2], resource_version('profile', 2))
+
+    def test_resource_version_evicted(self):
+        """Test a version evicted from the cache comes back as a new one"""
+        version = resource_version('profile', 1)
+        cache.clear()
+
+        self.assertNotEqual(resource_version('profile', 1), version)
+
+    @override_settings(LOCAL_CACHE_TIMEOUT=0)
+    def test_resource_version_expired_without_shared_cache(self):
+        """Test the versions expire when the cache is local to the process, so the other processes see the changes"""
+        version = resource_version('profile', 1)
+        self.assertNotEqual(resource_version('profile', 1), version)
+        self.assertNotEqual(resource_versions('profile', [1]).get(1), version)
+
+        with mock.patch('accounts.cache.is_shared_cache', return_value=True):
+            version = resource_version('profile', 2)
+            self.assertEqual(resource_version('profile', 2), version)
+
+
+class ShorterConnectionCacheTest(TestCase):
+    """Test for ShorterConnectionCache"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_get_or_set(self):
+        """Test a connection is computed once"""
+        connections = ShorterConnectionCache()
+        compute = mock.Mock(return_value=[3])
+
+        self.assertEqual(connections.get_or_set(1, 2, compute), [3])
+        self.assertEqual(connections.get_or_set(1, 2, compute), [3])
+
+        compute.assert_called_once()
+        self.assertEqual((connections.hits, connections.misses), (1, 1))
+
+    def test_get_or_set_empty_connection(self):
+        """Test an empty connection is cached too"""
+        connections = ShorterConnectionCache()
+        compute = mock.Mock(return_value=[])
+
+        connections.get_or_set(1, 2, compute)
+        self.assertEqual(connections.get_or_set(1, 2, compute), [])
+
+        compute.assert_called_once()
+
+    def test_get_or_set_after_graph_change(self):
+        """Test a connection is computed again when the friend graph changes"""
+        connections = ShorterConnectionCache()
+        compute = mock.Mock(side_effect=[[3], []])
+
+        connections.get_or_set(1, 2, compute)
+        bump_graph_generation()
+
+        self.assertEqual(connections.get_or_set(1, 2, compute), [])
+        self.assertEqual(compute.call_count, 2)
+
+    def test_stats(self):
+        """Test stats"""
+        connections = ShorterConnectionCache()
+        self.assertEqual(connections.stats(),
+                         {'hits': 0, 'misses': 0, 'hit_ratio': None, 'generation': graph_generation()})
+
+        connections.get_or_set(1, 2, mock.Mock(return_value=[]))
+        connections.get_or_set(1, 2, mock.Mock(return_value=[]))
+
+        self.assertEqual(connections.stats()['hit_ratio'], 0.5)
+
+
+class GraphCacheTest(TestCase):
+    """Test for GraphCache"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_get_or_set(self):
+        """Test the values of each cache and key are computed once"""
+        suggestions = GraphCache('suggestions')
+        compute = mock.Mock(return_value={'suggestions': []})
+
+        suggestions.get_or_set((1,), compute)
+        suggestions.get_or_set((1,), compute)
+        suggestions.get_or_set((2,), compute)
+        GraphCache('other').get_or_set((1,), compute)
+
+        self.assertEqual(compute.call_count, 3)
+        self.assertIsNotNone(cache.get(f'accounts:suggestions:{graph_generation()}:1'))
+
+    def test_get_or_set_computed_from_previous_generation(self):
+        """Test the values computed from data of a previous generation are not cached"""
+        suggestions = GraphCache('suggestions')
+        previous = graph_generation()
+        generation = bump_graph_generation()
+
+        def compute(generation):
+            computed_from(generation)
+            return {'suggestions': []}
+
+        suggestions.get_or_set((1,), lambda: compute(generation))
+        suggestions.get_or_set((2,), lambda: compute(previous))
+        suggestions.get_or_set((3,), lambda: compute(None))
+
+        self.assertIsNotNone(cache.get(f'accounts:suggestions:{generation}:1'))
+        self.assertIsNone(cache.get(f'accounts:suggestions:{generation}:2'))
+        self.assertIsNone(cache.get(f'accounts:suggestions:{generation}:3'))
+
+    @override_settings(LOCAL_CACHE_TIMEOUT=5)
+    def test_timeout(self):
+        """Test the timeouts are bounded only when the cache is local to the process"""
+        self.assertEqual(_timeout(300), 5)
+        self.assertEqual(_timeout(None), 5)
+        self.assertEqual(_timeout(1), 1)
+
+        with mock.patch('accounts.cache.is_shared_cache', return_value=True):
+            self.assertEqual(_timeout(300), 300)
+            self.assertIsNone(_timeout(None))
+
+
+@mock.patch('accounts.models.Friend.get_friends_id_list', side_effect=lambda user_id: [user_id + 1])
+class FriendIdsCacheTest(TestCase):
+    """Test for FriendIdsCache"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_get(self, get_friends_mock):
+        """Test the friend ids are loaded once per generation"""
+        friend_ids = FriendIdsCache()
+
+        self.assertEqual(friend_ids.get(1), frozenset([2]))
+        self.assertEqual(friend_ids.get(1), frozenset([2]))
+        bump_graph_generation()
+        friend_ids.get(1)
+
+        self.assertEqual(get_friends_mock.call_count, 2)
+        self.assertEqual(friend_ids.stats(), {'hits': 1, 'misses': 2, 'hit_ratio': 1 / 3, 'users': 1})
+
+    @override_settings(FRIEND_IDS_CACHE_SIZE=2)
+    def test_get_evicts_least_recently_used(self, get_friends_mock):
+        """Test the users used less recently are dropped over the size"""
+        friend_ids = FriendIdsCache()
+        friend_ids.get(1)
+        friend_ids.get(2)
+        friend_ids.get(1)
+        friend_ids.get(3)
+        get_friends_mock.reset_mock()
+
+        friend_ids.get(1)
+        friend_ids.get(2)
+
+        get_friends_mock.assert_called_once_with(2)
+
+    def test_discard(self, get_friends_mock):
+        """Test the discarded users are loaded again"""
+        friend_ids = FriendIdsCache()
+        friend_ids.get(1)
+        friend_ids.discard([1, 5])
+        friend_ids.get(1)
+
+        self.assertEqual(get_friends_mock.call_count, 2)
+
+    @override_settings(LOCAL_CACHE_TIMEOUT=0)
+    def test_get_expired_without_shared_cache(self, get_friends_mock):
+        """Test the entries expire when the generation is local to the process, even if it did not change"""
+        friend_ids = FriendIdsCache()
+        friend_ids.get(1)
+        friend_ids.get(1)
+
+        self.assertEqual(get_friends_mock.call_count, 2)
+
+        with mock.patch('accounts.cache.is_shared_cache', return_value=True):
+            friend_ids.get(2)
+            friend_ids.get(2)
+        self.assertEqual(get_friends_mock.call_count, 3)
+
+
+class AuthUserCacheTest(TestCase):
+    """Test for AuthUserCache"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_get(self):
+        """Test the users are read from the local layer, then from the shared cache"""
+        users = AuthUserCache()
+        self.assertIsNone(users.get(1))
+
+        users.set(1, {'id': 1})
+        with mock.patch('accounts.cache._cache') as cache_mock:
+            self.assertEqual(users.get(1), {'id': 1})
+        cache_mock.assert_not_called()
+
+        self.assertEqual(AuthUserCache().get(1), {'id': 1})
+        self.assertEqual(users.stats(), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5, 'local_users': 1})
+
+    @override_settings(AUTH_USER_CACHE_LOCAL_TTL=0)
+    def test_get_local_expired(self):
+        """Test the expired users of the local layer are read again from the shared cache"""
+        users = AuthUserCache()
+        users.set(1, {'id': 1})
+
+        with mock.patch('accounts.cache._cache') as cache_mock:
+            cache_mock.return_value.get.return_value = {'id': 1, 'is_active': False}
+            self.assertEqual(users.get(1), {'id': 1, 'is_active': False})
+
+    def test_invalidate(self):
+        """Test an invalidated user is dropped from both layers"""
+        users = AuthUserCache()
+        users.set(1, {'id': 1})
+        users.invalidate(1)
+
+        self.assertIsNone(users.get(1))
+        self.assertIsNone(AuthUserCache().get(1))
+
+    @override_settings(LOCAL_CACHE_TIMEOUT=5, AUTH_USER_CACHE_TIMEOUT=300)
+    def test_set_timeout_without_shared_cache(self):
+        """Test the users are kept only LOCAL_CACHE_TIMEOUT seconds when the cache is local to the process"""
+        with mock.patch('accounts.cache._cache') as cache_mock, \
+                mock.patch('accounts.cache.is_shared_cache', return_value=False) as shared_mock:
+            AuthUserCache().set(1, {'id': 1})
+            cache_mock.return_value.set.assert_called_once_with('accounts:auth_user:1', {'id': 1}, timeout=5)
+
+            shared_mock.return_value = True
+            AuthUserCache().set(2, {'id': 2})
+            cache_mock.return_value.set.assert_called_with('accounts:auth_user:2', {'id': 2}, timeout=300)
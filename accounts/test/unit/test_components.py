@@ -0,0 +1,89 @@
+"""Unit test for accounts components index"""
+from django.test import TestCase, override_settings
+import mock
+
+from accounts.components import UnionFind, ComponentIndex, get_component_index, component_index
+
+# Friendships used by the tests, two components: {1, 2, 3, 4} and {5, 6}
+EDGES = [(1, 2), (3, 2), (4, 3), (5, 6)]
+
+
+def make_index():
+    """Index loaded from EDGES"""
+    iterator = mock.Mock(return_value=iter(EDGES))
+    with mock.patch('accounts.models.Friend.objects.values_list', return_value=mock.Mock(iterator=iterator)):
+        index = ComponentIndex()
+        index.get()
+    return index
+
+
+class UnionFindTest(TestCase):
+    """Test for UnionFind"""
+
+    def test_union(self):
+        """Test the sets are joined in any direction"""
+        forest = UnionFind()
+        for user_id, friend_id in EDGES:
+            forest.union(user_id, friend_id)
+
+        self.assertEqual(len({forest.find(node) for node in (1, 2, 3, 4)}), 1)
+        self.assertEqual(forest.find(5), forest.find(6))
+        self.assertNotEqual(forest.find(1), forest.find(5))
+        self.assertEqual(forest.find(7), 7)
+        self.assertEqual(sorted(forest.size.values()), [2, 4])
+
+
+class ComponentIndexTest(TestCase):
+    """Test for ComponentIndex"""
+
+    def test_are_disconnected(self):
+        """Test only the users of different components are disconnected"""
+        index = make_index()
+
+        self.assertFalse(index.are_disconnected(1, 4))
+        self.assertFalse(index.are_disconnected(4, 1))
+        self.assertTrue(index.are_disconnected(1, 5))
+        self.assertTrue(index.are_disconnected(1, 7))
+        self.assertEqual(index.stats(), {'loaded': True, 'users': 6, 'components': 2})
+
+    def test_add_friendships(self):
+        """Test created friendships join components"""
+        index = make_index()
+        index.add_friendships([(6, 4)])
+
+        self.assertFalse(index.are_disconnected(1, 5))
+
+    def test_add_friendships_not_loaded(self):
+        """Test the friendships are ignored until the index is loaded"""
+        index = ComponentIndex()
+        index.add_friendships([(1, 2)])
+
+        self.assertEqual(index.stats(), {'loaded': False, 'users': 0, 'components': 0})
+
+    def test_invalidate(self):
+        """Test the index is loaded again after it is invalidated"""
+        index = make_index()
+        index.invalidate()
+
+        with mock.patch.object(ComponentIndex, 'load', return_value=UnionFind()) as load_mock:
+            self.assertTrue(index.are_disconnected(1, 2))
+
+        load_mock.assert_called_once()
+
+    @override_settings(FRIEND_GRAPH_INDEX_MAX_AGE=0)
+    def test_get_reloads_old_index(self):
+        """Test the index is loaded again once it is too old"""
+        with mock.patch.object(ComponentIndex, 'load', return_value=UnionFind()) as load_mock:
+            index = ComponentIndex()
+            index.get()
+            with mock.patch('accounts.components.time.monotonic', return_value=10 ** 9):
+                index.get()
+
+        self.assertEqual(load_mock.call_count, 2)
+
+    def test_get_component_index(self):
+        """Test get_component_index depends on the setting"""
+        with override_settings(FRIENDS_COMPONENT_INDEX=False):
+            self.assertIsNone(get_component_index())
+        with override_settings(FRIENDS_COMPONENT_INDEX=True):
+            self.assertIs(get_component_index(), component_index)
@@ -0,0 +1,94 @@
+"""Unit test for accounts conditional GET responses"""
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+import mock
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from accounts.conditional import RenderedCache, _matches, conditional_json_response, rendered_cache
+
+
+class RenderedCacheTest(TestCase):
+    """Test for RenderedCache"""
+
+    @override_settings(RENDERED_CACHE_MAX_BYTES=10)
+    def test_set_evicts_least_recently_used(self):
+        """Test the least recently used contents are dropped over the size in bytes"""
+        rendered = RenderedCache()
+        rendered.set('a', b'1234')
+        rendered.set('b', b'1234')
+        rendered.get('a')
+        rendered.set('c', b'1234')
+
+        self.assertEqual(rendered.get('a'), b'1234')
+        self.assertIsNone(rendered.get('b'))
+        self.assertEqual(rendered.stats()['bytes'], 8)
+
+        rendered.set('d', b'12345678901')
+        self.assertIsNone(rendered.get('d'))
+
+    def test_stats(self):
+        """Test the hit and miss counters"""
+        rendered = RenderedCache()
+        rendered.get('a')
+        rendered.set('a', b'{}')
+        rendered.get('a')
+
+        self.assertEqual(rendered.stats(), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5, 'entries': 1, 'bytes': 2})
+
+
+class ConditionalJsonResponseTest(TestCase):
+    """Test for conditional_json_response"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        rendered_cache.clear()
+
+    @staticmethod
+    def _request(if_none_match=None):
+        """Mocked request of a JSON response"""
+        headers = {'If-None-Match': if_none_match} if if_none_match else {}
+        return mock.Mock(accepted_renderer=JSONRenderer(), headers=headers,
+                         build_absolute_uri=mock.Mock(return_value='http://testserver/api/profiles/1/'))
+
+    def test_matches(self):
+        """Test the weak comparison of If-None-Match"""
+        self.assertTrue(_matches('"a", "b"', '"b"'))
+        self.assertTrue(_matches('W/"b"', '"b"'))
+        self.assertTrue(_matches('*', '"b"'))
+        self.assertFalse(_matches('"a"', '"b"'))
+        self.assertFalse(_matches('', '"b"'))
+
+    def test_conditional_json_response(self):
+        """Test the content is rendered once per version and the ETag is answered with 304"""
+        render = mock.Mock(return_value=Response({'id': 1}))
+
+        response = conditional_json_response(self._request(), ('profile', 1), render)
+        etag = response['ETag']
+        self.assertEqual(response.content, b'{"id":1}')
+
+        response = conditional_json_response(self._request(), ('profile', 1), render)
+        self.assertEqual(response.content, b'{"id":1}')
+        render.assert_called_once()
+
+        response = conditional_json_response(self._request(etag), ('profile', 1), render)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_conditional_json_response_not_ok(self):
+        """Test the responses that are not 200 are neither cached nor tagged"""
+        render = mock.Mock(return_value=Response(status=404))
+
+        response = conditional_json_response(self._request(), ('profile', 1), render)
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(rendered_cache.stats()['entries'], 0)
+
+    def test_conditional_json_response_other_renderer(self):
+        """Test other formats are always rendered"""
+        request = self._request()
+        request.accepted_renderer = mock.Mock()
+        render = mock.Mock(return_value=Response({'id': 1}))
+
+        self.assertIs(conditional_json_response(request, ('profile', 1), render), render.return_value)
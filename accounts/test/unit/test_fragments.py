@@ -0,0 +1,80 @@
+"""Unit test for accounts rendered profiles fragments"""
+import json
+
+from django.test import TestCase, override_settings
+import mock
+
+from accounts.fragments import ProfileFragmentCache, profile_fragment_cache, render_profiles
+from accounts.serializers import ProfileSerializer, ProfileValuesSerializer
+
+
+class ProfileFragmentCacheTest(TestCase):
+    """Test for ProfileFragmentCache"""
+
+    def test_get_many(self):
+        """Test only the profiles rendered for their current versions are returned"""
+        fragments = ProfileFragmentCache()
+        fragments.set(1, 'a', b'{"user_id":1}')
+        fragments.set(2, 'a', b'{"user_id":2}')
+
+        self.assertEqual(fragments.get_many({1: 'a', 2: 'b', 3: 'a'}), {1: b'{"user_id":1}'})
+        self.assertEqual(fragments.stats(), {'hits': 1, 'misses': 2, 'hit_ratio': 1 / 3, 'profiles': 2})
+
+    @override_settings(PROFILE_FRAGMENT_CACHE_SIZE=2)
+    def test_set_evicts_least_recently_used(self):
+        """Test the least recently used profiles are dropped over the size"""
+        fragments = ProfileFragmentCache()
+        fragments.set(1, 'a', b'1')
+        fragments.set(2, 'a', b'2')
+        fragments.get_many({1: 'a'})
+        fragments.set(3, 'a', b'3')
+
+        self.assertEqual(fragments.get_many({1: 'a', 2: 'a', 3: 'a'}), {1: b'1', 3: b'3'})
+
+    @override_settings(LOCAL_CACHE_TIMEOUT=0)
+    def test_get_many_expired_without_shared_cache(self):
+        """Test the profiles expire when the versions are local to the process, even if they did not change"""
+        fragments = ProfileFragmentCache()
+        fragments.set(1, 'a', b'1')
+        self.assertEqual(fragments.get_many({1: 'a'}), {})
+
+        with mock.patch('accounts.fragments._timeout', return_value=None):
+            fragments.set(2, 'a', b'2')
+        self.assertEqual(fragments.get_many({2: 'a'}), {2: b'2'})
+
+
+@mock.patch('accounts.fragments.resource_versions', return_value={1: 'a', 2: 'a', 3: 'a'})
+class RenderProfilesTest(TestCase):
+    """Test for render_profiles"""
+
+    def setUp(self):
+        super().setUp()
+        profile_fragment_cache.clear()
+
+    def test_render_profiles(self, _):
+        """Test the missing profiles are serialized and the array is assembled in the order of the users"""
+        profile_fragment_cache.set(2, 'a', b'{"user_id":2}')
+        rows = [{**dict.fromkeys(ProfileValuesSerializer.Meta.fields.values()), 'user_id': user_id, 'city': 'Oslo'}
+                for user_id in [3, 1]]
+
+        with mock.patch('accounts.fragments.Profile.objects.filter') as filter_mock, \
+             mock.patch.object(ProfileValuesSerializer, 'values', return_value=rows), \
+             mock.patch.object(ProfileValuesSerializer, 'friends_of', return_value={1: [3]}):
+            content = render_profiles([1, 2, 3, 4])
+
+        filter_mock.assert_called_once_with(user_id__in=[1, 3, 4])
+        profiles = json.loads(content)
+        self.assertEqual([profile['user_id'] for profile in profiles], [1, 2, 3])
+        self.assertEqual(list(profiles[0]), ProfileSerializer.Meta.fields)
+        self.assertEqual(profiles[0]['friends'], [3])
+        self.assertEqual(profiles[2]['friends'], [])
+        self.assertEqual(set(profile_fragment_cache.get_many({1: 'a', 3: 'a'})), {1, 3})
+
+    def test_render_profiles_cached(self, _):
+        """Test the profiles are not loaded when all of them are cached"""
+        profile_fragment_cache.set(1, 'a', b'{"user_id":1}')
+
+        with mock.patch('accounts.fragments.Profile.objects.filter') as queryset_mock:
+            self.assertEqual(render_profiles([1]), b'[{"user_id":1}]')
+
+        queryset_mock.assert_not_called()
@@ -0,0 +1,315 @@
+"""Unit test for accounts graph"""
+from django.test import TestCase, override_settings
+import mock
+
+from accounts.graph import CompressedAdjacency, DeltaAdjacency, FriendGraph, FriendGraphIndex, get_friend_graph
+
+EDGES = [(3, 1), (1, 2), (1, 3), (2, 3), (5, 1)]
+
+
+class CompressedAdjacencyTest(TestCase):
+    """Test for CompressedAdjacency"""
+
+    def test_from_sorted_edges(self):
+        """Test the CSR arrays built from sorted edges"""
+        adjacency = CompressedAdjacency.from_sorted_edges(sorted(EDGES))
+
+        self.assertEqual(adjacency.nodes.tolist(), [1, 2, 3, 5])
+        self.assertEqual(adjacency.offsets.tolist(), [0, 2, 3, 4, 5])
+        self.assertEqual(adjacency.neighbours.tolist(), [2, 3, 3, 1, 1])
+        self.assertEqual(len(adjacency), 5)
+
+    def test_from_sorted_edges_empty(self):
+        """Test an adjacency without edges"""
+        adjacency = CompressedAdjacency.from_sorted_edges([])
+
+        self.assertEqual(adjacency.neighbours_of(1).tolist(), [])
+        self.assertFalse(adjacency.has_edge(1, 2))
+
+    def test_neighbours_of(self):
+        """Test neighbours_of"""
+        adjacency = CompressedAdjacency.from_sorted_edges(sorted(EDGES))
+
+        self.assertEqual(adjacency.neighbours_of(1).tolist(), [2, 3])
+        self.assertEqual(adjacency.neighbours_of(4).tolist(), [])
+        self.assertEqual(adjacency.neighbours_of(9).tolist(), [])
+
+    def test_has_edge(self):
+        """Test has_edge"""
+        adjacency = CompressedAdjacency.from_sorted_edges(sorted(EDGES))
+
+        self.assertTrue(adjacency.has_edge(1, 3))
+        self.assertFalse(adjacency.has_edge(3, 2))
+        self.assertFalse(adjacency.has_edge(4, 1))
+
+    def test_edges(self):
+        """Test edges iterates all the pairs in order"""
+        adjacency = CompressedAdjacency.from_sorted_edges(sorted(EDGES))
+
+        self.assertEqual(list(adjacency.edges()), sorted(EDGES))
+
+    def test_transposed(self):
+        """Test transposed builds the opposite direction with its neighbours sorted"""
+        adjacency = CompressedAdjacency.from_sorted_edges(sorted(EDGES)).transposed()
+
+        self.assertEqual(adjacency.nodes.tolist(), [1, 2, 3])
+        self.assertEqual(adjacency.offsets.tolist(), [0, 2, 3, 5])
+        self.assertEqual(adjacency.neighbours.tolist(), [3, 5, 1, 1, 2])
+        self.assertEqual(len(CompressedAdjacency().transposed()), 0)
+
+
+class DeltaAdjacencyTest(TestCase):
+    """Test for DeltaAdjacency"""
+
+    def setUp(self):
+        super().setUp()
+        self.adjacency = DeltaAdjacency(CompressedAdjacency.from_sorted_edges(sorted(EDGES)))
+
+    def test_add(self):
+        """Test an added edge is merged with the base"""
+        self.assertTrue(self.adjacency.add(1, 4))
+        self.assertTrue(self.adjacency.add(1, 0))
+
+        self.assertEqual(self.adjacency.neighbours_of(1), [0, 2, 3, 4])
+        self.assertTrue(self.adjacency.has_edge(1, 4))
+        self.assertEqual(self.adjacency.size, 2)
+        self.assertEqual(len(self.adjacency), 7)
+
+    def test_add_existing_edge(self):
+        """Test adding an edge of the base does nothing"""
+        self.assertFalse(self.adjacency.add(1, 2))
+        self.assertEqual(self.adjacency.size, 0)
+        self.assertEqual(len(self.adjacency), 5)
+
+    def test_remove(self):
+        """Test a removed edge is hidden from the base"""
+        self.assertTrue(self.adjacency.remove(1, 2))
+
+        self.assertEqual(self.adjacency.neighbours_of(1), [3])
+        self.assertFalse(self.adjacency.has_edge(1, 2))
+        self.assertEqual(self.adjacency.size, 1)
+        self.assertEqual(len(self.adjacency), 4)
+
+    def test_remove_missing_edge(self):
+        """Test removing an edge that does not exist does nothing"""
+        self.assertFalse(self.adjacency.remove(2, 1))
+        self.assertEqual(self.adjacency.size, 0)
+
+    def test_add_and_remove_cancel(self):
+        """Test opposite changes of the same edge cancel each other"""
+        self.adjacency.add(4, 1)
+        self.adjacency.remove(4, 1)
+        self.adjacency.remove(1, 3)
+        self.adjacency.add(1, 3)
+
+        self.assertEqual(self.adjacency.size, 0)
+        self.assertEqual(list(self.adjacency.neighbours_of(4)), [])
+        self.assertEqual(list(self.adjacency.neighbours_of(1)), [2, 3])
+
+    def test_compacted(self):
+        """Test the overlay is folded into new base arrays"""
+        self.adjacency.add(4, 1)
+        self.adjacency.remove(1, 2)
+
+        compacted = self.adjacency.compacted()
+
+        self.assertEqual(list(compacted.edges()), [(1, 3), (2, 3), (3, 1), (4, 1), (5, 1)])
+
+    def test_copy(self):
+        """Test a copy does not see later changes"""
+        copy = self.adjacency.copy()
+        self.adjacency.add(4, 1)
+
+        self.assertFalse(copy.has_edge(4, 1))
+        self.assertEqual(copy.size, 0)
+
+
+class FriendGraphTest(TestCase):
+    """Test for FriendGraph"""
+
+    def test_from_edges(self):
+        """Test the graph answers in both directions"""
+        graph = FriendGraph.from_edges(EDGES)
+
+        self.assertEqual(graph.edge_count, 5)
+        self.assertEqual(graph.friends(1), [2, 3])
+        self.assertEqual(graph.followers(1), [3, 5])
+        self.assertTrue(graph.are_friends(5, 1))
+        self.assertFalse(graph.are_friends(1, 5))
+
+    def test_load(self):
+        """Test load streams the friendships once for both directions"""
+        iterator = mock.Mock(return_value=iter(sorted(EDGES)))
+        values_list = mock.Mock(return_value=mock.Mock(iterator=iterator))
+
+        with mock.patch('accounts.models.Friend.objects.order_by',
+                        return_value=mock.Mock(values_list=values_list)) as order_by_mock:
+            graph = FriendGraph.load()
+
+        order_by_mock.assert_called_once_with('user_id', 'is_friend_of_id')
+        self.assertEqual(graph.friends(1), [2, 3])
+        self.assertEqual(graph.followers(3), [1, 2])
+
+    def test_apply(self):
+        """Test friendship changes are applied in both directions"""
+        graph = FriendGraph.from_edges(EDGES)
+
+        graph.apply((True, 2, 5))
+        graph.apply((False, 1, 3))
+
+        self.assertEqual(graph.friends(2), [3, 5])
+        self.assertEqual(graph.followers(5), [2])
+        self.assertEqual(graph.followers(3), [2])
+        self.assertEqual(graph.overlay_size, 2)
+
+
+class FriendGraphIndexTest(TestCase):
+    """Test for FriendGraphIndex"""
+
+    def test_get_loads_once(self):
+        """Test the graph is loaded only on first use"""
+        graph = FriendGraph.from_edges(EDGES)
+        index = FriendGraphIndex()
+
+        with mock.patch('accounts.graph.FriendGraph.load', return_value=graph) as load_mock, \
+             mock.patch('accounts.graph.graph_generation', return_value=4):
+            self.assertEqual(index.get(), graph)
+            self.assertEqual(index.get(), graph)
+
+        load_mock.assert_called_once()
+        self.assertEqual(graph.generation, 4)
+
+    def test_invalidate(self):
+        """Test the graph is loaded again after invalidate"""
+        index = FriendGraphIndex()
+
+        with mock.patch('accounts.graph.FriendGraph.load', return_value=FriendGraph()) as load_mock:
+            index.get()
+            index.invalidate()
+            index.get()
+
+        self.assertEqual(load_mock.call_count, 2)
+
+    @override_settings(FRIEND_GRAPH_INDEX_MAX_AGE=-1)
+    def test_get_reloads_old_graph(self):
+        """Test the graph is loaded again when it is older than the max age"""
+        index = FriendGraphIndex()
+
+        with mock.patch('accounts.graph.FriendGraph.load', return_value=FriendGraph()) as load_mock:
+            index.get()
+            index.get()
+
+        self.assertEqual(load_mock.call_count, 2)
+
+    def test_add_and_remove_friendships(self):
+        """Test changes are applied to the loaded graph"""
+        index = FriendGraphIndex()
+
+        with mock.patch('accounts.graph.FriendGraph.load', return_value=FriendGraph.from_edges(EDGES)):
+            index.add_friendships([(2, 5)])
+            graph = index.get()
+            index.add_friendships([(2, 5)])
+            index.remove_friendships([(1, 2)])
+
+        self.assertEqual(graph.friends(2), [3, 5])
+        self.assertEqual(graph.friends(1), [3])
+        self.assertEqual(index.stats(), {'loaded': True, 'friendships': 5, 'overlay_size': 2, 'compacting': False})
+
+    def test_generation_follows_local_changes(self):
+        """Test the graph moves to the generations of the local changes until one of another process is missing"""
+        index = FriendGraphIndex()
+
+        with mock.patch('accounts.graph.FriendGraph.load', return_value=FriendGraph.from_edges(EDGES)), \
+             mock.patch('accounts.graph.graph_generation', return_value=10):
+            graph = index.get()
+        index.note_generation(11)
+        index.add_friendships([(2, 5)], 13)
+        self.assertEqual(graph.generation, 11)
+
+        index.remove_friendships([(1, 2)], 12)
+        self.assertEqual(graph.generation, 13)
+
+        index.add_friendships([(4, 5)], 15)
+        index.note_generation(16)
+        self.assertEqual(graph.generation, 13)
+
+    @override_settings(FRIEND_GRAPH_INDEX_COMPACTION_THRESHOLD=2)
+    def test_compaction_starts_over_threshold(self):
+        """Test a background compaction starts when the overlay reaches the threshold"""
+        index = FriendGraphIndex()
+
+        with mock.patch('accounts.graph.FriendGraph.load', return_value=FriendGraph.from_edges(EDGES)), \
+             mock.patch('accounts.graph.threading.Thread') as thread_mock:
+            index.get()
+            index.add_friendships([(2, 5)])
+            thread_mock.assert_not_called()
+            index.add_friendships([(4, 5)])
+
+        thread_mock.assert_called_once_with(target=index.compact, name='friend-graph-compaction', daemon=True)
+        thread_mock.return_value.start.assert_called_once()
+
+    def test_compact(self):
+        """Test compact folds the overlay and replays the changes logged meanwhile"""
+        index = FriendGraphIndex()
+
+        with mock.patch('accounts.graph.FriendGraph.load', return_value=FriendGraph.from_edges(EDGES)), \
+             mock.patch('accounts.graph.graph_generation', return_value=10):
+            index.get()
+        index.add_friendships([(2, 5)])
+
+        compacted = FriendGraph.compacted
+
+        def compact_while_writing(graph):
+            """Another change arrives while the compaction runs"""
+            index.remove_friendships([(1, 2)], 11)
+            return compacted(graph)
+
+        with mock.patch('accounts.graph.FriendGraph.compacted', autospec=True, side_effect=compact_while_writing):
+            self.assertTrue(index.compact())
+
+        graph = index.get()
+        self.assertEqual(list(graph.forward.base.edges()), [(1, 2), (1, 3), (2, 3), (2, 5), (3, 1), (5, 1)])
+        self.assertEqual(graph.friends(1), [3])
+        self.assertEqual(graph.overlay_size, 1)
+        self.assertEqual(graph.generation, 11)
+
+    def test_compact_without_graph(self):
+        """Test compact when the graph is not loaded"""
+        self.assertFalse(FriendGraphIndex().compact())
+
+    @override_settings(FRIEND_GRAPH_INDEX_COMPACTION_THRESHOLD=1)
+    def test_compact_outrun_by_changes(self):
+        """Test the compaction is given up when more changes than the threshold arrive while it runs"""
+        index = FriendGraphIndex()
+
+        with mock.patch('accounts.graph.FriendGraph.load', return_value=FriendGraph.from_edges(EDGES)), \
+             mock.patch('accounts.graph.threading.Thread'):
+            graph = index.get()
+
+            def compact_while_writing(snapshot):
+                """Many changes arrive while the compaction runs"""
+                index.add_friendships([(2, 5), (4, 5)])
+                return snapshot
+
+            with mock.patch('accounts.graph.FriendGraph.compacted', autospec=True, side_effect=compact_while_writing):
+                self.assertTrue(index.compact())
+
+        self.assertIs(index.get(), graph)
+        self.assertIsNone(index._log)
+        self.assertEqual(graph.friends(4), [5])
+
+    @override_settings(FRIEND_GRAPH_INDEX=False)
+    def test_get_friend_graph_disabled(self):
+        """Test get_friend_graph when the index is disabled"""
+        self.assertIsNone(get_friend_graph())
+
+    @override_settings(FRIEND_GRAPH_INDEX=True)
+    def test_get_friend_graph_enabled(self):
+        """Test get_friend_graph when the index is enabled"""
+        graph = FriendGraph(generation=3)
+
+        with mock.patch('accounts.graph.friend_graph_index.get', return_value=graph), \
+             mock.patch('accounts.graph.computed_from') as computed_from_mock:
+            self.assertEqual(get_friend_graph(), graph)
+
+        computed_from_mock.assert_called_once_with(3)
@@ -0,0 +1,123 @@
+"""Unit test for accounts landmark distance oracle"""
+import math
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+import mock
+
+from accounts.graph import FriendGraph
+from accounts.landmarks import LandmarkIndex, LandmarkIndexHolder
+
+# Friendships used by the tests: user -> is_friend_of. 1 is the user with more friendships and 7 is alone.
+EDGES = [(1, 2), (1, 3), (2, 4), (3, 1), (4, 1), (5, 1), (4, 6)]
+USERS = [1, 2, 3, 4, 5, 6, 7]
+
+
+class LandmarkIndexTest(TestCase):
+    """Test for LandmarkIndex"""
+
+    def setUp(self):
+        super().setUp()
+        self.index = LandmarkIndex.build(FriendGraph.from_edges(EDGES), USERS, 1)
+
+    def test_build(self):
+        """Test the distances from and to the landmark"""
+        self.assertEqual(self.index.landmarks, [1])
+        self.assertEqual(list(self.index.forward[0]), [0, 1, 1, 2, 0xFFFF, 3, 0xFFFF])
+        self.assertEqual(list(self.index.backward[0]), [0, 2, 1, 1, 1, 0xFFFF, 0xFFFF])
+
+    def test_build_user_deleted_after_graph_loaded(self):
+        """Test the users of the graph missing from the users ids are indexed too"""
+        index = LandmarkIndex.build(FriendGraph.from_edges(EDGES), [user_id for user_id in USERS if user_id != 4], 1)
+
+        self.assertEqual(list(index.user_ids), USERS)
+        self.assertEqual(list(index.forward[0]), [0, 1, 1, 2, 0xFFFF, 3, 0xFFFF])
+
+    def test_bounds(self):
+        """Test the bounds contain the distance"""
+        self.assertEqual(self.index.bounds(2, 2), (0, 0))
+        # 3 -> 1 -> 2
+        self.assertEqual(self.index.bounds(3, 2), (1, 2))
+        # 5 -> 1 -> 2 -> 4 -> 6
+        self.assertEqual(self.index.bounds(5, 6), (1, 4))
+        # 2 -> 4 -> 6
+        self.assertEqual(self.index.bounds(2, 6), (2, 5))
+        # 2 -> 4 -> 1
+        self.assertEqual(self.index.bounds(2, 1), (2, 2))
+
+    def test_bounds_not_connected(self):
+        """Test the users surely not connected"""
+        # 1 reaches 2 but not 5
+        self.assertEqual(self.index.bounds(2, 5), (math.inf, math.inf))
+        # 2 reaches 1 but 6 does not
+        self.assertEqual(self.index.bounds(6, 2), (math.inf, math.inf))
+
+    def test_bounds_unknown_user(self):
+        """Test the users created after the build are unbounded"""
+        self.assertEqual(self.index.bounds(1, 99), (1, math.inf))
+
+    def test_save_and_load(self):
+        """Test the index written to a file is read back"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'landmarks.idx')
+            self.index.save(path)
+            index = LandmarkIndex.load(path)
+
+        self.assertEqual(list(index.user_ids), USERS)
+        self.assertEqual(index.landmarks, [1])
+        self.assertEqual(index.forward, self.index.forward)
+        self.assertEqual(index.backward, self.index.backward)
+        self.assertEqual(index.built_at, self.index.built_at)
+
+    def test_load_invalid_file(self):
+        """Test load rejects other files"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'landmarks.idx')
+            with open(path, 'wb') as index_file:
+                index_file.write(b'other\n')
+
+            with self.assertRaises(ValueError):
+                LandmarkIndex.load(path)
+
+
+class LandmarkIndexHolderTest(TestCase):
+    """Test for LandmarkIndexHolder"""
+
+    def test_get(self):
+        """Test the file is loaded once and again when it changes"""
+        index = LandmarkIndex.build(FriendGraph.from_edges(EDGES), USERS, 1)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'landmarks.idx')
+            holder = LandmarkIndexHolder()
+
+            with override_settings(LANDMARK_INDEX_PATH=path):
+                self.assertIsNone(holder.get())
+
+                index.save(path)
+                with mock.patch.object(LandmarkIndex, 'load', wraps=LandmarkIndex.load) as load_mock:
+                    self.assertEqual(holder.get().landmarks, [1])
+                    holder.get()
+                    os.utime(path, (0, 0))
+                    holder.get()
+
+        self.assertEqual(load_mock.call_count, 2)
+
+    def test_build_landmark_index_command(self):
+        """Test the build_landmark_index command"""
+        out = StringIO()
+        iterator = mock.Mock(return_value=iter(USERS))
+
+        with tempfile.TemporaryDirectory() as directory, \
+             mock.patch('accounts.graph.FriendGraph.load', return_value=FriendGraph.from_edges(EDGES)), \
+             mock.patch('accounts.management.commands.build_landmark_index.User.objects.order_by',
+                        return_value=mock.Mock(values_list=mock.Mock(return_value=mock.Mock(iterator=iterator)))):
+            path = os.path.join(directory, 'landmarks.idx')
+            call_command('build_landmark_index', '--landmarks', '2', '--output', path, stdout=out)
+            index = LandmarkIndex.load(path)
+
+        self.assertEqual(index.landmarks, [1, 4])
+        self.assertIn('Landmarks: 2, users: 7, friendships: 7', out.getvalue())
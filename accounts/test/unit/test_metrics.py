@@ -0,0 +1,99 @@
+"""Unit test for accounts metrics"""
+import json
+import os
+import tempfile
+
+from django.test import TestCase, override_settings
+import mock
+
+from accounts.metrics import MetricsRegistry
+
+
+def make_registry():
+    """Registry with a counter and a histogram"""
+    registry = MetricsRegistry()
+    counter = registry.counter('requests_total', 'Requests', ('view',))
+    histogram = registry.histogram('duration_seconds', 'Duration', ('view',), (0.1, 1))
+    return registry, counter, histogram
+
+
+class MetricsRegistryTest(TestCase):
+    """Test for MetricsRegistry"""
+
+    def test_render(self):
+        """Test the exposition of counters and cumulative histograms"""
+        registry, counter, histogram = make_registry()
+        counter.inc(view='friends')
+        counter.inc(2, view='friends')
+        counter.inc(view='say "hi"')
+        histogram.observe(0.05, view='friends')
+        histogram.observe(0.1, view='friends')
+        histogram.observe(3, view='friends')
+
+        self.assertEqual(registry.render().splitlines(), [
+            '# HELP requests_total Requests',
+            '# TYPE requests_total counter',
+            'requests_total{view="friends"} 3',
+            'requests_total{view="say \\"hi\\""} 1',
+            '# HELP duration_seconds Duration',
+            '# TYPE duration_seconds histogram',
+            'duration_seconds_bucket{view="friends",le="0.1"} 2',
+            'duration_seconds_bucket{view="friends",le="1"} 2',
+            'duration_seconds_bucket{view="friends",le="+Inf"} 3',
+            'duration_seconds_sum{view="friends"} 3.15',
+            'duration_seconds_count{view="friends"} 3',
+        ])
+
+    def test_values_inherited_by_fork_are_dropped(self):
+        """Test a forked process does not count again the values of its parent"""
+        registry, counter, _ = make_registry()
+        counter.inc(view='friends')
+
+        with mock.patch('accounts.metrics.os.getpid', return_value=-1):
+            counter.inc(view='friends')
+            self.assertEqual(registry.snapshot(), {'requests_total': {('friends',): 1}})
+
+    def test_collect_from_every_process(self):
+        """Test the values of the files of every process are added up"""
+        registry, counter, histogram = make_registry()
+        counter.inc(view='friends')
+        histogram.observe(0.5, view='friends')
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            with open(os.path.join(directory, 'metrics-1.json'), 'w', encoding='utf-8') as metrics_file:
+                json.dump({
+                    'requests_total': [[['friends'], 4], [['profiles'], 1]],
+                    'duration_seconds': [[['friends'], [1, 0, 0, 0.05]]],
+                    'removed_metric': [[[], 1]],
+                }, metrics_file)
+            with open(os.path.join(directory, 'metrics-2.json'), 'w', encoding='utf-8') as metrics_file:
+                metrics_file.write('{"requests_total": ')
+
+            collected = registry.collect()
+
+            self.assertTrue(os.path.exists(os.path.join(directory, f'metrics-{os.getpid()}.json')))
+
+        self.assertEqual(collected['requests_total'], {('friends',): 5, ('profiles',): 1})
+        self.assertEqual(collected['duration_seconds'], {('friends',): [1, 1, 0, 0.55]})
+        self.assertNotIn('removed_metric', collected)
+
+    def test_maybe_flush(self):
+        """Test the values are written at most once per flush interval"""
+        registry, counter, _ = make_registry()
+
+        with tempfile.TemporaryDirectory() as directory, \
+             override_settings(METRICS_DIR=directory, METRICS_FLUSH_INTERVAL=60), \
+             mock.patch.object(registry, 'flush', wraps=registry.flush) as flush_mock:
+            counter.inc(view='friends')
+            counter.inc(view='friends')
+
+        flush_mock.assert_called_once()
+
+    def test_maybe_flush_without_directory(self):
+        """Test nothing is written without metrics directory"""
+        registry, counter, _ = make_registry()
+
+        with mock.patch.object(registry, 'flush') as flush_mock:
+            counter.inc(view='friends')
+
+        flush_mock.assert_not_called()
@@ -0,0 +1,110 @@
+"""Unit test for accounts middlewares"""
+from django.test import TestCase, override_settings
+import mock
+
+from accounts.middleware import QueryRecorder, QueryStats, QueryInstrumentationMiddleware, RequestMetricsMiddleware
+
+
+def record(recorder, *statements):
+    """Execute the statements through the recorder"""
+    execute = mock.Mock(return_value='result')
+    for sql in statements:
+        recorder(execute, sql, (1,), False, {})
+    return execute
+
+
+class QueryRecorderTest(TestCase):
+    """Test for QueryRecorder"""
+
+    def test_record(self):
+        """Test the recorder counts the statements and their duplicated shapes"""
+        recorder = QueryRecorder()
+        execute = record(recorder, 'SELECT a', 'SELECT b WHERE id = %s', 'SELECT b WHERE id = %s',
+                         'SELECT b WHERE id = %s')
+
+        self.assertEqual(execute.call_count, 4)
+        self.assertEqual(recorder.count, 4)
+        self.assertEqual(recorder.duplicates, 2)
+        self.assertGreaterEqual(recorder.seconds, 0)
+
+    def test_record_failed_statement(self):
+        """Test the failed statements are counted too"""
+        recorder = QueryRecorder()
+
+        with self.assertRaises(ValueError):
+            recorder(mock.Mock(side_effect=ValueError), 'SELECT a', (), False, {})
+
+        self.assertEqual(recorder.count, 1)
+
+
+class QueryStatsTest(TestCase):
+    """Test for QueryStats"""
+
+    def test_record(self):
+        """Test the aggregates and histograms of a view"""
+        query_stats = QueryStats()
+        recorder = QueryRecorder()
+        record(recorder, 'SELECT a', 'SELECT a', 'SELECT b')
+        query_stats.record('friends_profiles', recorder)
+        query_stats.record('friends_profiles', QueryRecorder())
+
+        stats = query_stats.stats()['friends_profiles']
+
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(stats['queries'], 3)
+        self.assertEqual(stats['queries_max'], 3)
+        self.assertEqual(stats['duplicates'], 1)
+        self.assertEqual(stats['queries_histogram']['1'], 1)
+        self.assertEqual(stats['queries_histogram']['5'], 1)
+        self.assertEqual(stats['sql_ms_histogram']['1'], 2)
+        self.assertEqual(stats['queries_histogram']['+Inf'], 0)
+
+    def test_reset(self):
+        """Test reset drops the aggregates"""
+        query_stats = QueryStats()
+        query_stats.record('friends_profiles', QueryRecorder())
+        query_stats.reset()
+
+        self.assertEqual(query_stats.stats(), {})
+
+
+class QueryInstrumentationMiddlewareTest(TestCase):
+    """Test for QueryInstrumentationMiddleware"""
+
+    def test_call(self):
+        """Test the middleware records the queries of the view and sends the Server-Timing header"""
+        response = {}
+        request = mock.Mock(resolver_match=mock.Mock(view_name='profile_list_create'))
+
+        with mock.patch('accounts.middleware.query_stats') as stats_mock:
+            QueryInstrumentationMiddleware(lambda _request: response)(request)
+
+        stats_mock.record.assert_called_once()
+        self.assertEqual(stats_mock.record.call_args.args[0], 'profile_list_create')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="0 queries, 0 duplicated", total;dur=')
+
+    @override_settings(QUERY_INSTRUMENTATION=False)
+    def test_call_disabled(self):
+        """Test the middleware does nothing when disabled"""
+        response = {}
+
+        with mock.patch('accounts.middleware.query_stats') as stats_mock:
+            QueryInstrumentationMiddleware(lambda request: response)(mock.Mock())
+
+        stats_mock.record.assert_not_called()
+        self.assertEqual(response, {})
+
+
+class RequestMetricsMiddlewareTest(TestCase):
+    """Test for RequestMetricsMiddleware"""
+
+    def test_call(self):
+        """Test the middleware counts the request and observes its duration"""
+        request = mock.Mock(method='GET', resolver_match=None)
+
+        with mock.patch('accounts.middleware.http_requests') as requests_mock, \
+             mock.patch('accounts.middleware.http_request_duration') as duration_mock:
+            RequestMetricsMiddleware(lambda _request: mock.Mock(status_code=404))(request)
+
+        requests_mock.inc.assert_called_once_with(view='unresolved', method='GET', status=404)
+        self.assertEqual(duration_mock.observe.call_args.kwargs, {'view': 'unresolved'})
@@ -18,6 +18,17 @@ class UserModelTest(TestCase):
 
         self.assertEqual(friends, result)
 
+    def test_friends_id_list_prefetched(self):
+        """Test friends id list when the friendships were prefetched"""
+        user = User()
+        user.prefetched_friendships = [mock.Mock(is_friend_of_id=2), mock.Mock(is_friend_of_id=3)]
+
+        with mock.patch('accounts.models.Friend.get_friends_id_list') as get_friends_mock:
+            result = user.friends_id_list
+
+        self.assertEqual(result, [2, 3])
+        get_friends_mock.assert_not_called()
+
     def test_is_friend(self):
         """Test is friend"""
         user = mock.Mock(spec=User, id=1)
@@ -72,8 +83,33 @@ class FriendModelTest(TestCase):
         user = mock.Mock(spec=User, id=1)
         friends_id_list = mock.Mock()
         values_list = mock.Mock(values_list=mock.Mock(return_value=friends_id_list))
+        order_by = mock.Mock(order_by=mock.Mock(return_value=values_list))
 
-        with mock.patch('accounts.models.Friend.objects.filter', return_value=values_list):
+        with mock.patch('accounts.models.Friend.objects.filter', return_value=order_by):
             result = Friend.get_friends_id_list(user.id)
 
         self.assertEqual(friends_id_list, result)
+        order_by.order_by.assert_called_once_with('is_friend_of_id')
+
+    def test_are_friends_with_graph_index(self):
+        """Test are_friends when the friend graph index is enabled"""
+        graph = mock.Mock(are_friends=mock.Mock(return_value=True))
+
+        with mock.patch('accounts.models.get_friend_graph', return_value=graph), \
+             mock.patch('accounts.models.Friend.objects.filter') as filter_mock:
+            result = Friend.are_friends(1, 2)
+
+        self.assertTrue(result)
+        graph.are_friends.assert_called_once_with(1, 2)
+        filter_mock.assert_not_called()
+
+    def test_get_friends_id_list_with_graph_index(self):
+        """Test get_friends_id_list when the friend graph index is enabled"""
+        graph = mock.Mock(friends=mock.Mock(return_value=[2, 3]))
+
+        with mock.patch('accounts.models.get_friend_graph', return_value=graph), \
+             mock.patch('accounts.models.Friend.objects.filter') as filter_mock:
+            result = Friend.get_friends_id_list(1)
+
+        self.assertEqual(result, [2, 3])
+        filter_mock.assert_not_called()
@@ -3,7 +3,7 @@ from django.test import TestCase
 import mock
 
 from accounts.models import User
-from accounts.permissions import IsOwnerOrAdmin, IsOwnerOrFriendOrAdmin
+from accounts.permissions import IsOwnerOrAdmin, IsOwnerOrFriendOrAdmin, IsOwnerOrFriendOrAdminFilterBackend
 
 
 class IsOwnerOrAdminTest(TestCase):
@@ -37,9 +37,10 @@ class IsOwnerOrAdminTest(TestCase):
     def test_has_object_permission_user_is_not_superuser_obj_is_not_user_instance(self):
         """Test for has_object_permission when user isn't superuser, obj isn't User instance but obj has a field called
          user and this user made the request"""
-        user = mock.Mock(spec=User, is_superuser=False)
+        user = mock.Mock(spec=User, is_superuser=False, id=1)
         view = mock.Mock()
-        obj = mock.Mock(user=user)
+        # Only the id of the owner is read, the user is not fetched
+        obj = mock.Mock(spec=['user_id'], user_id=1)
         request = mock.Mock(user=user)
 
         permission = IsOwnerOrAdmin()
@@ -64,85 +65,134 @@ class IsOwnerOrAdminTest(TestCase):
 class IsOwnerOrFriendOrAdminTest(TestCase):
     """Test for IsOwnerOrFriendOrAdmin"""
 
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('accounts.permissions.friend_ids_cache.get', return_value=frozenset())
+        self.friend_ids_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
     def test_has_object_permission_user_is_superuser(self):
         """Test for has_object_permission when user is superuser"""
-        user = mock.Mock(spec=User, is_superuser=True, is_friend=mock.Mock(return_value=False))
+        user = mock.Mock(spec=User, is_superuser=True)
         view = mock.Mock()
         obj = mock.Mock()
-        request = mock.Mock(user=user)
+        request = mock.Mock(user=user, friend_ids=None)
 
         permission = IsOwnerOrFriendOrAdmin()
         result = permission.has_object_permission(request, view, obj)
 
-        user.is_friend.assert_not_called()
+        self.friend_ids_mock.assert_not_called()
         self.assertTrue(result)
 
     def test_has_object_permission_user_is_not_superuser_obj_is_user_instance(self):
         """Test for has_object_permission when user isn't superuser but obj is User instance and this user made the
         request """
-        user = mock.Mock(spec=User, is_superuser=False, is_friend=mock.Mock(return_value=False))
+        user = mock.Mock(spec=User, is_superuser=False)
         view = mock.Mock()
         obj = user
-        request = mock.Mock(user=user)
+        request = mock.Mock(user=user, friend_ids=None)
 
         permission = IsOwnerOrFriendOrAdmin()
         result = permission.has_object_permission(request, view, obj)
 
-        user.assert_not_called()
+        self.friend_ids_mock.assert_not_called()
         self.assertTrue(result)
 
     def test_has_object_permission_user_is_not_superuser_obj_is_user_instance_and_friend_of_requester(self):
         """Test for has_object_permission when user isn't superuser but obj is User instance and this request user is
         friend of obj user"""
-        user = mock.Mock(spec=User, is_superuser=False, is_friend=mock.Mock(return_value=True))
+        user = mock.Mock(spec=User, is_superuser=False, id=1)
         view = mock.Mock()
-        obj = mock.Mock(spec=User)
-        request = mock.Mock(user=user)
+        obj = mock.Mock(spec=User, id=2)
+        request = mock.Mock(user=user, friend_ids=None)
+        self.friend_ids_mock.return_value = frozenset([2])
 
         permission = IsOwnerOrFriendOrAdmin()
         result = permission.has_object_permission(request, view, obj)
 
-        user.is_friend.assert_called_once_with(obj.id)
+        self.friend_ids_mock.assert_called_once_with(1)
         self.assertTrue(result)
 
     def test_has_object_permission_user_is_not_superuser_obj_is_not_user_instance(self):
         """Test for has_object_permission when user isn't superuser, obj isn't User instance but obj has a field called
          user and this user made the request"""
-        user = mock.Mock(spec=User, is_superuser=False, is_friend=mock.Mock(return_value=False))
+        user = mock.Mock(spec=User, is_superuser=False, id=1)
         view = mock.Mock()
-        obj = mock.Mock(user=user)
-        request = mock.Mock(user=user)
+        obj = mock.Mock(spec=['user_id'], user_id=1)
+        request = mock.Mock(user=user, friend_ids=None)
 
         permission = IsOwnerOrFriendOrAdmin()
         result = permission.has_object_permission(request, view, obj)
 
-        user.is_friend.assert_not_called()
+        self.friend_ids_mock.assert_not_called()
         self.assertTrue(result)
 
     def test_has_object_permission_user_is_not_superuser_obj_is_not_user_instance_user_owner_of_obj_is_friend(self):
         """Test for has_object_permission when user isn't superuser, obj isn't User instance but obj has a field called
          user, user that made the request is friend of obj owner user"""
-        user = mock.Mock(spec=User, is_superuser=False, is_friend=mock.Mock(return_value=True))
+        user = mock.Mock(spec=User, is_superuser=False, id=1)
         view = mock.Mock()
-        obj = mock.Mock(user=mock.Mock(spec=User))
-        request = mock.Mock(user=user)
+        obj = mock.Mock(spec=['user_id'], user_id=2)
+        request = mock.Mock(user=user, friend_ids=None)
+        self.friend_ids_mock.return_value = frozenset([2])
 
         permission = IsOwnerOrFriendOrAdmin()
         result = permission.has_object_permission(request, view, obj)
 
-        user.is_friend.assert_called_once_with(obj.user.id)
+        self.friend_ids_mock.assert_called_once_with(1)
         self.assertTrue(result)
 
+    def test_has_object_permission_friend_ids_loaded_once_per_request(self):
+        """Test the friend ids are loaded once for all the objects checked in a request"""
+        user = mock.Mock(spec=User, is_superuser=False, id=1)
+        view = mock.Mock()
+        request = mock.Mock(user=user, friend_ids=None)
+        self.friend_ids_mock.return_value = frozenset([2])
+
+        permission = IsOwnerOrFriendOrAdmin()
+        results = [permission.has_object_permission(request, view, mock.Mock(spec=['user_id'], user_id=user_id))
+                   for user_id in (2, 3, 2)]
+
+        self.friend_ids_mock.assert_called_once_with(1)
+        self.assertEqual(results, [True, False, True])
+
     def test_has_object_permission_user_does_not_have_permission(self):
         """Test for has_object_permission when user doesn't have permission"""
-        user = mock.Mock(spec=User, is_superuser=False, is_friend=mock.Mock(return_value=False))
+        user = mock.Mock(spec=User, is_superuser=False)
         view = mock.Mock()
         obj = mock.Mock()
-        request = mock.Mock(user=user)
+        request = mock.Mock(user=user, friend_ids=None)
 
         permission = IsOwnerOrFriendOrAdmin()
         with mock.patch('accounts.permissions.hasattr', return_value=False):
             result = permission.has_object_permission(request, view, obj)
 
-        user.is_friend.assert_not_called()
+        self.friend_ids_mock.assert_not_called()
         self.assertFalse(result)
+
+
+class IsOwnerOrFriendOrAdminFilterBackendTest(TestCase):
+    """Test for IsOwnerOrFriendOrAdminFilterBackend"""
+
+    def test_filter_queryset_user_is_superuser(self):
+        """Test admins see every row"""
+        queryset = mock.Mock()
+        request = mock.Mock(user=mock.Mock(is_superuser=True))
+
+        result = IsOwnerOrFriendOrAdminFilterBackend().filter_queryset(request, queryset, mock.Mock())
+
+        queryset.filter.assert_not_called()
+        self.assertEqual(result, queryset)
+
+    def test_filter_queryset(self):
+        """Test the rows are filtered with a single predicate on the owner field of the view"""
+        queryset = mock.Mock()
+        request = mock.Mock(user=mock.Mock(is_superuser=False, id=1))
+
+        result = IsOwnerOrFriendOrAdminFilterBackend().filter_queryset(request, queryset, mock.Mock(owner_field='pk'))
+
+        queryset.filter.assert_called_once()
+        predicate = queryset.filter.call_args[0][0]
+        self.assertEqual(predicate.connector, 'OR')
+        self.assertEqual(predicate.children[0], ('pk', 1))
+        self.assertEqual(result, queryset.filter.return_value)
@@ -0,0 +1,69 @@
+"""Unit test for accounts provisioning"""
+from django.test import TestCase, override_settings
+import mock
+
+from accounts.provisioning import PasswordHashingPool, provision_users
+
+
+class PasswordHashingPoolTest(TestCase):
+    """Test for PasswordHashingPool"""
+
+    @override_settings(PASSWORD_HASHING_WORKERS=1)
+    def test_hash_passwords_inline(self):
+        """Test hash_passwords does not start processes with a single worker"""
+        pool = PasswordHashingPool()
+
+        with mock.patch('accounts.provisioning.make_password', side_effect=lambda password: f'hash-{password}'), \
+             mock.patch('accounts.provisioning.ProcessPoolExecutor') as executor_mock:
+            result = pool.hash_passwords(['a', 'b'])
+
+        self.assertEqual(result, ['hash-a', 'hash-b'])
+        executor_mock.assert_not_called()
+
+    @override_settings(PASSWORD_HASHING_WORKERS=2)
+    def test_hash_passwords_in_processes(self):
+        """Test hash_passwords maps the passwords over the process pool, created once"""
+        pool = PasswordHashingPool()
+
+        with mock.patch('accounts.provisioning.ProcessPoolExecutor') as executor_mock:
+            executor_mock.return_value.map.return_value = iter(['hash-a', 'hash-b'])
+            result = pool.hash_passwords(['a', 'b'])
+            executor_mock.return_value.map.return_value = iter(['hash-c', 'hash-d'])
+            pool.hash_passwords(['c', 'd'])
+
+        self.assertEqual(result, ['hash-a', 'hash-b'])
+        executor_mock.assert_called_once()
+        self.assertEqual(executor_mock.call_args.kwargs['max_workers'], 2)
+
+
+class ProvisionUsersTest(TestCase):
+    """Test for provision_users"""
+
+    def test_provision_users(self):
+        """Test provision_users creates users and the given profiles in bulk"""
+        rows = [
+            {'username': 'ana', 'first_name': 'Ana', 'last_name': 'Doe', 'email': 'ana@example.com',
+             'password': 'secret', 'profile': {'city': 'Paris'}},
+            {'username': 'leo', 'first_name': 'Leo', 'last_name': 'Doe', 'email': 'leo@example.com',
+             'password': 'secret'},
+        ]
+
+        def bulk_create_users(users, batch_size):
+            for pk, user in enumerate(users, start=1):
+                user.pk = pk
+            return users
+
+        with mock.patch('accounts.provisioning.password_hashing_pool.hash_passwords',
+                        return_value=['hash-1', 'hash-2']), \
+             mock.patch('accounts.provisioning.User.objects.bulk_create',
+                        side_effect=bulk_create_users) as users_mock, \
+             mock.patch('accounts.provisioning.Profile.objects.bulk_create') as profiles_mock:
+            result = provision_users(rows)
+
+        self.assertEqual([user.username for user in result], ['ana', 'leo'])
+        self.assertEqual([user.password for user in result], ['hash-1', 'hash-2'])
+        users_mock.assert_called_once()
+        profiles = profiles_mock.call_args.args[0]
+        self.assertEqual(len(profiles), 1)
+        self.assertEqual(profiles[0].user_id, 1)
+        self.assertEqual(profiles[0].city, 'Paris')
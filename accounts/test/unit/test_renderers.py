@@ -0,0 +1,31 @@
+"""Unit test for accounts renderers"""
+import datetime
+from decimal import Decimal
+
+from django.test import TestCase
+import mock
+from rest_framework.renderers import JSONRenderer
+
+from accounts.renderers import FastJSONRenderer
+
+DATA = {'id': 1, 'name': 'Jhon \u2028 Doé', 'friends': [2, 3], 'available': None, 'ratio': Decimal('0.5'),
+        'joined': datetime.datetime(2022, 1, 2, 3, 4, 5, 678912, tzinfo=datetime.timezone.utc), 7: 'key'}
+
+
+class FastJSONRendererTest(TestCase):
+    """Test for FastJSONRenderer"""
+
+    def test_render(self):
+        """Test the output is the same of JSONRenderer"""
+        self.assertEqual(FastJSONRenderer().render(DATA), JSONRenderer().render(DATA))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_render_indent(self):
+        """Test the indented responses are rendered by JSONRenderer"""
+        self.assertEqual(FastJSONRenderer().render(DATA, 'application/json; indent=4'),
+                         JSONRenderer().render(DATA, 'application/json; indent=4'))
+
+    def test_render_without_orjson(self):
+        """Test JSONRenderer is used without orjson"""
+        with mock.patch('accounts.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(DATA), JSONRenderer().render(DATA))
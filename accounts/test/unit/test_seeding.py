@@ -0,0 +1,165 @@
+"""Unit test for accounts seeding"""
+from io import StringIO
+
+from django.core.management import call_command, CommandError
+from django.test import TestCase
+import mock
+
+from accounts.seeding import generate_users, generate_friendships, chunked, erdos_renyi_edges, \
+    barabasi_albert_edges, watts_strogatz_edges
+
+
+class GenerateUsersTest(TestCase):
+    """Test for generate_users"""
+
+    def test_generate_users_is_deterministic(self):
+        """Test generate_users returns the same users for the same seed"""
+        self.assertEqual(list(generate_users(5, seed=3)), list(generate_users(5, seed=3)))
+        self.assertNotEqual(list(generate_users(5, seed=3)), list(generate_users(5, seed=4)))
+
+    def test_generate_users_unique(self):
+        """Test the usernames and phones never repeat, also between batches with different start"""
+        users = list(generate_users(50)) + list(generate_users(50, start=50))
+
+        self.assertEqual(len({user['username'] for user in users}), 100)
+        self.assertEqual(len({user['profile']['phone'] for user in users}), 100)
+        self.assertTrue(all(len(user['profile']['phone']) <= 15 for user in users))
+
+    def test_generate_users_shared_password(self):
+        """Test generate_users with a single password"""
+        self.assertEqual({user['password'] for user in generate_users(5, password='secret')}, {'secret'})
+
+
+class GenerateFriendshipsTest(TestCase):
+    """Test for generate_friendships"""
+
+    def test_generate_friendships(self):
+        """Test every user gets distinct friends other than itself"""
+        user_ids = [10, 20, 30, 40, 50]
+        friendships = list(generate_friendships(user_ids, 3, seed=1))
+
+        self.assertEqual(len(friendships), 15)
+        self.assertEqual(len(set(friendships)), 15)
+        self.assertFalse([user_id for user_id, friend_id in friendships if user_id == friend_id])
+        self.assertEqual(friendships, list(generate_friendships(user_ids, 3, seed=1)))
+
+    def test_generate_friendships_limited(self):
+        """Test the number of friends is limited to the other users"""
+        self.assertEqual(sorted(generate_friendships([1, 2], 5)), [(1, 2), (2, 1)])
+        self.assertEqual(list(generate_friendships([1], 5)), [])
+
+    def test_chunked(self):
+        """Test chunked"""
+        self.assertEqual(list(chunked(range(5), 2)), [[0, 1], [2, 3], [4]])
+        self.assertEqual(list(chunked([], 2)), [])
+
+
+class GraphModelsTest(TestCase):
+    """Test for the random graph models"""
+
+    def assert_simple_graph(self, links, count):
+        """Check the links are unique pairs of distinct nodes"""
+        pairs = {frozenset(link) for link in links}
+        self.assertEqual(len(pairs), len(links))
+        self.assertTrue(all(len(pair) == 2 and all(0 <= node < count for node in pair) for pair in pairs))
+
+    def test_erdos_renyi_edges(self):
+        """Test erdos_renyi_edges links about degree / 2 pairs per node"""
+        links = list(erdos_renyi_edges(1000, 10, seed=1))
+
+        self.assert_simple_graph(links, 1000)
+        self.assertTrue(4500 < len(links) < 5500)
+        self.assertEqual(links, list(erdos_renyi_edges(1000, 10, seed=1)))
+
+    def test_erdos_renyi_edges_limits(self):
+        """Test erdos_renyi_edges without links and complete"""
+        self.assertEqual(list(erdos_renyi_edges(10, 0)), [])
+        self.assertEqual(len(list(erdos_renyi_edges(10, 9))), 45)
+
+    def test_barabasi_albert_edges(self):
+        """Test barabasi_albert_edges links every new node with links older nodes"""
+        links = list(barabasi_albert_edges(1000, 3, seed=1))
+
+        self.assert_simple_graph(links, 1000)
+        self.assertEqual(len(links), (1000 - 3) * 3)
+        self.assertTrue(all(node > other for node, other in links))
+        degrees = {}
+        for link in links:
+            for node in link:
+                degrees[node] = degrees.get(node, 0) + 1
+        # Preferential attachment makes hubs far over the average degree
+        self.assertGreater(max(degrees.values()), 30)
+
+    def test_watts_strogatz_edges(self):
+        """Test watts_strogatz_edges keeps the number of links of the ring"""
+        ring = list(watts_strogatz_edges(100, 4, 0))
+        rewired = list(watts_strogatz_edges(100, 4, 0.5, seed=1))
+
+        self.assert_simple_graph(rewired, 100)
+        self.assertEqual(len(ring), 200)
+        self.assertIn((0, 1), ring)
+        self.assertIn((0, 98), ring)
+        self.assertEqual(len(rewired), 200)
+        self.assertNotEqual(sorted(ring), sorted(rewired))
+
+
+class GenerateSocialGraphCommandTest(TestCase):
+    """Test for the generate_social_graph command"""
+
+    def test_generate_social_graph(self):
+        """Test the command loads both directions of every link and invalidates the indexes and the versions"""
+        out = StringIO()
+        users = [mock.Mock(pk=pk) for pk in range(11, 16)]
+
+        with mock.patch('accounts.management.commands.generate_social_graph.provision_users',
+                        return_value=users) as provision_mock, \
+             mock.patch('accounts.management.commands.generate_social_graph.make_password', return_value='hash'), \
+             mock.patch('accounts.management.commands.generate_social_graph.insert_friendships') as insert_mock, \
+             mock.patch('accounts.management.commands.generate_social_graph.bump_graph_generation') as bump_mock, \
+             mock.patch('accounts.management.commands.generate_social_graph.friend_graph_index') as index_mock, \
+             mock.patch('accounts.management.commands.generate_social_graph.component_index') as components_mock, \
+             mock.patch('accounts.management.commands.generate_social_graph.bump_resource_versions') as versions_mock:
+            call_command('generate_social_graph', 'watts-strogatz', 5, '--degree', '2', '--rewiring', '0',
+                         stdout=out)
+
+        provision_mock.assert_called_once()
+        self.assertEqual(provision_mock.call_args.args[1], 'hash')
+        friendships = insert_mock.call_args.args[0]
+        self.assertEqual(len(friendships), 10)
+        self.assertIn((11, 12), friendships)
+        self.assertIn((12, 11), friendships)
+        bump_mock.assert_called_once()
+        index_mock.invalidate.assert_called_once()
+        components_mock.invalidate.assert_called_once()
+        versions_mock.assert_called_once()
+        self.assertIn(('profile', 11), versions_mock.call_args.args[0])
+        self.assertIn(('friends', 15), versions_mock.call_args.args[0])
+        self.assertIn('Users: 5, friendships: 10', out.getvalue())
+
+    def test_generate_social_graph_invalid_degree(self):
+        """Test the command rejects a barabasi-albert degree over the number of users"""
+        with self.assertRaises(CommandError):
+            call_command('generate_social_graph', 'barabasi-albert', 5, '--degree', '5')
+
+
+class SeedUsersCommandTest(TestCase):
+    """Test for the seed_users command"""
+
+    def test_seed_users(self):
+        """Test the command provisions the users in batches and then their friendships"""
+        out = StringIO()
+        users = [mock.Mock(pk=pk) for pk in range(1, 6)]
+
+        with mock.patch('accounts.management.commands.seed_users.provision_users',
+                        side_effect=[users[:2], users[2:4], users[4:]]) as provision_mock, \
+             mock.patch('accounts.management.commands.seed_users.make_password', return_value='hash') as hash_mock, \
+             mock.patch('accounts.management.commands.seed_users.Friend.objects.bulk_create') as bulk_mock, \
+             mock.patch('accounts.management.commands.seed_users.friendships_created.send') as send_mock:
+            call_command('seed_users', 5, 2, '--password', 'secret', '--batch-size', '2', stdout=out)
+
+        hash_mock.assert_called_once_with('secret')
+        self.assertEqual(provision_mock.call_count, 3)
+        self.assertEqual(provision_mock.call_args.args[1], 'hash')
+        self.assertEqual(bulk_mock.call_count, 5)
+        self.assertEqual(sum(len(call.kwargs['friendships']) for call in send_mock.call_args_list), 10)
+        self.assertIn('Users: 5, friendships: 10', out.getvalue())
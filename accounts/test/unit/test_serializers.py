@@ -3,8 +3,10 @@ import mock
 from django.test import TestCase
 from rest_framework import serializers
 
-from accounts.models import User, Profile
-from accounts.serializers import UserSerializer, AdminUserSerializer, ProfileSerializer
+from accounts.models import User, Profile, Friend
+from accounts.serializers import UserSerializer, AdminUserSerializer, ProfileSerializer, FriendsProfileSerializer, \
+    FriendsProfilesQuerySerializer, AdminUserValuesSerializer, ProfileValuesSerializer, \
+    FriendsSerializer, FriendsValuesSerializer
 
 
 class UserSerializerTest(TestCase):
@@ -191,3 +193,65 @@ class ProfileSerializerTest(TestCase):
             ProfileSerializer.create(profile_serializer, {})
 
         profile.save.assert_not_called()
+
+
+class FriendsProfileSerializerTest(TestCase):
+    """Test for FriendsProfileSerializer"""
+
+    def test_fields(self):
+        """Test only the selected fields are serialized"""
+        self.assertEqual(list(FriendsProfileSerializer(fields=['user_id', 'city']).fields), ['user_id', 'city'])
+        self.assertEqual(list(FriendsProfileSerializer().fields), ProfileSerializer.Meta.fields)
+
+    def test_query_fields(self):
+        """Test the fields query param is split and checked"""
+        query = FriendsProfilesQuerySerializer(data={'fields': 'user_id, city,'})
+        self.assertTrue(query.is_valid())
+        self.assertEqual(query.validated_data['fields'], ['user_id', 'city'])
+
+        query = FriendsProfilesQuerySerializer(data={'fields': 'user_id,email'})
+        self.assertFalse(query.is_valid())
+        self.assertIn('email', str(query.errors['fields'][0]))
+
+
+class ValuesSerializerTest(TestCase):
+    """Test for the read only values serializers"""
+
+    user = {'id': 1, 'username': 'JD2022', 'first_name': 'Jhon', 'last_name': 'Doe', 'email': 'jhon@example.com',
+            'is_superuser': False, 'is_active': True}
+
+    def test_user_values_serializer(self):
+        """Test the users are serialized from their values like the model serializers"""
+        user = User(**self.user)
+
+        self.assertEqual(AdminUserValuesSerializer([self.user], many=True).data,
+                         AdminUserSerializer([user], many=True).data)
+
+    def test_profile_values_serializer(self):
+        """Test the profiles are serialized from their values and the friends of the context like ProfileSerializer"""
+        user = User(**self.user)
+        user.prefetched_friendships = [Friend(user_id=1, is_friend_of_id=3), Friend(user_id=1, is_friend_of_id=5)]
+        profile = Profile(user=user, phone=None, address='8655 Frances Ct', city='Paris', state='FR', zipcode='65487',
+                          available=True, img=None)
+        row = {'pk': 1, 'user_id': 1, 'user__first_name': 'Jhon', 'user__last_name': 'Doe', 'phone': None,
+               'address': '8655 Frances Ct', 'city': 'Paris', 'state': 'FR', 'zipcode': '65487', 'available': True,
+               'img': None}
+
+        data = ProfileValuesSerializer(row, context={'friends': {1: [3, 5]}}).data
+
+        self.assertEqual(data, ProfileSerializer(profile).data)
+        self.assertEqual(list(data), ProfileSerializer.Meta.fields)
+
+    def test_friends_values_serializer(self):
+        """Test the friendships are serialized from their values like FriendsSerializer"""
+        row = {'pk': 1, 'user_id': 1, 'is_friend_of_id': 3}
+
+        self.assertEqual(FriendsValuesSerializer(row).data,
+                         FriendsSerializer(Friend(user_id=1, is_friend_of_id=3)).data)
+
+    def test_values(self):
+        """Test the lookups of the fields and the primary key are selected"""
+        queryset = mock.Mock()
+        FriendsValuesSerializer.values(queryset)
+
+        queryset.values.assert_called_once_with('pk', 'user_id', 'is_friend_of_id')
@@ -0,0 +1,124 @@
+"""Unit test for accounts signals"""
+from django.test import TestCase
+import mock
+
+from accounts.models import Friend, Profile, User
+from accounts.signals import friendships_created, friendship_saved, friendship_deleted, friendship_changed, \
+    user_changed, profile_changed, user_versions_changed, friendship_versions_changed
+
+
+class FriendSignalsTest(TestCase):
+    """Test for the Friend signals receivers"""
+
+    def test_friendship_saved(self):
+        """Test a created friendship is added to the index on commit, with the generation it was committed in"""
+        instance = mock.Mock(user_id=1, is_friend_of_id=2)
+
+        with mock.patch('accounts.signals.transaction.on_commit', side_effect=lambda func, using: func()), \
+             mock.patch('accounts.signals.bump_graph_generation', return_value=7), \
+             mock.patch('accounts.signals.friend_graph_index') as index_mock, \
+             mock.patch('accounts.signals.component_index') as components_mock:
+            friendship_saved(Friend, instance, created=True, using='default')
+
+        index_mock.add_friendships.assert_called_once_with([(1, 2)], 7)
+        components_mock.add_friendships.assert_called_once_with([(1, 2)])
+
+    def test_friendship_updated(self):
+        """Test the index is invalidated when a friendship is updated"""
+        with mock.patch('accounts.signals.transaction.on_commit', side_effect=lambda func, using: func()), \
+             mock.patch('accounts.signals.bump_graph_generation') as bump_mock, \
+             mock.patch('accounts.signals.friend_graph_index') as index_mock:
+            friendship_saved(Friend, mock.Mock(), created=False, using='default')
+
+        bump_mock.assert_called_once()
+        index_mock.invalidate.assert_called_once()
+        index_mock.add_friendships.assert_not_called()
+
+    def test_friendship_deleted(self):
+        """Test a deleted friendship is removed from the index on commit"""
+        instance = mock.Mock(user_id=1, is_friend_of_id=2)
+
+        with mock.patch('accounts.signals.transaction.on_commit', side_effect=lambda func, using: func()), \
+             mock.patch('accounts.signals.bump_graph_generation', return_value=7), \
+             mock.patch('accounts.signals.friend_graph_index') as index_mock, \
+             mock.patch('accounts.signals.component_index') as components_mock:
+            friendship_deleted(Friend, instance, using='default')
+
+        index_mock.remove_friendships.assert_called_once_with([(1, 2)], 7)
+        components_mock.invalidate.assert_called_once()
+
+    def test_friendships_created(self):
+        """Test friendships created in bulk bump the graph generation and are added to the index"""
+        with mock.patch('accounts.signals.transaction.on_commit', side_effect=lambda func, using: func()), \
+             mock.patch('accounts.signals.bump_graph_generation', side_effect=[6, 7]), \
+             mock.patch('accounts.signals.friend_graph_index') as index_mock, \
+             mock.patch('accounts.signals.friend_ids_cache') as friend_ids_mock:
+            friendships_created.send(sender=Friend, friendships=[(1, 2), (2, 3), (1, 3)], using='default')
+
+        index_mock.note_generation.assert_called_once_with(6)
+        index_mock.add_friendships.assert_called_once_with([(1, 2), (2, 3), (1, 3)], 7)
+        friend_ids_mock.discard.assert_called_once_with({1, 2})
+
+    def test_friendship_changed(self):
+        """Test a saved or deleted friendship drops the friend ids of its user on commit"""
+        with mock.patch('accounts.signals.transaction.on_commit', side_effect=lambda func, using: func()), \
+             mock.patch('accounts.signals.bump_graph_generation', return_value=6), \
+             mock.patch('accounts.signals.friend_graph_index') as index_mock, \
+             mock.patch('accounts.signals.friend_ids_cache') as friend_ids_mock:
+            friendship_changed(Friend, mock.Mock(user_id=1, is_friend_of_id=2), using='default')
+
+        index_mock.note_generation.assert_called_once_with(6)
+        friend_ids_mock.discard.assert_called_once_with([1])
+
+
+class UserSignalsTest(TestCase):
+    """Test for the User signals receivers"""
+
+    def test_user_changed(self):
+        """Test a saved or deleted user is dropped from the authentication cache at once and on commit"""
+        with mock.patch('accounts.signals.transaction.on_commit', side_effect=lambda func, using: func()), \
+             mock.patch('accounts.signals.auth_user_cache') as cache_mock:
+            user_changed(User, mock.Mock(pk=1), using='default')
+
+        self.assertEqual(cache_mock.invalidate.call_args_list, [mock.call(1), mock.call(1)])
+
+
+@mock.patch('accounts.signals.transaction.on_commit', side_effect=lambda func, using: func())
+@mock.patch('accounts.signals.Friend.objects.filter')
+@mock.patch('accounts.signals.bump_resource_versions')
+class ResourceVersionsSignalsTest(TestCase):
+    """Test for the receivers that bump the versions of the profiles and friends lists"""
+
+    def test_profile_changed(self, bump_mock, filter_mock, _):
+        """Test a saved profile bumps its version and the friends lists of its followers at once and on commit"""
+        filter_mock.return_value.values_list.return_value.distinct.return_value = [3, 4]
+
+        profile_changed(Profile, mock.Mock(user_id=1), using='default')
+
+        filter_mock.assert_called_once_with(is_friend_of_id__in=[1])
+        resources = [('profile', 1), ('friends', 3), ('friends', 4)]
+        self.assertEqual(bump_mock.call_args_list, [mock.call(resources), mock.call(resources)])
+
+    def test_user_created(self, bump_mock, filter_mock, _):
+        """Test a created user bumps the versions of its profile and friends list without looking for followers"""
+        user_versions_changed(User, mock.Mock(pk=1), using='default', created=True)
+
+        filter_mock.assert_not_called()
+        bump_mock.assert_called_with([('profile', 1), ('friends', 1)])
+
+    def test_friendship_versions_changed(self, bump_mock, filter_mock, _):
+        """Test a friendship bumps the profile and friends list of its user and the friends lists of its followers"""
+        filter_mock.return_value.values_list.return_value.distinct.return_value = [3]
+
+        friendship_versions_changed(Friend, mock.Mock(user_id=1, is_friend_of_id=2), using='default')
+
+        bump_mock.assert_called_with([('profile', 1), ('friends', 1), ('friends', 3)])
+
+    def test_friendships_created(self, bump_mock, filter_mock, _):
+        """Test friendships created in bulk bump the versions of all their users"""
+        filter_mock.return_value.values_list.return_value.distinct.return_value = []
+
+        with mock.patch('accounts.signals.friend_graph_index'), mock.patch('accounts.signals.bump_graph_generation'):
+            friendships_created.send(sender=Friend, friendships=[(1, 2), (1, 3)], using='default')
+
+        bump_mock.assert_called_with([('profile', 1), ('friends', 1)])
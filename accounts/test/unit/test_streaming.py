@@ -0,0 +1,27 @@
+"""Unit test for accounts streaming"""
+from django.test import TestCase
+
+from accounts.streaming import ndjson_response, csv_response
+
+
+class NdjsonResponseTest(TestCase):
+    """Test for ndjson_response"""
+
+    def test_ndjson_response(self):
+        """Test each row is streamed in its own line"""
+        response = ndjson_response(iter([{'id': 1}, {'id': 2}]))
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(b''.join(response.streaming_content), b'{"id": 1}\n{"id": 2}\n')
+
+
+class CsvResponseTest(TestCase):
+    """Test for csv_response"""
+
+    def test_csv_response(self):
+        """Test the header and each row are streamed in their own line"""
+        response = csv_response(['id', 'name'], iter([(1, 'Jhon'), (2, 'Doe, Jr')]), filename='users.csv')
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="users.csv"')
+        self.assertEqual(b''.join(response.streaming_content), b'id,name\r\n1,Jhon\r\n2,"Doe, Jr"\r\n')
@@ -0,0 +1,75 @@
+"""Unit test for accounts mutual friends and friend suggestions"""
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+import mock
+
+from accounts.graph import FriendGraph
+from accounts.suggestions import FriendSuggestions, intersect_sorted
+
+# Friendships used by the tests: user -> is_friend_of
+EDGES = [(1, 2), (1, 3), (1, 4), (2, 5), (2, 6), (3, 5), (3, 1), (4, 5), (4, 6), (4, 7), (7, 1)]
+
+
+class IntersectSortedTest(TestCase):
+    """Test for intersect_sorted"""
+
+    def test_intersect_sorted(self):
+        """Test the common values of sorted sequences"""
+        self.assertEqual(intersect_sorted([1, 3, 4, 8], [2, 3, 4, 5, 8, 9]), [3, 4, 8])
+        self.assertEqual(intersect_sorted([1, 2], []), [])
+        self.assertEqual(intersect_sorted([1, 2], [3, 4]), [])
+
+
+@mock.patch('accounts.suggestions.get_friend_graph', return_value=FriendGraph.from_edges(EDGES))
+class FriendSuggestionsTest(TestCase):
+    """Test for FriendSuggestions with the friend graph index"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_mutual_friends(self, _):
+        """Test the friends of both users"""
+        self.assertEqual(FriendSuggestions.mutual_friends(2, 4), [5, 6])
+        self.assertEqual(FriendSuggestions.mutual_friends(4, 2), [5, 6])
+        self.assertEqual(FriendSuggestions.mutual_friends(1, 5), [])
+
+    def test_suggestions(self, _):
+        """Test the friends of friends are ranked by mutual friends, excluding the user and its friends"""
+        self.assertEqual(FriendSuggestions.suggestions(1, 10), {
+            'suggestions': [{'id': 5, 'mutual': 3}, {'id': 6, 'mutual': 2}, {'id': 7, 'mutual': 1}],
+            'truncated': False,
+        })
+        self.assertEqual(FriendSuggestions.suggestions(1, 1)['suggestions'], [{'id': 5, 'mutual': 3}])
+        self.assertEqual(FriendSuggestions.suggestions(5, 10), {'suggestions': [], 'truncated': False})
+
+    @override_settings(FRIENDS_SUGGESTIONS_CANDIDATE_BUDGET=4)
+    def test_suggestions_candidate_budget(self, _):
+        """Test the scan of the friendships of the friends stops at the candidate budget"""
+        # Only 2 -> 5, 2 -> 6, 3 -> 1 and 3 -> 5 are scanned
+        self.assertEqual(FriendSuggestions.suggestions(1, 10), {
+            'suggestions': [{'id': 5, 'mutual': 2}, {'id': 6, 'mutual': 1}],
+            'truncated': True,
+        })
+
+    def test_suggestions_cached(self, get_friend_graph_mock):
+        """Test the suggestions are computed once per user for any limit"""
+        FriendSuggestions.suggestions(1, 10)
+        FriendSuggestions.suggestions(1, 2)
+
+        get_friend_graph_mock.assert_called_once()
+
+    def test_suggestions_database(self, _):
+        """Test the suggestions are counted in the database without the friend graph index"""
+        values_list = mock.Mock(return_value=[(5, 3), (6, 2)])
+        queryset = mock.MagicMock()
+        queryset.exclude.return_value.exclude.return_value.values.return_value.annotate.return_value.order_by. \
+            return_value.values_list.return_value.__getitem__ = values_list
+        queryset.order_by.return_value.__getitem__.return_value.exists.return_value = False
+
+        with mock.patch('accounts.suggestions.get_friend_graph', return_value=None), \
+             mock.patch('accounts.suggestions.Friend.objects.filter', return_value=queryset):
+            result = FriendSuggestions.suggestions(1, 1)
+
+        values_list.assert_called_once_with(slice(None, 100))
+        self.assertEqual(result, {'suggestions': [{'id': 5, 'mutual': 3}], 'truncated': False})
@@ -1,80 +1,263 @@
 """Unit test for accounts utils"""
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 import mock
 
-from accounts.utils import FriendsConnections
+from accounts.utils import FriendsConnections, SearchBudgetExceeded
+
+# Friendships used by the tests: user -> is_friend_of
+GRAPH = {
+    1: [2, 3],
+    2: [4],
+    3: [4, 5],
+    4: [6],
+    5: [6],
+    6: [1],
+    7: [1],
+}
+
+
+def fake_adjacency(frontier, reverse=False):
+    """Adjacency of the frontier in GRAPH"""
+    adjacency = {}
+    for user, friends in GRAPH.items():
+        for friend in friends:
+            node, neighbour = (friend, user) if reverse else (user, friend)
+            if node in frontier:
+                adjacency.setdefault(node, []).append(neighbour)
+    return adjacency
 
 
 class FriendsConnectionsTest(TestCase):
     """Test for FriendsConnections"""
 
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_adjacency(self):
+        """Test _adjacency groups the friendships of the frontier"""
+        values_list = mock.Mock(return_value=[(1, 2), (1, 3), (2, 4)])
+
+        with mock.patch('accounts.utils.Friend.objects.filter',
+                        return_value=mock.Mock(values_list=values_list)) as filter_mock:
+            result = FriendsConnections._adjacency([1, 2])
+
+        filter_mock.assert_called_once_with(user_id__in=[1, 2])
+        values_list.assert_called_once_with('user_id', 'is_friend_of_id')
+        self.assertEqual(result, {1: [2, 3], 2: [4]})
+
+    def test_adjacency_reverse(self):
+        """Test _adjacency following the friendships backwards"""
+        values_list = mock.Mock(return_value=[(4, 2), (4, 3)])
+
+        with mock.patch('accounts.utils.Friend.objects.filter',
+                        return_value=mock.Mock(values_list=values_list)) as filter_mock:
+            result = FriendsConnections._adjacency([4], reverse=True)
+
+        filter_mock.assert_called_once_with(is_friend_of_id__in=[4])
+        values_list.assert_called_once_with('is_friend_of_id', 'user_id')
+        self.assertEqual(result, {4: [2, 3]})
+
+    def test_adjacency_in_batches(self):
+        """Test _adjacency splits big frontiers in several queries"""
+        values_list = mock.Mock(return_value=[])
+
+        with mock.patch('accounts.utils.FRONTIER_BATCH_SIZE', 2), \
+             mock.patch('accounts.utils.Friend.objects.filter',
+                        return_value=mock.Mock(values_list=values_list)) as filter_mock:
+            FriendsConnections._adjacency([1, 2, 3, 4, 5])
+
+        self.assertEqual(filter_mock.call_count, 3)
+
     def test_find_connections_are_friends(self):
         """Test _find_connections when the user is friend of the target user"""
-        friends_connections = FriendsConnections()
-        user = mock.Mock(is_friend=mock.Mock(return_value=True))
+        with mock.patch('accounts.utils.FriendsConnections._adjacency', side_effect=fake_adjacency):
+            result = FriendsConnections._find_connections(1, 2)
 
-        with mock.patch('accounts.utils.User.objects.get', return_value=user):
-            result = friends_connections._find_connections(1, 2)
-
-        self.assertEqual(result, [1])
+        self.assertEqual(result, [1, 2])
 
     def test_find_connections_when_are_not_friends_but_are_a_connection(self):
-        """Test _find_connections hen the user isn't friend of the target user but are a connection friend"""
-        friends_connections = FriendsConnections()
-        user = mock.Mock(is_friend=mock.Mock(return_value=False))
-        user_2 = mock.Mock(is_friend=mock.Mock(return_value=True))
-        friends = mock.Mock(__iter__=mock.Mock(return_value=iter([3, 4, 5])), count=mock.Mock(return_value=3))
-        values_list = mock.Mock(values_list=mock.Mock(return_value=friends))
-        exclude_mock_2 = mock.Mock(exclude=mock.Mock(return_value=values_list))
-        exclude_mock = mock.Mock(exclude=mock.Mock(return_value=exclude_mock_2))
+        """Test _find_connections when the user isn't friend of the target user but are a connection friend"""
+        with mock.patch('accounts.utils.FriendsConnections._adjacency', side_effect=fake_adjacency):
+            result = FriendsConnections._find_connections(1, 6)
+
+        self.assertEqual(len(result), 4)
+        self.assertEqual(result[0], 1)
+        self.assertEqual(result[-1], 6)
+        for user, friend in zip(result, result[1:]):
+            self.assertIn(friend, GRAPH[user])
 
-        with mock.patch('accounts.utils.User.objects.get', side_effect=[user, user_2]), \
-             mock.patch('accounts.utils.Friend.objects.filter', return_value=exclude_mock):
-            result = friends_connections._find_connections(1, 2)
+    def test_find_connections_follows_friendship_direction(self):
+        """Test _find_connections only walks the friendships from user to is_friend_of"""
+        with mock.patch('accounts.utils.FriendsConnections._adjacency', side_effect=fake_adjacency):
+            result = FriendsConnections._find_connections(6, 3)
 
-        self.assertEqual(result, [1, 3])
+        self.assertEqual(result, [6, 1, 3])
 
     def test_find_connections_when_are_not_friends_and_are_not_connection(self):
-        """Test _find_connections hen the user isn't friend of the target user and aren't a connection friend"""
-        friends_connections = FriendsConnections()
-        user = mock.Mock(is_friend=mock.Mock(return_value=False))
-        friends = mock.Mock(count=mock.Mock(return_value=0))
-        values_list = mock.Mock(values_list=mock.Mock(return_value=friends))
-        exclude_mock_2 = mock.Mock(exclude=mock.Mock(return_value=values_list))
-        exclude_mock = mock.Mock(exclude=mock.Mock(return_value=exclude_mock_2))
-
-        with mock.patch('accounts.utils.User.objects.get', return_value=user), \
-             mock.patch('accounts.utils.Friend.objects.filter', return_value=exclude_mock):
-            result = friends_connections._find_connections(1, 2)
+        """Test _find_connections when the user isn't friend of the target user and aren't a connection friend"""
+        with mock.patch('accounts.utils.FriendsConnections._adjacency', side_effect=fake_adjacency):
+            result = FriendsConnections._find_connections(1, 7)
+
+        self.assertIsNone(result)
+
+    def test_find_connections_queries_one_level_at_a_time(self):
+        """Test _find_connections fetches each level with a single adjacency call"""
+        with mock.patch('accounts.utils.FriendsConnections._adjacency',
+                        side_effect=fake_adjacency) as adjacency_mock:
+            FriendsConnections._find_connections(1, 6)
+
+        self.assertEqual(adjacency_mock.call_count, 3)
+
+    def test_degrees_of_separation(self):
+        """Test degrees_of_separation"""
+        with mock.patch('accounts.utils.FriendsConnections._adjacency', side_effect=fake_adjacency):
+            self.assertEqual(FriendsConnections.degrees_of_separation(1, 6, max_depth=3), 3)
+            self.assertEqual(FriendsConnections.degrees_of_separation(1, 2, max_depth=3), 1)
+            self.assertEqual(FriendsConnections.degrees_of_separation(1, 1, max_depth=3), 0)
+
+    def test_degrees_of_separation_over_max_depth(self):
+        """Test degrees_of_separation stops at max_depth"""
+        with mock.patch('accounts.utils.FriendsConnections._adjacency',
+                        side_effect=fake_adjacency) as adjacency_mock:
+            result = FriendsConnections.degrees_of_separation(1, 6, max_depth=2)
 
         self.assertIsNone(result)
+        self.assertEqual(adjacency_mock.call_count, 2)
+
+    def test_degrees_of_separation_time_budget_exceeded(self):
+        """Test degrees_of_separation when the time budget runs out"""
+        with mock.patch('accounts.utils.FriendsConnections._adjacency', side_effect=fake_adjacency), \
+             mock.patch('accounts.utils.time.monotonic', side_effect=[0, 5]), \
+             self.assertRaises(SearchBudgetExceeded):
+            FriendsConnections.degrees_of_separation(1, 6, max_depth=6, time_budget=1)
+
+    def test_search_disconnected_components(self):
+        """Test the users in different components are answered without searching"""
+        components = mock.Mock(are_disconnected=mock.Mock(return_value=True))
+
+        with mock.patch('accounts.utils.get_component_index', return_value=components), \
+             mock.patch('accounts.utils.FriendsConnections._adjacency') as adjacency_mock:
+            result = FriendsConnections._find_connections(1, 7)
+
+        self.assertIsNone(result)
+        components.are_disconnected.assert_called_once_with(1, 7)
+        adjacency_mock.assert_not_called()
+
+    def test_shorter_connection_disconnected_components_not_cached(self):
+        """Test the connections answered by the components index are not cached, it can miss recent friendships"""
+        cache.clear()
+        components = mock.Mock(are_disconnected=mock.Mock(return_value=True))
+
+        with mock.patch('accounts.utils.get_component_index', return_value=components):
+            self.assertEqual(FriendsConnections.shorter_connection(1, 7), [])
+            self.assertEqual(FriendsConnections.shorter_connection(1, 7), [])
+
+        self.assertEqual(components.are_disconnected.call_count, 2)
+
+    def test_degrees_of_separation_without_connection(self):
+        """Test degrees_of_separation when there is no connection"""
+        with mock.patch('accounts.utils.FriendsConnections._adjacency', side_effect=fake_adjacency):
+            self.assertIsNone(FriendsConnections.degrees_of_separation(1, 7, max_depth=6))
+
+    def test_degrees_of_separation_budget_exceeded(self):
+        """Test degrees_of_separation when the node budget runs out"""
+        with mock.patch('accounts.utils.FriendsConnections._adjacency', side_effect=fake_adjacency), \
+             self.assertRaises(SearchBudgetExceeded):
+            FriendsConnections.degrees_of_separation(1, 6, max_depth=6, node_budget=2)
+
+    def test_neighborhood(self):
+        """Test neighborhood"""
+        with mock.patch('accounts.utils.FriendsConnections._adjacency', side_effect=fake_adjacency):
+            self.assertEqual(FriendsConnections.neighborhood(1, max_depth=2), ({2: 1, 3: 1, 4: 2, 5: 2}, False))
+            self.assertEqual(FriendsConnections.neighborhood(7, max_depth=6),
+                             ({1: 1, 2: 2, 3: 2, 4: 3, 5: 3, 6: 4}, False))
+
+    def test_neighborhood_budget_exceeded(self):
+        """Test neighborhood stops when the node budget runs out"""
+        with mock.patch('accounts.utils.FriendsConnections._adjacency', side_effect=fake_adjacency):
+            result = FriendsConnections.neighborhood(1, max_depth=2, node_budget=3)
+
+        self.assertEqual(result, ({2: 1, 3: 1, 4: 2}, True))
+
+    def test_shorter_connections(self):
+        """Test shorter_connections answers several targets with one search"""
+        with mock.patch('accounts.utils.FriendsConnections._adjacency',
+                        side_effect=fake_adjacency) as adjacency_mock:
+            result = FriendsConnections.shorter_connections(1, [2, 5, 6, 7, 1])
+
+        self.assertEqual(result[2], [])
+        self.assertEqual(result[5], [3])
+        self.assertIn(result[6], [[2, 4], [3, 4], [3, 5]])
+        self.assertEqual(result[7], [])
+        self.assertEqual(result[1], [])
+        self.assertEqual(adjacency_mock.call_count, 4)
+
+    @override_settings(FRIENDS_CONNECTIONS_BATCH_PAIR_TARGETS=0)
+    def test_shorter_connections_stops_when_all_found(self):
+        """Test shorter_connections stops as soon as every target is reached"""
+        with mock.patch('accounts.utils.FriendsConnections._adjacency',
+                        side_effect=fake_adjacency) as adjacency_mock:
+            result = FriendsConnections.shorter_connections(1, [2, 3])
+
+        self.assertEqual(result, {2: [], 3: []})
+        adjacency_mock.assert_called_once()
+
+    def test_shorter_connections_few_targets(self):
+        """Test shorter_connections searches a few targets pair by pair, reporting the budget exceeded per pair"""
+        with mock.patch('accounts.utils.FriendsConnections.shorter_connection',
+                        side_effect=[[3], SearchBudgetExceeded()]) as shorter_connection_mock:
+            result = FriendsConnections.shorter_connections(1, [5, 6, 1], node_budget=10)
+
+        self.assertEqual(result, {5: [3], 6: None, 1: []})
+        self.assertEqual(shorter_connection_mock.call_count, 2)
+        self.assertEqual(shorter_connection_mock.call_args[0][:3], (1, 6, 10))
+
+    def test_shorter_connections_budget_exceeded(self):
+        """Test shorter_connections reports the targets not reached when the node budget runs out"""
+        with mock.patch('accounts.utils.FriendsConnections._adjacency', side_effect=fake_adjacency):
+            result = FriendsConnections.shorter_connections(1, [2, 6, 7], node_budget=2)
+
+        self.assertEqual(result, {2: [], 6: None, 7: None})
+
+    @override_settings(FRIENDS_CONNECTIONS_BATCH_PAIR_TARGETS=0)
+    def test_shorter_connections_disconnected_components(self):
+        """Test shorter_connections does not search the targets in other components"""
+        components = mock.Mock(are_disconnected=mock.Mock(side_effect=lambda user_id, other_user_id: other_user_id > 5))
+
+        with mock.patch('accounts.utils.get_component_index', return_value=components), \
+             mock.patch('accounts.utils.FriendsConnections._adjacency', side_effect=fake_adjacency) as adjacency_mock:
+            result = FriendsConnections.shorter_connections(1, [2, 5, 6, 7])
+
+        self.assertEqual(result, {2: [], 5: [3], 6: [], 7: []})
+        self.assertEqual(adjacency_mock.call_count, 2)
 
     def test_shorter_connection(self):
         """Test shorter_connection"""
-        user = mock.Mock(user=mock.Mock(id=1))
-        user_2 = mock.Mock(user=mock.Mock(id=3))
-        user_3 = mock.Mock(user=mock.Mock(id=5))
-        first_mock = mock.Mock(first=mock.Mock(side_effect=[user_3, user_2, user]))
-        filter_mock = mock.Mock(filter=mock.Mock(return_value=first_mock))
-
-        with mock.patch('accounts.utils.FriendsConnections._find_connections', return_value=[1, 3, 4, 5, ]), \
-             mock.patch('accounts.utils.Friend.objects.filter', return_value=filter_mock):
+        with mock.patch('accounts.utils.FriendsConnections._find_connections', return_value=[1, 3, 5, 2]):
             result = FriendsConnections.shorter_connection(1, 2)
 
         self.assertEqual(result, [3, 5])
 
     def test_shorter_connection_when_user_is_friend(self):
         """Test shorter_connection when user is friend of the target user"""
-        user = mock.Mock(id=1)
-        first_mock = mock.Mock(first=mock.Mock(return_value=mock.Mock(user=user)))
-        filter_mock = mock.Mock(filter=mock.Mock(return_value=first_mock))
-
-        with mock.patch('accounts.utils.FriendsConnections._find_connections', return_value=[1, ]), \
-             mock.patch('accounts.utils.Friend.objects.filter', return_value=filter_mock):
+        with mock.patch('accounts.utils.FriendsConnections._find_connections', return_value=[1, 2]):
             result = FriendsConnections.shorter_connection(1, 2)
 
         self.assertEqual(result, [])
 
+    def test_shorter_connection_is_cached(self):
+        """Test shorter_connection searches once per pair until the friend graph changes"""
+        with mock.patch('accounts.utils.FriendsConnections._find_connections',
+                        return_value=[1, 3, 2]) as find_mock:
+            FriendsConnections.shorter_connection(1, 2)
+            result = FriendsConnections.shorter_connection(1, 2)
+            FriendsConnections.shorter_connection(2, 1)
+
+        self.assertEqual(result, [3])
+        self.assertEqual(find_mock.call_count, 2)
+
     def test_shorter_connection_when_not_connections(self):
         """Test shorter_connection when user don't have connection with the target user"""
 
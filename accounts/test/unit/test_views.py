@@ -1,9 +1,11 @@
 """Test for accounts views"""
+from django.db import IntegrityError
 from django.http import Http404
-from django.test import TestCase
+from django.test import TestCase, override_settings
 import mock
 
-from accounts.views import ShorterConnectionFriends, DeleteFriendshipAPIView
+from accounts.views import ShorterConnectionFriends, DeleteFriendshipAPIView, BatchShorterConnectionFriends, \
+    BulkCreateFriendApiView, AdminBulkCreateUserApiView
 
 
 class ShorterConnectionFriendsTest(TestCase):
@@ -39,6 +41,180 @@ class ShorterConnectionFriendsTest(TestCase):
         self.assertEqual(shorter_connection, response)
 
 
+class BatchShorterConnectionFriendsTest(TestCase):
+    """Test for BatchShorterConnectionFriends"""
+
+    @override_settings(FRIENDS_CONNECTIONS_NODE_BUDGET=10, FRIENDS_CONNECTIONS_TIME_BUDGET=1)
+    def test_connections(self):
+        """Test _connections runs the searches of each uid at once, within the budgets"""
+        pairs = [(1, 2), (3, 4), (1, 5)]
+        connections = [{2: [7], 5: None}, {4: [8, 9]}]
+
+        with mock.patch('accounts.views.FriendsConnections.shorter_connections',
+                        side_effect=connections) as connections_mock:
+            result = list(BatchShorterConnectionFriends._connections(pairs, {1, 2, 3, 4, 5}))
+
+        self.assertEqual(connections_mock.call_count, 2)
+        connections_mock.assert_any_call(user_id=1, other_user_ids=[2, 5], node_budget=10, time_budget=1)
+        self.assertEqual(result, [
+            {'uid': 1, 'ouid': 2, 'connection': [7]},
+            {'uid': 1, 'ouid': 5, 'detail': 'The search of the connection exceeded its budget.'},
+            {'uid': 3, 'ouid': 4, 'connection': [8, 9]},
+        ])
+
+    def test_connections_with_missing_users(self):
+        """Test _connections with users that don't exist"""
+        pairs = [(1, 2), (3, 4)]
+
+        with mock.patch('accounts.views.FriendsConnections.shorter_connections',
+                        return_value={}) as connections_mock:
+            result = list(BatchShorterConnectionFriends._connections(pairs, {1, 4}))
+
+        connections_mock.assert_called_once()
+        self.assertEqual(connections_mock.call_args.kwargs['other_user_ids'], [])
+        self.assertEqual(result, [
+            {'uid': 1, 'ouid': 2, 'detail': 'Not found.'},
+            {'uid': 3, 'ouid': 4, 'detail': 'Not found.'},
+        ])
+
+
+class BulkCreateFriendApiViewTest(TestCase):
+    """Test for BulkCreateFriendApiView"""
+
+    def test_check_friendships(self):
+        """Test _check_friendships sets the status of every pending item"""
+        results = [
+            {'user': 1, 'is_friend_of': 2, 'status': None},
+            {'user': 1, 'is_friend_of': 3, 'status': None},
+            {'user': 1, 'is_friend_of': 2, 'status': None},
+            {'user': 2, 'is_friend_of': 9, 'status': None},
+            {'user': 2, 'is_friend_of': 3, 'status': None},
+            {'user': 'a', 'is_friend_of': 3, 'status': 'invalid'},
+        ]
+        users = mock.Mock(values_list=mock.Mock(return_value=[1, 2, 3]))
+        friendships = mock.Mock(values_list=mock.Mock(return_value=[(2, 3)]))
+
+        with mock.patch('accounts.views.User.objects.filter', return_value=users) as users_mock, \
+             mock.patch('accounts.views.Friend.objects.filter', return_value=friendships):
+            result = BulkCreateFriendApiView._check_friendships(results)
+
+        users_mock.assert_called_once_with(pk__in={1, 2, 3, 9})
+        self.assertEqual(result, [(1, 2), (1, 3)])
+        self.assertEqual([item['status'] for item in results],
+                         ['created', 'created', 'duplicated', 'invalid', 'duplicated', 'invalid'])
+        self.assertEqual(results[3]['errors'], {'is_friend_of': ['Invalid pk "9" - object does not exist.']})
+
+    def test_create_retries_after_concurrent_duplicate(self):
+        """Test _create checks the items again when a friendship is created meanwhile by another request"""
+        results = [{'user': 1, 'is_friend_of': 2, 'status': None}, {'user': 1, 'is_friend_of': 3, 'status': None}]
+
+        def check_friendships(items):
+            """First both friendships are new, then the (1, 2) friendship exists"""
+            if check_mock.call_count == 1:
+                items[0]['status'] = items[1]['status'] = 'created'
+                return [(1, 2), (1, 3)]
+            self.assertEqual([item['status'] for item in items], [None, None])
+            items[0]['status'], items[1]['status'] = 'duplicated', 'created'
+            return [(1, 3)]
+
+        with mock.patch.object(BulkCreateFriendApiView, '_check_friendships',
+                               side_effect=check_friendships) as check_mock, \
+             mock.patch('accounts.views.Friend.objects.bulk_create', side_effect=[IntegrityError(), []]), \
+             mock.patch('accounts.views.friendships_created.send') as send_mock:
+            created = BulkCreateFriendApiView._create(results)
+
+        self.assertEqual(created, [(1, 3)])
+        self.assertEqual([item['status'] for item in results], ['duplicated', 'created'])
+        send_mock.assert_called_once_with(sender=mock.ANY, friendships=[(1, 3)], using=mock.ANY)
+
+    def test_create_gives_up(self):
+        """Test _create marks the remaining items as invalid when the insert fails twice"""
+        results = [{'user': 1, 'is_friend_of': 2, 'status': None}, {'user': 1, 'is_friend_of': 3, 'status': 'invalid'}]
+
+        def check_friendships(items):
+            """The first friendship is always new"""
+            items[0]['status'] = 'created'
+            return [(1, 2)]
+
+        with mock.patch.object(BulkCreateFriendApiView, '_check_friendships', side_effect=check_friendships), \
+             mock.patch('accounts.views.Friend.objects.bulk_create', side_effect=IntegrityError()), \
+             mock.patch('accounts.views.friendships_created.send') as send_mock:
+            self.assertEqual(BulkCreateFriendApiView._create(results), [])
+
+        self.assertEqual(results[0]['status'], 'invalid')
+        self.assertIn('non_field_errors', results[0]['errors'])
+        send_mock.assert_not_called()
+
+
+class AdminBulkCreateUserApiViewTest(TestCase):
+    """Test for AdminBulkCreateUserApiView"""
+
+    def test_check_unique(self):
+        """Test _check_unique marks the taken usernames and phones as invalid"""
+        results = [
+            ({'username': 'ana', 'status': None}, {'username': 'ana', 'profile': {'phone': '+5351111111'}}),
+            ({'username': 'leo', 'status': None}, {'username': 'leo'}),
+            ({'username': 'ana', 'status': None}, {'username': 'ana'}),
+            ({'username': 'juan', 'status': None}, {'username': 'juan', 'profile': {'phone': '+5352222222'}}),
+            ({'username': 'luis', 'status': None}, {'username': 'luis', 'profile': {'phone': '+5351111111'}}),
+            ({'username': None, 'status': 'invalid'}, None),
+            ({'username': 'leo2', 'status': None}, {'username': 'leo2', 'profile': {'phone': ''}}),
+            ({'username': 'leo3', 'status': None}, {'username': 'leo3', 'profile': {'phone': ''}}),
+            ({'username': 'leo4', 'status': None}, {'username': 'leo4', 'profile': {'phone': None}}),
+        ]
+        users = mock.Mock(values_list=mock.Mock(return_value=['leo']))
+        profiles = mock.Mock(values_list=mock.Mock(return_value=['+5352222222']))
+
+        with mock.patch('accounts.views.User.objects.filter', return_value=users) as users_mock, \
+             mock.patch('accounts.views.Profile.objects.filter', return_value=profiles) as profiles_mock:
+            AdminBulkCreateUserApiView._check_unique(results)
+
+        users_mock.assert_called_once_with(username__in={'ana', 'leo', 'juan', 'luis', 'leo2', 'leo3', 'leo4'})
+        profiles_mock.assert_called_once_with(phone__in={'+5351111111', '+5352222222', ''})
+        self.assertEqual([result['status'] for result, _ in results],
+                         [None, 'invalid', 'invalid', 'invalid', 'invalid', 'invalid', None, 'invalid', None])
+        self.assertEqual(list(results[1][0]['errors']), ['username'])
+        self.assertEqual(list(results[3][0]['errors']), ['profile'])
+        self.assertEqual(list(results[4][0]['errors']), ['profile'])
+        self.assertEqual(list(results[7][0]['errors']), ['profile'])
+
+    def test_provision_concurrent_duplicate(self):
+        """Test _provision checks the items again when a concurrent request took a username after the check"""
+        results = [
+            ({'username': 'ana', 'status': None}, {'username': 'ana'}),
+            ({'username': 'leo', 'status': None}, {'username': 'leo'}),
+        ]
+        user = mock.Mock(pk=7)
+
+        def check_unique(checked):
+            """The second check sees the username taken meanwhile"""
+            if check_mock.call_count == 2:
+                checked[0][0].update(status='invalid', errors={'username': ['taken']})
+
+        with mock.patch.object(AdminBulkCreateUserApiView, '_check_unique',
+                               side_effect=check_unique) as check_mock, \
+             mock.patch('accounts.views.provision_users', side_effect=[IntegrityError(), [user]]) as provision_mock:
+            users = AdminBulkCreateUserApiView._provision(results)
+
+        self.assertEqual(users, [user])
+        self.assertEqual(provision_mock.call_args.args[0], [{'username': 'leo'}])
+        self.assertEqual([result['status'] for result, _ in results], ['invalid', 'created'])
+        self.assertEqual(results[1][0]['id'], 7)
+
+    def test_provision_concurrent_duplicate_again(self):
+        """Test _provision marks the items invalid when the retry fails too"""
+        results = [({'username': 'ana', 'status': None}, {'username': 'ana'})]
+
+        with mock.patch.object(AdminBulkCreateUserApiView, '_check_unique'), \
+             mock.patch('accounts.views.provision_users', side_effect=IntegrityError()) as provision_mock:
+            users = AdminBulkCreateUserApiView._provision(results)
+
+        self.assertEqual(users, [])
+        self.assertEqual(provision_mock.call_count, 2)
+        self.assertEqual(results[0][0]['status'], 'invalid')
+        self.assertEqual(list(results[0][0]['errors']), ['non_field_errors'])
+
+
 class DeleteFriendshipAPIViewTest(TestCase):
     """Test DeleteFriendshipAPIView"""
 
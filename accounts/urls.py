@@ -8,17 +8,31 @@ urlpatterns = [
     path('user/<int:pk>/', views.RetrieveUpdateDeleteUserApiView.as_view(), name='account_retrieve_update_delete'),
 
     path('manager/', views.AdminListCreateUserApiView.as_view(), name='account_manager_list_create'),
+    path('manager/bulk/', views.AdminBulkCreateUserApiView.as_view(), name='account_manager_bulk_create'),
     path('manager/<int:pk>/', views.AdminRetrieveUpdateDeleteUserApiView.as_view(),
          name='account_manager_retrieve_update_delete'),
+    path('manager/export/profiles/', views.AdminExportProfilesApiView.as_view(), name='manager_export_profiles'),
+    path('manager/export/friends/', views.AdminExportFriendsApiView.as_view(), name='manager_export_friends'),
+    path('manager/stats/cache/', views.AdminCacheStatsApiView.as_view(), name='manager_cache_stats'),
+    path('manager/stats/queries/', views.AdminQueryStatsApiView.as_view(), name='manager_query_stats'),
+    path('manager/friend-graph/', views.AdminFriendGraphApiView.as_view(), name='manager_friend_graph'),
 
     path('profile/', views.ListCreateProfileApiView.as_view(), name='profile_list_create'),
     path('profile/<int:user_id>/', views.RetrieveUpdateDeleteProfileAPIView.as_view(),
          name='profile_retrieve_update_delete'),
 
     path('friends/', views.ListCreateFriendApiView.as_view(), name='friend_list_create'),
+    path('friends/bulk/', views.BulkCreateFriendApiView.as_view(), name='friend_bulk_create'),
     path('friends/<int:user_id>/', views.RetrieveFriendsApiView.as_view(), name='friends_profiles'),
     path('friends/delete/<int:user_id>/<int:friend_id>/', views.DeleteFriendshipAPIView.as_view(),
          name='friendship_delete'),
     path('shorter_connection/<int:uid>/<int:ouid>/', views.ShorterConnectionFriends.as_view(),
          name='shorter_connection_friends'),
+    path('shorter_connection/batch/', views.BatchShorterConnectionFriends.as_view(),
+         name='shorter_connection_friends_batch'),
+    path('degrees/<int:uid>/<int:ouid>/', views.DegreesOfSeparation.as_view(), name='degrees_of_separation'),
+    path('neighborhood/<int:uid>/', views.FriendsNeighborhood.as_view(), name='friends_neighborhood'),
+    path('friends/mutual/<int:uid>/<int:ouid>/', views.MutualFriends.as_view(), name='mutual_friends'),
+    path('friends/suggestions/<int:uid>/', views.FriendSuggestionsApiView.as_view(), name='friend_suggestions'),
+    path('distance/<int:uid>/<int:ouid>/', views.DistanceBounds.as_view(), name='distance_bounds'),
 ]
@@ -1,64 +1,305 @@
 """Accounts utils"""
-from accounts.models import User, Friend
+import time
+
+from django.conf import settings
+from accounts.cache import computed_from, shorter_connection_cache
+from accounts.components import get_component_index
+from accounts.graph import get_friend_graph
+from accounts.metrics import bfs_nodes_visited, bfs_frontier_size, bfs_path_length
+from accounts.models import Friend
+
+# Maximum number of ids sent in a single `IN (...)` clause when a frontier is expanded
+FRONTIER_BATCH_SIZE = 500
+
+
+class SearchBudgetExceeded(Exception):
+    """The search visited more users or took more time than its budget allows"""
 
 
 class FriendsConnections:
     """Class for friends connections operations"""
 
+    @staticmethod
+    def _adjacency(frontier, reverse=False):
+        """
+        Fetch the friendships of a whole frontier from the friend graph index when it is enabled, otherwise with a
+        single query per batch of ids
+        :param frontier: Ids of the users to expand
+        :param reverse: Follow the friendships backwards (from is_friend_of to user)
+        :return: A dict with the neighbours ids of every user of the frontier that has friendships
+        """
+        bfs_frontier_size.observe(len(frontier))
+
+        graph = get_friend_graph()
+        if graph is not None:
+            adjacency = graph.backward if reverse else graph.forward
+            return {node: adjacency.neighbours_of(node) for node in frontier}
+
+        source, target = ('is_friend_of_id', 'user_id') if reverse else ('user_id', 'is_friend_of_id')
+        adjacency = {}
+
+        for start in range(0, len(frontier), FRONTIER_BATCH_SIZE):
+            batch = frontier[start:start + FRONTIER_BATCH_SIZE]
+            edges = Friend.objects.filter(**{f'{source}__in': batch}).values_list(source, target)
+            for node, neighbour in edges:
+                adjacency.setdefault(node, []).append(neighbour)
+
+        return adjacency
+
+    @classmethod
+    def _expand(cls, frontier, parents, other_parents, reverse=False):
+        """
+        Expand one level of one side of the bidirectional search
+        :param frontier: Ids of the users of the current level
+        :param parents: Parent pointers of the side that is expanded, it is updated in place
+        :param other_parents: Parent pointers of the opposite side
+        :param reverse: The side that is expanded is the backward one
+        :return: A tuple with the next level and the id of the user where both sides met, or None
+        """
+        next_frontier = []
+        adjacency = cls._adjacency(frontier, reverse)
+
+        for node in frontier:
+            for neighbour in adjacency.get(node, ()):
+                if neighbour in parents:
+                    continue
+
+                parents[neighbour] = node
+                if neighbour in other_parents:
+                    return next_frontier, neighbour
+
+                next_frontier.append(neighbour)
+
+        return next_frontier, None
+
+    @staticmethod
+    def _build_path(meeting_id, forward_parents, backward_parents):
+        """Join both halves of the search through the user where they met"""
+        path = []
+
+        node = meeting_id
+        while node is not None:
+            path.append(node)
+            node = forward_parents[node]
+        path.reverse()
+
+        node = backward_parents[meeting_id]
+        while node is not None:
+            path.append(node)
+            node = backward_parents[node]
+
+        return path
+
     @classmethod
-    def _find_connections(cls, user_id, other_user_id):
+    def _search(cls, user_id, other_user_id, max_depth=None, node_budget=None, time_budget=None):
         """
-        Function for find possible connections between user and other_user
+        Bidirectional BFS between user and other_user. A forward search from user and a backward search from
+        other_user are expanded a whole level at a time, always the smaller frontier first, until they meet.
         :param user_id: Starting user id
         :param other_user_id: Final destination user id
-        :return: A list or None is returned if there is no connection between users
+        :param max_depth: Maximum length of the connection, None for no limit
+        :param node_budget: Maximum number of users visited, None for no limit
+        :param time_budget: Maximum seconds searching, checked after each level, None for no limit
+        :return: A tuple (meeting_id, distance, forward_parents, backward_parents), meeting_id and distance are None
+            if there is no connection between users (within max_depth)
+        :raise SearchBudgetExceeded: If the node or time budget runs out before the search ends
         """
-        users_visited = []  # List of ids of users who have already been visited
-        connections_to_explore = [user_id, ]  # List of ids of the users that are missing to visit
+        # Parent pointers of every user reached by each side of the search
+        forward_parents = {user_id: None}
+        backward_parents = {other_user_id: None}
+
+        if user_id == other_user_id:
+            return user_id, 0, forward_parents, backward_parents
+
+        components = get_component_index()
+        if components is not None and components.are_disconnected(user_id, other_user_id):
+            # The components of the process miss the friendships created by other processes until it is rebuilt, so
+            # the answer is not cached
+            computed_from(None)
+            return None, None, forward_parents, backward_parents
+
+        deadline = time.monotonic() + time_budget if time_budget is not None else None
 
-        while connections_to_explore:
+        forward_frontier = [user_id]
+        backward_frontier = [other_user_id]
+        distance = 0
 
-            visiting_user_id = connections_to_explore.pop(0)  # The first user in the list is extracted to go visit him
-            users_visited.append(visiting_user_id)  # This user is passed to the visited list
+        # Each level is fully checked against the other side as soon as it is reached, so the first meeting is
+        # always part of a shortest connection and the number of levels expanded is its length.
+        while forward_frontier and backward_frontier and (max_depth is None or distance < max_depth):
+            distance += 1
+            if len(forward_frontier) <= len(backward_frontier):
+                forward_frontier, meeting_id = cls._expand(forward_frontier, forward_parents, backward_parents)
+            else:
+                backward_frontier, meeting_id = cls._expand(backward_frontier, backward_parents, forward_parents,
+                                                            reverse=True)
 
-            # The user to be visited is searched and it is asked if he is a direct friend of the final destination user
-            user = User.objects.get(pk=visiting_user_id)
-            if user.is_friend(other_user_id):
-                return users_visited
+            if meeting_id is not None:
+                bfs_nodes_visited.observe(len(forward_parents) + len(backward_parents), search='bidirectional')
+                bfs_path_length.observe(distance, search='bidirectional')
+                return meeting_id, distance, forward_parents, backward_parents
+
+            if (node_budget is not None and len(forward_parents) + len(backward_parents) > node_budget) or \
+                    (deadline is not None and time.monotonic() > deadline):
+                bfs_nodes_visited.observe(len(forward_parents) + len(backward_parents), search='bidirectional')
+                raise SearchBudgetExceeded()
+
+        bfs_nodes_visited.observe(len(forward_parents) + len(backward_parents), search='bidirectional')
+        return None, None, forward_parents, backward_parents
+
+    @classmethod
+    def _find_connections(cls, user_id, other_user_id, node_budget=None, time_budget=None):
+        """
+        Function for find the shorter connection between user and other_user
+        :param user_id: Starting user id
+        :param other_user_id: Final destination user id
+        :param node_budget: Maximum number of users visited, None for no limit
+        :param time_budget: Maximum seconds searching, None for no limit
+        :return: The list of ids from user_id to other_user_id or None if there is no connection between users
+        :raise SearchBudgetExceeded: If the node or time budget runs out before the search ends
+        """
+        meeting_id, _, forward_parents, backward_parents = cls._search(user_id, other_user_id,
+                                                                       node_budget=node_budget,
+                                                                       time_budget=time_budget)
 
-            # If the user is not a direct friend of the final destination user, all his friends who are not in
-            # the list of visited users or connections to visit are searched for, if he has friends that meet these
-            # conditions they are added to the end of the list of connections to explore.
-            friends = Friend.objects.filter(user_id=visiting_user_id).exclude(is_friend_of__in=users_visited). \
-                exclude(is_friend_of__in=connections_to_explore).values_list('is_friend_of', flat=True)
-            if friends.count() > 0:
-                connections_to_explore.extend(friends)
+        if meeting_id is None:
+            return None
 
-        return None
+        return cls._build_path(meeting_id, forward_parents, backward_parents)
 
     @classmethod
-    def shorter_connection(cls, user_id, other_user_id):
-        """Function for find the shorter connection between user and other_user"""
-        shorter_connection = []
-        target_id = other_user_id
-
-        # They find the possible connection between the two users
-        connections = cls._find_connections(user_id, other_user_id)
-
-        if not connections:
-            return shorter_connection
-
-        # This is where the shortest connection is sought. This is built from the end user. The friend of the target
-        # user found in the previously found connections is searched. Then this user is added to the shortest
-        # connection and removed from the connections found. This is done until reaching the initial user.
-        while target_id != user_id:
-            target_id = Friend.objects.filter(is_friend_of=target_id).filter(user__in=connections).first().user.id
-            shorter_connection.append(target_id)
-            connections.remove(target_id)
-
-        # The initial user of the shortest connection is removed. Since the path was built from the destination user
-        # to the source user, the list is flipped.
-        shorter_connection.remove(user_id)
-        shorter_connection.reverse()
-
-        return shorter_connection
+    def degrees_of_separation(cls, user_id, other_user_id, max_depth, node_budget=None, time_budget=None):
+        """
+        Length of the shorter connection between user and other_user, without building it
+        :param user_id: Starting user id
+        :param other_user_id: Final destination user id
+        :param max_depth: Maximum length searched
+        :param node_budget: Maximum number of users visited, None for no limit
+        :param time_budget: Maximum seconds searching, None for no limit
+        :return: The number of friendships between both users or None if it is greater than max_depth
+        :raise SearchBudgetExceeded: If the node or time budget runs out before the search ends
+        """
+        return cls._search(user_id, other_user_id, max_depth, node_budget, time_budget)[1]
+
+    @classmethod
+    def neighborhood(cls, user_id, max_depth, node_budget=None):
+        """
+        Users reachable from user in at most max_depth friendships, expanded a whole level at a time
+        :param user_id: Starting user id
+        :param max_depth: Maximum distance from user
+        :param node_budget: Maximum number of users returned, None for no limit
+        :return: A tuple with a dict of the distance to each reachable user and if the budget stopped the search
+        """
+        distances = {user_id: 0}
+        frontier = [user_id]
+
+        for distance in range(1, max_depth + 1):
+            next_frontier = []
+            adjacency = cls._adjacency(frontier)
+
+            for node in frontier:
+                for neighbour in adjacency.get(node, ()):
+                    if neighbour in distances:
+                        continue
+
+                    if node_budget is not None and len(distances) > node_budget:
+                        del distances[user_id]
+                        bfs_nodes_visited.observe(len(distances), search='neighborhood')
+                        return distances, True
+
+                    distances[neighbour] = distance
+                    next_frontier.append(neighbour)
+
+            if not next_frontier:
+                break
+            frontier = next_frontier
+
+        del distances[user_id]
+        bfs_nodes_visited.observe(len(distances), search='neighborhood')
+        return distances, False
+
+    @classmethod
+    def shorter_connections(cls, user_id, other_user_ids, node_budget=None, time_budget=None):
+        """
+        Function for find the shorter connection between user and several other users. The other users that the
+        component index knows are not connected are skipped. Up to FRIENDS_CONNECTIONS_BATCH_PAIR_TARGETS other users
+        are searched one by one with shorter_connection, otherwise a single BFS tree rooted in user is grown a whole
+        level at a time until every other user is reached, there is nothing left to visit or the budget runs out.
+        :param user_id: Starting user id
+        :param other_user_ids: Final destination users ids
+        :param node_budget: Maximum number of users visited, None for no limit
+        :param time_budget: Maximum seconds searching, checked after each level, None for no limit
+        :return: A dict with the shorter connection to each other user, empty if there is no connection, None if the
+            budget ran out before reaching it
+        """
+        deadline = time.monotonic() + time_budget if time_budget is not None else None
+        connections = {other_user_id: [] for other_user_id in other_user_ids}
+        targets = [other_user_id for other_user_id in connections if other_user_id != user_id]
+
+        components = get_component_index()
+        if components is not None:
+            targets = [other_user_id for other_user_id in targets
+                       if not components.are_disconnected(user_id, other_user_id)]
+
+        if len(targets) <= settings.FRIENDS_CONNECTIONS_BATCH_PAIR_TARGETS:
+            for other_user_id in targets:
+                try:
+                    connections[other_user_id] = cls.shorter_connection(
+                        user_id, other_user_id, node_budget,
+                        max(deadline - time.monotonic(), 0) if deadline is not None else None)
+                except SearchBudgetExceeded:
+                    connections[other_user_id] = None
+            return connections
+
+        pending = set(targets)
+        parents = {user_id: None}
+        frontier = [user_id]
+        exceeded = False
+
+        while frontier and pending:
+            next_frontier = []
+            adjacency = cls._adjacency(frontier)
+
+            for node in frontier:
+                for neighbour in adjacency.get(node, ()):
+                    if neighbour not in parents:
+                        parents[neighbour] = node
+                        pending.discard(neighbour)
+                        next_frontier.append(neighbour)
+
+            frontier = next_frontier
+            if frontier and pending and ((node_budget is not None and len(parents) > node_budget) or
+                                         (deadline is not None and time.monotonic() > deadline)):
+                exceeded = True
+                break
+
+        bfs_nodes_visited.observe(len(parents), search='single_source')
+        for other_user_id in targets:
+            if other_user_id in parents:
+                connection = []
+                node = parents[other_user_id]
+                while node != user_id:
+                    connection.append(node)
+                    node = parents[node]
+                connection.reverse()
+                bfs_path_length.observe(len(connection) + 1, search='single_source')
+                connections[other_user_id] = connection
+            elif exceeded:
+                connections[other_user_id] = None
+
+        return connections
+
+    @classmethod
+    def shorter_connection(cls, user_id, other_user_id, node_budget=None, time_budget=None):
+        """Function for find the shorter connection between user and other_user, cached until the friend graph
+        changes. The searches stopped by their budget raise SearchBudgetExceeded and are not cached."""
+        def compute():
+            connections = cls._find_connections(user_id, other_user_id, node_budget, time_budget)
+
+            if not connections:
+                return []
+
+            # Only the users in between are part of the connection
+            return connections[1:-1]
+
+        return shorter_connection_cache.get_or_set(user_id, other_user_id, compute)
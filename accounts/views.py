@@ -1,18 +1,46 @@
 """Accounts views"""
-from django.http import Http404
-from rest_framework import permissions
+import math
+import time
+from functools import partial
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import Http404, HttpResponse
+from rest_framework import permissions, status
+from rest_framework.exceptions import NotFound
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
 from rest_framework.generics import CreateAPIView, get_object_or_404, RetrieveUpdateDestroyAPIView
 from rest_framework.generics import DestroyAPIView
 from rest_framework.generics import ListCreateAPIView
-from rest_framework.generics import RetrieveAPIView
+from rest_framework.generics import GenericAPIView
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from accounts.conditional import conditional_json_response, rendered_cache
+from accounts.cache import shorter_connection_cache, mutual_friends_cache, friend_suggestions_cache, friend_ids_cache, \
+    auth_user_cache
+from accounts.fragments import profile_fragment_cache, render_profiles
+from accounts.exceptions import SearchBudgetUnavailable, LandmarkIndexUnavailable, FriendGraphCompactionUnavailable
+from accounts.graph import friend_graph_index
+from accounts.landmarks import landmark_index
+from accounts.metrics import registry as metrics_registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from accounts.middleware import query_stats
 from accounts.models import Profile, User, Friend
+from accounts.pagination import FriendsCursorPagination
 from accounts.permissions import IsOwnerOrAdmin
 from accounts.serializers import ProfileSerializer, UserSerializer, FriendsSerializer, AdminUserSerializer, \
-    FriendsProfileSerializer
-from accounts.utils import FriendsConnections
+    FriendsProfileSerializer, ShorterConnectionBatchSerializer, SeparationQuerySerializer, ExportQuerySerializer, \
+    BulkFriendsSerializer, FriendshipItemSerializer, BulkProvisionSerializer, ProvisionUserSerializer, \
+    DistanceBoundsQuerySerializer, SuggestionsQuerySerializer, FriendsProfilesQuerySerializer, DUPLICATED_USERNAME, \
+    DUPLICATED_PHONE, DUPLICATED_CONCURRENTLY, FRIENDSHIP_CREATED_CONCURRENTLY, AdminUserValuesSerializer, \
+    FriendsValuesSerializer
+from accounts.provisioning import provision_users
+from accounts.signals import friendships_created
+from accounts.streaming import ndjson_response, csv_response
+from accounts.suggestions import FriendSuggestions
+from accounts.utils import FriendsConnections, SearchBudgetExceeded
 
 
 # Users views
@@ -45,6 +73,11 @@ class AdminListCreateUserApiView(ListCreateAPIView):
     queryset = User.objects.all()
     serializer_class = AdminUserSerializer
 
+    def list(self, request, *args, **kwargs):
+        """Page of the users, serialized from their values without instantiating them"""
+        page = self.paginate_queryset(AdminUserValuesSerializer.values(self.filter_queryset(self.get_queryset())))
+        return self.get_paginated_response(AdminUserValuesSerializer(page, many=True).data)
+
 
 class AdminRetrieveUpdateDeleteUserApiView(RetrieveUpdateDestroyAPIView):
     """Admin user update api view"""
@@ -56,15 +89,246 @@ class AdminRetrieveUpdateDeleteUserApiView(RetrieveUpdateDestroyAPIView):
     serializer_class = AdminUserSerializer
 
 
+class AdminBulkCreateUserApiView(APIView):
+    """Admin bulk users and profiles create api view"""
+    permission_classes = [
+        permissions.IsAuthenticated,
+        permissions.IsAdminUser,
+    ]
+
+    @staticmethod
+    def _check_unique(results):
+        """
+        Mark as invalid the valid items whose username or phone is already taken, or repeated in the batch. The
+        usernames and the phones are checked with a single query each, the blank phones are unique too.
+        :param results: List of (result, validated_data) tuples, the items not yet checked have a None status
+        """
+        pending = [(result, data) for result, data in results if result['status'] is None]
+        usernames = {data['username'] for _, data in pending}
+        phones = {data['profile']['phone'] for _, data in pending if data.get('profile', {}).get('phone') is not None}
+
+        taken_usernames = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        taken_phones = set(Profile.objects.filter(phone__in=phones).values_list('phone', flat=True))
+
+        for result, data in pending:
+            errors = {}
+            phone = data.get('profile', {}).get('phone')
+
+            if data['username'] in taken_usernames:
+                errors['username'] = [DUPLICATED_USERNAME]
+            if phone is not None and phone in taken_phones:
+                errors['profile'] = {'phone': [DUPLICATED_PHONE]}
+
+            if errors:
+                result.update(status='invalid', errors=errors)
+            else:
+                taken_usernames.add(data['username'])
+                if phone is not None:
+                    taken_phones.add(phone)
+
+    @classmethod
+    def _provision(cls, results):
+        """
+        Create the valid items not yet taken. A username or phone taken by a concurrent request after the check makes
+        the insert fail, then the items are checked again and the rest retried once.
+        :param results: List of (result, validated_data) tuples, updated in place with the status of each item
+        :return: List of the created users
+        """
+        for _ in range(2):
+            cls._check_unique(results)
+            valid = [(result, data) for result, data in results if result['status'] is None]
+            try:
+                users = provision_users([data for _, data in valid])
+            except IntegrityError:
+                continue
+
+            for (result, _), user in zip(valid, users):
+                result.update(status='created', id=user.pk)
+            return users
+
+        for result, _ in valid:
+            result.update(status='invalid', errors={api_settings.NON_FIELD_ERRORS_KEY: [DUPLICATED_CONCURRENTLY]})
+        return []
+
+    def post(self, request):
+        """
+        Create a batch of users with their profiles
+        :param request: Request with the list of users
+        :return: The number of users created and the status of each item (created with its id, or invalid)
+        """
+        serializer = BulkProvisionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        results = []
+        for item in serializer.validated_data['users']:
+            item_serializer = ProvisionUserSerializer(data=item)
+            if item_serializer.is_valid():
+                results.append(({'username': item['username'], 'status': None}, item_serializer.validated_data))
+            else:
+                results.append(({'username': item.get('username'), 'status': 'invalid',
+                                 'errors': item_serializer.errors}, None))
+
+        users = self._provision(results)
+        return Response({'created': len(users), 'results': [result for result, _ in results]},
+                        status=status.HTTP_201_CREATED if users else status.HTTP_200_OK)
+
+
+class AdminCacheStatsApiView(APIView):
+    """Admin cache stats api view"""
+    permission_classes = [
+        permissions.IsAuthenticated,
+        permissions.IsAdminUser,
+    ]
+
+    @staticmethod
+    def get(request):
+        """Hit and miss counters of the caches of this process"""
+        return Response({
+            'shorter_connection': shorter_connection_cache.stats(),
+            'mutual_friends': mutual_friends_cache.stats(),
+            'friend_suggestions': friend_suggestions_cache.stats(),
+            'friend_ids': friend_ids_cache.stats(),
+            'auth_user': auth_user_cache.stats(),
+            'rendered': rendered_cache.stats(),
+            'profile_fragments': profile_fragment_cache.stats(),
+        })
+
+
+class AdminQueryStatsApiView(APIView):
+    """Admin query stats api view"""
+    permission_classes = [
+        permissions.IsAuthenticated,
+        permissions.IsAdminUser,
+    ]
+
+    @staticmethod
+    def get(request):
+        """Queries per view of the requests served by this process"""
+        return Response(query_stats.stats())
+
+
+class AdminFriendGraphApiView(APIView):
+    """Admin friend graph index api view"""
+    permission_classes = [
+        permissions.IsAuthenticated,
+        permissions.IsAdminUser,
+    ]
+
+    @staticmethod
+    def get(request):
+        """Size of the friend graph index of this process"""
+        return Response(friend_graph_index.stats())
+
+    @staticmethod
+    def post(request):
+        """Load the friend graph index of this process if needed and fold its overlay into its base arrays"""
+        if not settings.FRIEND_GRAPH_INDEX:
+            raise FriendGraphCompactionUnavailable()
+
+        friend_graph_index.get()
+        started = time.monotonic()
+        if not friend_graph_index.compact():
+            raise FriendGraphCompactionUnavailable()
+        return Response({**friend_graph_index.stats(), 'seconds': time.monotonic() - started})
+
+
+class MetricsApiView(APIView):
+    """Metrics api view, in the Prometheus text format for the scrapers"""
+    authentication_classes = []
+    permission_classes = [
+        permissions.AllowAny,
+    ]
+
+    @staticmethod
+    def get(request):
+        """Metrics of every process"""
+        return HttpResponse(metrics_registry.render(), content_type=METRICS_CONTENT_TYPE)
+
+
+class AdminExportApiView(APIView):
+    """
+    Admin export api view. The rows are streamed ordered by id from a server side cursor, so the memory used does not
+    depend on the size of the table.
+    """
+    permission_classes = [
+        permissions.IsAuthenticated,
+        permissions.IsAdminUser,
+    ]
+    queryset = None
+    # Pairs of (column name, queryset lookup)
+    columns = ()
+    filename = 'export'
+
+    def get(self, request):
+        """
+        Stream the rows as newline delimited JSON or CSV
+        :param request: Request, output (ndjson or csv) and since_id query params
+        :return: StreamingHttpResponse
+        """
+        query = ExportQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+
+        header = [name for name, _ in self.columns]
+        rows = self.queryset.filter(pk__gt=query.validated_data['since_id']).order_by('pk'). \
+            values_list(*[lookup for _, lookup in self.columns]). \
+            iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+        if query.validated_data['output'] == 'csv':
+            return csv_response(header, rows, filename=f'{self.filename}.csv')
+
+        return ndjson_response(dict(zip(header, row)) for row in rows)
+
+
+class AdminExportProfilesApiView(AdminExportApiView):
+    """Admin export profiles api view"""
+    queryset = Profile.objects.all()
+    columns = (
+        ('id', 'id'),
+        ('user_id', 'user_id'),
+        ('username', 'user__username'),
+        ('first_name', 'user__first_name'),
+        ('last_name', 'user__last_name'),
+        ('email', 'user__email'),
+        ('phone', 'phone'),
+        ('address', 'address'),
+        ('city', 'city'),
+        ('state', 'state'),
+        ('zipcode', 'zipcode'),
+        ('available', 'available'),
+        ('img', 'img'),
+    )
+    filename = 'profiles'
+
+
+class AdminExportFriendsApiView(AdminExportApiView):
+    """Admin export friendships api view"""
+    queryset = Friend.objects.all()
+    columns = (
+        ('id', 'id'),
+        ('user', 'user_id'),
+        ('is_friend_of', 'is_friend_of_id'),
+    )
+    filename = 'friends'
+
+
 # Profiles views
 class ListCreateProfileApiView(ListCreateAPIView):
     """Profile list api view"""
     permission_classes = [
         permissions.IsAuthenticated,
     ]
-    queryset = Profile.objects.all()
+    queryset = Profile.objects.with_friends_ids()
     serializer_class = ProfileSerializer
 
+    def list(self, request, *args, **kwargs):
+        """Page of the profiles, assembled from their rendered fragments, other formats are serialized as usual"""
+        if not isinstance(request.accepted_renderer, JSONRenderer):
+            return super().list(request, *args, **kwargs)
+
+        page = self.paginate_queryset(Profile.objects.values('pk', 'user_id'))
+        content = render_profiles([row['user_id'] for row in page])
+        return HttpResponse(self.paginator.get_paginated_content(content), content_type='application/json')
+
 
 class RetrieveUpdateDeleteProfileAPIView(RetrieveUpdateDestroyAPIView):
     """Profile retrieve, update, and delete API view"""
@@ -78,9 +342,14 @@ class RetrieveUpdateDeleteProfileAPIView(RetrieveUpdateDestroyAPIView):
         return [permissions.IsAuthenticated()]
 
     lookup_field = 'user_id'
-    queryset = Profile.objects.all()
+    queryset = Profile.objects.select_related('user')
     serializer_class = ProfileSerializer
 
+    def get(self, request, *args, **kwargs):
+        """Profile, answered with 304 or the content already rendered while it does not change"""
+        return conditional_json_response(request, ('profile', kwargs['user_id']),
+                                         partial(super().get, request, *args, **kwargs))
+
 
 # Friends views
 class ListCreateFriendApiView(ListCreateAPIView):
@@ -91,16 +360,149 @@ class ListCreateFriendApiView(ListCreateAPIView):
     queryset = Friend.objects.all()
     serializer_class = FriendsSerializer
 
+    def list(self, request, *args, **kwargs):
+        """Page of the friendships, serialized from their values without instantiating them"""
+        page = self.paginate_queryset(FriendsValuesSerializer.values(self.filter_queryset(self.get_queryset())))
+        return self.get_paginated_response(FriendsValuesSerializer(page, many=True).data)
+
+
+class BulkCreateFriendApiView(APIView):
+    """Bulk friends create api view"""
+    permission_classes = [
+        permissions.IsAuthenticated,
+    ]
+
+    @staticmethod
+    def _check_friendships(results):
+        """
+        Set the status of the valid items: invalid if any of the users does not exist, duplicated if the friendship
+        already exists or is repeated in the batch, otherwise created. Users and friendships are checked with a
+        single query each.
+        :param results: List of results, the items not yet checked have a None status
+        :return: List of the friendships to create
+        """
+        pending = [result for result in results if result['status'] is None]
+        user_ids = {result['user'] for result in pending}
+        friend_ids = {result['is_friend_of'] for result in pending}
+
+        existing_users = set(User.objects.filter(pk__in=user_ids | friend_ids).values_list('pk', flat=True))
+        friendships = set(Friend.objects.filter(user_id__in=user_ids, is_friend_of_id__in=friend_ids).
+                          values_list('user_id', 'is_friend_of_id'))
+        does_not_exist = PrimaryKeyRelatedField.default_error_messages['does_not_exist']
+        new_friendships = []
+
+        for result in pending:
+            errors = {field: [does_not_exist.format(pk_value=result[field])]
+                      for field in ('user', 'is_friend_of') if result[field] not in existing_users}
+            friendship = (result['user'], result['is_friend_of'])
+
+            if errors:
+                result.update(status='invalid', errors=errors)
+            elif friendship in friendships:
+                result['status'] = 'duplicated'
+            else:
+                result['status'] = 'created'
+                friendships.add(friendship)
+                new_friendships.append(friendship)
+
+        return new_friendships
+
+    @classmethod
+    def _create(cls, results):
+        """
+        Create the friendships of the valid items in a single transaction. A friendship created by a concurrent request
+        after the check makes the insert fail, then the items are checked again, so that it is reported as duplicated,
+        and the rest retried once. Only the friendships really inserted are sent with friendships_created.
+        :param results: List of results, updated in place with the status of each item
+        :return: List of the created friendships
+        """
+        for _ in range(2):
+            new_friendships = cls._check_friendships(results)
+            try:
+                with transaction.atomic():
+                    Friend.objects.bulk_create([Friend(user_id=user_id, is_friend_of_id=friend_id)
+                                                for user_id, friend_id in new_friendships],
+                                               batch_size=settings.BULK_CREATE_BATCH_SIZE)
+                    friendships_created.send(sender=Friend, friendships=new_friendships, using=Friend.objects.db)
+            except IntegrityError:
+                for result in results:
+                    if result['status'] == 'created':
+                        result['status'] = None
+                continue
+
+            return new_friendships
+
+        for result in results:
+            if result['status'] is None:
+                result.update(status='invalid',
+                              errors={api_settings.NON_FIELD_ERRORS_KEY: [FRIENDSHIP_CREATED_CONCURRENTLY]})
+        return []
+
+    def post(self, request):
+        """
+        Create a batch of friendships in a single transaction
+        :param request: Request with the list of {user, is_friend_of} friendships
+        :return: The number of friendships created and the status of each item (created, duplicated or invalid)
+        """
+        serializer = BulkFriendsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        results = []
+        for item in serializer.validated_data['friendships']:
+            item_serializer = FriendshipItemSerializer(data=item)
+            if item_serializer.is_valid():
+                results.append({**item_serializer.validated_data, 'status': None})
+            else:
+                results.append({'user': item.get('user'), 'is_friend_of': item.get('is_friend_of'),
+                                'status': 'invalid', 'errors': item_serializer.errors})
+
+        new_friendships = self._create(results)
+        return Response({'created': len(new_friendships), 'results': results},
+                        status=status.HTTP_201_CREATED if new_friendships else status.HTTP_200_OK)
 
-class RetrieveFriendsApiView(RetrieveAPIView):
+
+class RetrieveFriendsApiView(GenericAPIView):
     """Retrieve user friends profiles"""
     permission_classes = [
         permissions.IsAuthenticated,
     ]
-    lookup_field = 'user_id'
-    action = "retrieve"
-    queryset = Profile.objects.all()
     serializer_class = FriendsProfileSerializer
+    pagination_class = FriendsCursorPagination
+
+    @staticmethod
+    def _friends_profiles(user_id, fields):
+        """Friends profiles joined with their users, and their friendships fetched with a single query if needed"""
+        queryset = Profile.objects.friends_of(user_id)
+        if fields is None or 'friends' in fields:
+            return queryset.with_friends_ids()
+        return queryset.select_related('user')
+
+    def get(self, request, user_id):
+        """Page of the friends profiles, answered with 304 or the content already rendered while they do not change"""
+        return conditional_json_response(request, ('friends', user_id), partial(self._friends_page, request, user_id))
+
+    def _friends_page(self, request, user_id):
+        """
+        Return a page of the profiles of the friends of a user, with a fixed number of queries
+        :param request: Request, fields query param to return only some fields of the profiles
+        :param user_id: User id
+        :return: The friends profiles and the next and previous pages urls
+        """
+        query = FriendsProfilesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        fields = query.validated_data.get('fields')
+
+        if not Profile.objects.filter(user_id=user_id).exists():
+            raise Http404
+
+        if fields is None and isinstance(request.accepted_renderer, JSONRenderer):
+            page = self.paginate_queryset(Profile.objects.friends_of(user_id).values('user_id'))
+            content = render_profiles([row['user_id'] for row in page])
+            return HttpResponse(self.paginator.get_paginated_content(content), content_type='application/json')
+
+        page = self.paginate_queryset(self._friends_profiles(user_id, fields))
+        serializer = self.get_serializer(page, many=True, fields=fields)
+        return self.get_paginated_response(serializer.data)
 
 
 class DeleteFriendshipAPIView(DestroyAPIView):
@@ -150,6 +552,234 @@ class ShorterConnectionFriends(APIView):
         if not uid_exists or not ouid_exists:
             raise Http404
 
-        shorter_connection = FriendsConnections.shorter_connection(user_id=uid, other_user_id=ouid)
+        try:
+            shorter_connection = FriendsConnections.shorter_connection(
+                user_id=uid, other_user_id=ouid, node_budget=settings.FRIENDS_CONNECTIONS_NODE_BUDGET,
+                time_budget=settings.FRIENDS_CONNECTIONS_TIME_BUDGET)
+        except SearchBudgetExceeded as exception:
+            raise SearchBudgetUnavailable() from exception
 
         return Response(shorter_connection)
+
+
+class BatchShorterConnectionFriends(APIView):
+    """Batch short connection friends view"""
+    permission_classes = [
+        permissions.IsAuthenticated,
+    ]
+
+    @staticmethod
+    def _connections(pairs, existing_ids):
+        """
+        Shorter connection of every pair. The pairs are grouped by uid, so the searches from each uid answer all its
+        pairs, each uid within the node and time budgets.
+        :param pairs: List of (uid, ouid) pairs
+        :param existing_ids: Set of the ids of the pairs that exist
+        :return: A generator of results, grouped by uid
+        """
+        targets = {}
+        for uid, ouid in pairs:
+            targets.setdefault(uid, []).append(ouid)
+
+        for uid, ouids in targets.items():
+            connections = {}
+            if uid in existing_ids:
+                connections = FriendsConnections.shorter_connections(
+                    user_id=uid, other_user_ids=[ouid for ouid in ouids if ouid in existing_ids],
+                    node_budget=settings.FRIENDS_CONNECTIONS_NODE_BUDGET,
+                    time_budget=settings.FRIENDS_CONNECTIONS_TIME_BUDGET)
+
+            for ouid in ouids:
+                if ouid not in connections:
+                    yield {'uid': uid, 'ouid': ouid, 'detail': str(NotFound.default_detail)}
+                elif connections[ouid] is None:
+                    yield {'uid': uid, 'ouid': ouid, 'detail': str(SearchBudgetUnavailable.default_detail)}
+                else:
+                    yield {'uid': uid, 'ouid': ouid, 'connection': connections[ouid]}
+
+    def post(self, request):
+        """
+        Stream the shorter connection friends of a batch of pairs as newline delimited JSON
+        :param request: Request with the list of [uid, ouid] pairs
+        :return: One line per pair with the connection, or a detail if any of the users does not exist or the search
+            exceeded its budget
+        """
+        serializer = ShorterConnectionBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        pairs = serializer.validated_data['pairs']
+
+        ids = {user_id for pair in pairs for user_id in pair}
+        existing_ids = set(User.objects.filter(pk__in=ids).values_list('pk', flat=True))
+
+        return ndjson_response(self._connections(pairs, existing_ids))
+
+
+class DegreesOfSeparation(APIView):
+    """Degrees of separation view"""
+    permission_classes = [
+        permissions.IsAuthenticated,
+    ]
+
+    @staticmethod
+    def get(request, uid, ouid):
+        """
+        Return the number of friendships between two users, if it is not greater than max_depth
+        :param request: Request, max_depth query param
+        :param uid: User id
+        :param ouid: Other user id
+        :return: The distance, null if the users are not within max_depth. Truncated is true if the search was
+            stopped by its node budget.
+        """
+        query = SeparationQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        max_depth = query.validated_data['max_depth']
+
+        if User.objects.filter(pk__in={uid, ouid}).count() != len({uid, ouid}):
+            raise Http404
+
+        try:
+            distance = FriendsConnections.degrees_of_separation(
+                user_id=uid, other_user_id=ouid, max_depth=max_depth,
+                node_budget=settings.FRIENDS_CONNECTIONS_NODE_BUDGET,
+                time_budget=settings.FRIENDS_CONNECTIONS_TIME_BUDGET)
+        except SearchBudgetExceeded:
+            return Response({'max_depth': max_depth, 'distance': None, 'truncated': True})
+
+        return Response({'max_depth': max_depth, 'distance': distance, 'truncated': False})
+
+
+class MutualFriends(APIView):
+    """Mutual friends view"""
+    permission_classes = [
+        permissions.IsAuthenticated,
+    ]
+
+    @staticmethod
+    def get(request, uid, ouid):
+        """
+        Return the friends of both users
+        :param request: Request
+        :param uid: User id
+        :param ouid: Other user id
+        :return: The number and the sorted ids of the mutual friends
+        """
+        if User.objects.filter(pk__in={uid, ouid}).count() != len({uid, ouid}):
+            raise Http404
+
+        mutual_friends = FriendSuggestions.mutual_friends(user_id=uid, other_user_id=ouid)
+        return Response({'count': len(mutual_friends), 'friends': mutual_friends})
+
+
+class FriendSuggestionsApiView(APIView):
+    """Friend suggestions view"""
+    permission_classes = [
+        permissions.IsAuthenticated,
+    ]
+
+    @staticmethod
+    def get(request, uid):
+        """
+        Return the friends of the friends of a user that are not yet its friends, with more mutual friends first
+        :param request: Request, limit query param
+        :param uid: User id
+        :return: Suggestions with their number of mutual friends. Truncated is true if the candidate budget stopped
+            the scan of the friendships of the friends.
+        """
+        query = SuggestionsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+
+        if not User.objects.filter(pk=uid).exists():
+            raise Http404
+
+        return Response(FriendSuggestions.suggestions(user_id=uid, limit=query.validated_data['limit']))
+
+
+class DistanceBounds(APIView):
+    """Distance bounds view"""
+    permission_classes = [
+        permissions.IsAuthenticated,
+    ]
+
+    @staticmethod
+    def _bound(value):
+        """Infinite bounds are null"""
+        return None if value == math.inf else value
+
+    def get(self, request, uid, ouid):
+        """
+        Return bounds of the number of friendships between two users from the landmark index, without searching
+        :param request: Request, exact query param to search the distance when the bounds are not equal
+        :param uid: User id
+        :param ouid: Other user id
+        :return: The lower and upper bounds, null if unbounded, and the distance when it is known. The lower bound is
+            null when the users were not connected when the index was built, exact searches them again.
+        """
+        query = DistanceBoundsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+
+        index = landmark_index.get()
+        if index is None:
+            raise LandmarkIndexUnavailable()
+
+        if User.objects.filter(pk__in={uid, ouid}).count() != len({uid, ouid}):
+            raise Http404
+
+        lower, upper = index.bounds(uid, ouid)
+        # The friendships created after the build could connect the users the index does not connect
+        exact = lower == upper != math.inf
+        distance = lower if exact else None
+
+        if not exact and query.validated_data['exact']:
+            # A connection of length upper exists, so the search never needs to go deeper
+            max_depth = upper if upper != math.inf else settings.FRIENDS_CONNECTIONS_MAX_DEPTH
+            try:
+                distance = FriendsConnections.degrees_of_separation(
+                    user_id=uid, other_user_id=ouid, max_depth=max_depth,
+                    node_budget=settings.FRIENDS_CONNECTIONS_NODE_BUDGET,
+                    time_budget=settings.FRIENDS_CONNECTIONS_TIME_BUDGET)
+            except SearchBudgetExceeded as exception:
+                raise SearchBudgetUnavailable() from exception
+
+            exact = distance is not None
+            if exact:
+                lower = upper = distance
+            else:
+                # Only when the friendships changed after the index was built the upper bound is not found
+                lower, upper = max(lower, max_depth + 1), math.inf
+
+        return Response({
+            'lower': self._bound(lower),
+            'upper': self._bound(upper),
+            'distance': self._bound(distance),
+            'exact': exact,
+            'built_at': index.built_at,
+        })
+
+
+class FriendsNeighborhood(APIView):
+    """Friends neighborhood view"""
+    permission_classes = [
+        permissions.IsAuthenticated,
+    ]
+
+    @staticmethod
+    def get(request, uid):
+        """
+        Return the users within max_depth friendships of a user
+        :param request: Request, max_depth query param
+        :param uid: User id
+        :return: Users ordered by distance. Truncated is true if the search was stopped by its node budget.
+        """
+        query = SeparationQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        max_depth = query.validated_data['max_depth']
+
+        if not User.objects.filter(pk=uid).exists():
+            raise Http404
+
+        distances, truncated = FriendsConnections.neighborhood(
+            user_id=uid, max_depth=max_depth, node_budget=settings.FRIENDS_CONNECTIONS_NODE_BUDGET)
+        users = [{'id': user_id, 'distance': distance}
+                 for user_id, distance in sorted(distances.items(), key=lambda item: (item[1], item[0]))]
+
+        return Response({'max_depth': max_depth, 'truncated': truncated, 'users': users})
@@ -45,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'accounts.middleware.RequestMetricsMiddleware',
+    'accounts.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -101,6 +103,17 @@ else:
         }
     }
 
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+# Local memory by default, set CACHE_BACKEND and CACHE_LOCATION to share it between processes (e.g. redis), otherwise
+# the invalidations made by a process never reach the others (see LOCAL_CACHE_TIMEOUT)
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -144,14 +157,93 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'rest_framework.schemas.coreapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',  # <-- JWT Authentication
+        'accounts.authentication.CachedJWTAuthentication',  # <-- JWT Authentication, with the users cached
     ],
+    # JSON encoded with orjson when it is installed, see accounts.renderers
+    'DEFAULT_RENDERER_CLASSES': [
+        'accounts.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'accounts.pagination.PrimaryKeyCursorPagination',
+    'PAGE_SIZE': int(os.environ.get('PAGINATION_PAGE_SIZE', '100')),
 }
 
+# Ceiling of the page_size query param of the paginated lists
+PAGINATION_MAX_PAGE_SIZE = int(os.environ.get('PAGINATION_MAX_PAGE_SIZE', '1000'))
+
+# Rows inserted per query by the bulk create endpoints
+BULK_CREATE_BATCH_SIZE = int(os.environ.get('BULK_CREATE_BATCH_SIZE', '1000'))
+
+# Processes that hash the passwords of the users created in bulk, 1 hashes them in the request worker
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', str(os.cpu_count() or 1)))
+
+# Count and time the queries of every request, see manager/stats/queries/
+QUERY_INSTRUMENTATION = os.environ.get('QUERY_INSTRUMENTATION', 'True') == 'True'
+
+# Directory shared by the processes to aggregate the metrics served in /metrics, without it each process serves its own
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '1'))
+
+# Rows fetched per round trip by the streaming exports
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', '2000'))
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
 }
 
+# In-memory friendship graph index (accounts.graph), loaded once per process and kept up to date by the Friend
+# signals. Each process reloads it after FRIEND_GRAPH_INDEX_MAX_AGE seconds to see writes made by other processes.
+# Recent changes live in an overlay that is folded into the base arrays once it reaches the compaction threshold, or
+# on demand through /api/manager/friend-graph/.
+FRIEND_GRAPH_INDEX = os.environ.get('FRIEND_GRAPH_INDEX', 'False') == 'True'
+FRIEND_GRAPH_INDEX_MAX_AGE = int(os.environ.get('FRIEND_GRAPH_INDEX_MAX_AGE', '300'))
+FRIEND_GRAPH_INDEX_COMPACTION_THRESHOLD = int(os.environ.get('FRIEND_GRAPH_INDEX_COMPACTION_THRESHOLD', '10000'))
+
+# Cache alias and timeout (seconds) of the shorter connections and the other accounts caches. The signals invalidate
+# them at once only when the cache is shared between processes (e.g. redis); with a cache local to each process (the
+# default locmem) the entries that other processes can make stale expire after LOCAL_CACHE_TIMEOUT seconds instead.
+FRIENDS_CONNECTIONS_CACHE = os.environ.get('FRIENDS_CONNECTIONS_CACHE', 'default')
+FRIENDS_CONNECTIONS_CACHE_TIMEOUT = int(os.environ.get('FRIENDS_CONNECTIONS_CACHE_TIMEOUT', '300'))
+LOCAL_CACHE_TIMEOUT = int(os.environ.get('LOCAL_CACHE_TIMEOUT', '5'))
+
+# Limits of the friends connections searches. The node budget (users visited) bounds the shorter connection, batch,
+# degrees of separation and neighborhood searches, the time budget (seconds) all of them but the neighborhood.
+FRIENDS_CONNECTIONS_MAX_DEPTH = 6
+FRIENDS_CONNECTIONS_NODE_BUDGET = int(os.environ.get('FRIENDS_CONNECTIONS_NODE_BUDGET', '100000'))
+FRIENDS_CONNECTIONS_TIME_BUDGET = float(os.environ.get('FRIENDS_CONNECTIONS_TIME_BUDGET', '2'))
+# A user of a batch with up to this number of targets is searched by the cached bidirectional search, pair by pair,
+# instead of a single search towards all of them
+FRIENDS_CONNECTIONS_BATCH_PAIR_TARGETS = int(os.environ.get('FRIENDS_CONNECTIONS_BATCH_PAIR_TARGETS', '2'))
+
+# Cache of the users of the JWT authentication: seconds in the default cache, and seconds and users in the local layer
+# of each process. With a shared default cache a deactivated user or a changed password is seen by the other processes
+# after the local seconds; with the default locmem cache each process has its own copy, kept LOCAL_CACHE_TIMEOUT
+# seconds.
+AUTH_USER_CACHE_TIMEOUT = int(os.environ.get('AUTH_USER_CACHE_TIMEOUT', '300'))
+AUTH_USER_CACHE_LOCAL_TTL = float(os.environ.get('AUTH_USER_CACHE_LOCAL_TTL', '5'))
+AUTH_USER_CACHE_LOCAL_SIZE = int(os.environ.get('AUTH_USER_CACHE_LOCAL_SIZE', '10000'))
+
+# Bytes of rendered profile and friends responses kept by each process to answer the requests of unchanged resources
+RENDERED_CACHE_MAX_BYTES = int(os.environ.get('RENDERED_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+
+# Profiles rendered as JSON kept by each process, to assemble the lists of profiles without serializing them again
+PROFILE_FRAGMENT_CACHE_SIZE = int(os.environ.get('PROFILE_FRAGMENT_CACHE_SIZE', '50000'))
+
+# Users whose friend ids are kept in memory by each process for the friendship permission checks
+FRIEND_IDS_CACHE_SIZE = int(os.environ.get('FRIEND_IDS_CACHE_SIZE', '10000'))
+
+# Friend suggestions: the number of suggestions cached per user (the maximum limit of a request) and the friendships of
+# the friends scanned to count the mutual friends, so a user with many friends is answered from a part of them
+FRIENDS_SUGGESTIONS_MAX_LIMIT = 100
+FRIENDS_SUGGESTIONS_CANDIDATE_BUDGET = int(os.environ.get('FRIENDS_SUGGESTIONS_CANDIDATE_BUDGET', '50000'))
+
+# File of the landmark index of the distance bounds, built by the build_landmark_index command
+LANDMARK_INDEX_PATH = os.environ.get('LANDMARK_INDEX_PATH', str(BASE_DIR / 'landmarks.idx'))
+
+# Index of the weakly connected components of the friend graph (accounts.components), so the users without any
+# connection are answered without a search. It is rebuilt like the friend graph index, and after a deletion.
+FRIENDS_COMPONENT_INDEX = os.environ.get('FRIENDS_COMPONENT_INDEX', 'False') == 'True'
+
 # This is for snapshottest of integration test
 TEST_RUNNER = 'snapshottest.django.TestRunner'
 
@@ -18,10 +18,13 @@ from django.urls import path, include
 from rest_framework.documentation import include_docs_urls
 from rest_framework_simplejwt import views as jwt_views
 
+from accounts.views import MetricsApiView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('accounts.urls')),
     path('docs/', include_docs_urls(title='Rest API PoC')),
     path('api/jwt/token/', jwt_views.TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/jwt/token/refresh/', jwt_views.TokenRefreshView.as_view(), name='token_refresh'),
+    path('metrics', MetricsApiView.as_view(), name='metrics'),
 ]
@@ -1,10 +1,15 @@
 """Seeder script for fill the DB"""
 import json
 import random
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
 
 import requests
+from requests.adapters import HTTPAdapter
 from randomuser import RandomUser
 
+from accounts.seeding import generate_users, generate_friendships
+
 TIMEOUT = 30
 
 def get_request_credentials(api_url, username, password):
@@ -116,6 +121,77 @@ def create_users(api_url, profiles_amount, friends_number):
         print(user)
 
 
+class ApiClient:
+    """Api client for the parallel seeder, the worker threads share a pooled session and the JWT of each user"""
+
+    def __init__(self, api_url, workers):
+        self.api_url = api_url
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.tokens = {}
+
+    def post(self, path, data, headers=None):
+        """Post data as json and return the decoded response"""
+        response = self.session.post(self.api_url + path, json=data, headers=headers, timeout=TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+
+    def get_request_credentials(self, username, password):
+        """Add the JWT to header for request, fetched once per user"""
+        if username not in self.tokens:
+            token = self.post('/api/jwt/token/', {"username": username, "password": password})['access']
+            self.tokens[username] = {'Authorization': f'Bearer {token}'}
+
+        return self.tokens[username]
+
+
+def create_user_parallel(client, user_data):
+    """
+    Create a user with its profile
+    :return: Dict with the id, username and password of the user
+    """
+    profile_data = user_data.pop('profile')
+    user = client.post('/api/user/create/', user_data)
+
+    http_auth = client.get_request_credentials(user_data['username'], user_data['password'])
+    client.post('/api/profile/', profile_data, headers=http_auth)
+
+    return {"id": user['id'], "username": user_data['username'], "password": user_data['password']}
+
+
+def create_users_parallel(api_url, profiles_amount, friends_number, workers=16, seed=0, start=0):
+    """
+    This function creates users with their profiles and friendships sending them to the API from a pool of
+    threads. The users are generated locally from the seed, and the friendships of each user are sent in a single
+    request.
+    :param profiles_amount: Number of profiles you want to generate
+    :param friends_number: Number of friends of each profile
+    :param workers: Maximum number of concurrent requests
+    :param seed: Seed of the users and friendships generator
+    :param start: Index of the first user, use it to add users to a dataset already seeded
+    :return: List of the users created
+    """
+    client = ApiClient(api_url, workers)
+    users = generate_users(profiles_amount, seed, start)
+
+    def create_friendships(user_friendships):
+        user, friendships = user_friendships
+        data = {"friendships": [{"user": user_id, "is_friend_of": friend_id} for user_id, friend_id in friendships]}
+        client.post('/api/friends/bulk/', data, headers=client.get_request_credentials(*user))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        user_list = list(executor.map(lambda user_data: create_user_parallel(client, user_data), users))
+
+        credentials = {user['id']: (user['username'], user['password']) for user in user_list}
+        friendships = generate_friendships(list(credentials), friends_number, seed)
+        grouped = ((credentials[user_id], list(items)) for user_id, items in groupby(friendships, lambda item: item[0]))
+        list(executor.map(create_friendships, grouped))
+
+    return user_list
+
+
 if __name__ == '__main__':
 
     print('Api url like # http://localhost:8000')
@@ -127,7 +203,18 @@ if __name__ == '__main__':
     print('Friends amount')
     friendships = input()
 
+    print('Parallel requests, empty for the sequential seeder with random users')
+    parallel_requests = input()
+
     if not api_host:
         api_host = 'http://localhost:8000'
 
-    create_users(api_host, int(profile_amount), int(friendships))
+    if parallel_requests:
+        print('Seed')
+        generator_seed = input()
+
+        for created_user in create_users_parallel(api_host, int(profile_amount), int(friendships),
+                                                  int(parallel_requests), int(generator_seed or 0)):
+            print(created_user)
+    else:
+        create_users(api_host, int(profile_amount), int(friendships))